@@ -0,0 +1,171 @@
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from fuzzy_system import FuzzyInferenceSystem
+from simulation import get_comfort_zone_bounds
+
+if TYPE_CHECKING:
+    from predictive import PredictiveController
+
+# Параметры внешнего климата по умолчанию (как в VentilationSimulator.update_environment)
+DEFAULT_CLIMATE = {
+    'temp_base': 15.0, 'temp_amplitude': 10.0, 'temp_frequency': 0.1,
+    'hum_base': 50.0, 'hum_amplitude': 20.0, 'hum_frequency': 0.05,
+}
+
+# Пакетный регулятор: (массив температур, массив влажностей) -> {'fan_speed': ..., 'heater_state': ...}
+BatchController = Callable[[np.ndarray, np.ndarray], Dict[str, np.ndarray]]
+
+
+def external_climate(climate: Dict[str, np.ndarray], phase: np.ndarray, step) -> Tuple[np.ndarray, np.ndarray]:
+    """Внешние температура и влажность на шаге step (число или массив, согласованный с phase)"""
+    return (climate['temp_base'] + climate['temp_amplitude'] * np.sin(step * climate['temp_frequency'] + phase),
+            climate['hum_base'] + climate['hum_amplitude'] * np.sin(step * climate['hum_frequency'] + phase))
+
+
+def plant_step(temperature, humidity, external_temp, external_humidity, ideal_temp, ideal_hum,
+               fan_speed, heater_state) -> Tuple[np.ndarray, np.ndarray]:
+    """Модель цеха на один шаг (та же, что VentilationSimulator.apply_control_actions), поэлементно"""
+    temp_change_from_fan = (external_temp - temperature) * 0.18 * fan_speed
+    hum_change_from_fan = (external_humidity - humidity) * 0.18 * fan_speed
+    temp_change_from_heater = heater_state * 0.8
+
+    temp_adjustment = (ideal_temp - temperature) * 0.12 * (1 - fan_speed)
+    hum_adjustment = (ideal_hum - humidity) * 0.12 * (1 - fan_speed)
+
+    temperature = temperature + (temp_change_from_fan + temp_change_from_heater + temp_adjustment)
+    humidity = humidity + (hum_change_from_fan + hum_adjustment)
+    return np.clip(temperature, 10, 30), np.clip(humidity, 20, 80)
+
+
+class BatchVentilationSimulator:
+    """Одновременная симуляция множества цехов: состояние каждого хранится в массивах NumPy.
+
+    Модель цеха и порядок шагов те же, что в VentilationSimulator.run: шаг в комфортной зоне
+    только засчитывается, иначе обновляется внешняя среда, вызывается регулятор и применяется
+    управление. Каждый цех завершает работу после steps активных шагов или 2 * steps шагов всего.
+    """
+
+    def __init__(self, fis: FuzzyInferenceSystem, temperatures, humidities, external_phase=0.0,
+                 temp_bounds=None, hum_bounds=None, controller: Optional[BatchController] = None,
+                 climate: Optional[Dict[str, object]] = None, fan_available=True, heater_available=True,
+                 predictive: Optional['PredictiveController'] = None):
+        self.fis = fis
+        # Регулятор по умолчанию - пакетный нечеткий вывод
+        self.controller = controller or fis.infer_batch
+        # Режим с прогнозом: решение регулятора служит априорным вариантом для PredictiveController
+        self.predictive = predictive
+
+        self.temperature = np.array(temperatures, dtype=float, ndmin=1)
+        self.humidity = np.array(humidities, dtype=float, ndmin=1)
+        self.temperature, self.humidity = [np.array(a) for a in np.broadcast_arrays(self.temperature, self.humidity)]
+        n = self.temperature.shape[0]
+
+        default_temp_bounds, default_hum_bounds = get_comfort_zone_bounds()
+        self.temp_bounds = np.broadcast_to(np.asarray(default_temp_bounds if temp_bounds is None else temp_bounds, dtype=float), (n, 2))
+        self.hum_bounds = np.broadcast_to(np.asarray(default_hum_bounds if hum_bounds is None else hum_bounds, dtype=float), (n, 2))
+        # Середина комфортной зоны - цель мягкого подстраивания в модели цеха
+        self.ideal_temp = self.temp_bounds.mean(axis=1)
+        self.ideal_hum = self.hum_bounds.mean(axis=1)
+
+        # Фаза суточного цикла внешнего климата у каждого цеха своя; остальные параметры
+        # климата (см. DEFAULT_CLIMATE) можно задать числом или массивом по цехам
+        self.external_phase = np.broadcast_to(np.asarray(external_phase, dtype=float), (n,))
+        self.climate = {key: np.broadcast_to(np.asarray((climate or {}).get(key, default), dtype=float), (n,))
+                        for key, default in DEFAULT_CLIMATE.items()}
+        # Цеха без вентилятора или обогревателя: соответствующая команда регулятора не исполняется
+        self.fan_available = np.broadcast_to(np.asarray(fan_available, dtype=bool), (n,))
+        self.heater_available = np.broadcast_to(np.asarray(heater_available, dtype=bool), (n,))
+        self.external_temp = np.full(n, 15.0)
+        self.external_humidity = np.full(n, 60.0)
+
+        self.step = 0
+        self.active_steps = np.zeros(n, dtype=np.int64)
+        self.total_steps = np.zeros(n, dtype=np.int64)
+        self.comfort_steps_count = np.zeros(n, dtype=np.int64)
+        self.last_fan_speed = np.zeros(n)
+        self.last_heater_state = np.zeros(n)
+
+    @property
+    def size(self) -> int:
+        return self.temperature.shape[0]
+
+    def is_comfortable_zone(self) -> np.ndarray:
+        """Маска цехов, находящихся в своей комфортной зоне"""
+        temp_comfort = (self.temp_bounds[:, 0] <= self.temperature) & (self.temperature <= self.temp_bounds[:, 1])
+        hum_comfort = (self.hum_bounds[:, 0] <= self.humidity) & (self.humidity <= self.hum_bounds[:, 1])
+        return temp_comfort & hum_comfort
+
+    def get_comfort_margin(self):
+        """Отклонение от середины комфортной зоны по температуре и влажности"""
+        return np.abs(self.temperature - self.ideal_temp), np.abs(self.humidity - self.ideal_hum)
+
+    def update_environment(self, mask: np.ndarray):
+        """Имитация изменения внешней среды для выбранных цехов"""
+        climate = {key: values[mask] for key, values in self.climate.items()}
+        self.external_temp[mask], self.external_humidity[mask] = external_climate(
+            climate, self.external_phase[mask], self.step)
+
+    def climate_forecast(self, mask: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Внешний климат выбранных цехов на шагах step, step + 1, ... (массивы (цеха, horizon))"""
+        climate = {key: values[mask][:, None] for key, values in self.climate.items()}
+        return external_climate(climate, self.external_phase[mask][:, None], self.step + np.arange(horizon))
+
+    def apply_control_actions(self, mask: np.ndarray, fan_speed: np.ndarray, heater_state: np.ndarray):
+        """Применение управления к выбранным цехам (та же модель, что VentilationSimulator.apply_control_actions)"""
+        self.temperature[mask], self.humidity[mask] = plant_step(
+            self.temperature[mask], self.humidity[mask], self.external_temp[mask], self.external_humidity[mask],
+            self.ideal_temp[mask], self.ideal_hum[mask], fan_speed, heater_state)
+
+    def advance(self, steps) -> np.ndarray:
+        """Один шаг симуляции всех еще работающих цехов; возвращает маску работающих цехов.
+
+        steps - лимит активных шагов: число или массив (свой лимит у каждого цеха).
+        """
+        running = (self.active_steps < steps) & (self.total_steps < steps * 2)
+        if not running.any():
+            return running
+
+        self.step += 1
+        self.total_steps[running] += 1
+
+        comfortable = self.is_comfortable_zone()
+        resting = running & comfortable
+        self.comfort_steps_count[resting] += 1
+        self.last_fan_speed[resting] = 0.0
+        self.last_heater_state[resting] = 0.0
+
+        controlled = running & ~comfortable
+        if controlled.any():
+            self.active_steps[controlled] += 1
+            self.update_environment(controlled)
+            actions = self.controller(self.temperature[controlled], self.humidity[controlled])
+            if self.predictive is not None:
+                actions = self.predictive.plan_batch(self, controlled, actions)
+            fan_speed = np.asarray(actions['fan_speed'], dtype=float) * self.fan_available[controlled]
+            heater_state = np.asarray(actions['heater_state'], dtype=float) * self.heater_available[controlled]
+            self.last_fan_speed[controlled] = fan_speed
+            self.last_heater_state[controlled] = heater_state
+            self.apply_control_actions(controlled, fan_speed, heater_state)
+        return running
+
+    def run(self, steps=20) -> Dict[str, np.ndarray]:
+        """Симуляция до завершения всех цехов; возвращает статистику по каждому цеху"""
+        while self.advance(steps).any():
+            pass
+        return self.statistics()
+
+    def statistics(self) -> Dict[str, np.ndarray]:
+        """Статистика по цехам: шаги, шаги в комфортной зоне, финальное состояние и отклонение от идеала"""
+        temp_margin, hum_margin = self.get_comfort_margin()
+        return {
+            'total_steps': self.total_steps.copy(),
+            'active_steps': self.active_steps.copy(),
+            'comfort_steps': self.comfort_steps_count.copy(),
+            'final_temperature': self.temperature.copy(),
+            'final_humidity': self.humidity.copy(),
+            'temp_margin': temp_margin,
+            'hum_margin': hum_margin,
+            'in_comfort_zone': self.is_comfortable_zone(),
+        }
@@ -0,0 +1,379 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from fuzzy_system import FuzzyInferenceSystem
+from init_database import init_database
+from knowledge_base import import_version, load_knowledge_base
+
+# Версия формата файла результатов
+BENCHMARK_FORMAT_VERSION = 1
+
+# Допустимое ухудшение относительно эталона по умолчанию (доля); у отдельного замера
+# в файле эталона можно задать свое поле "tolerance"
+DEFAULT_TOLERANCE = 0.3
+
+# Размеры сгенерированных баз знаний для замера загрузки (10 - штатная база)
+KB_SIZES = (10, 1000, 10000, 100000)
+QUICK_KB_SIZES = (10, 1000)
+
+# Верхняя граница времени запуска коротких команд `python -m cli`, мс (включая запуск
+# интерпретатора); превышение считается регрессией независимо от эталона
+STARTUP_LIMITS_MS = {'cli_help': 150.0, 'cli_infer': 250.0}
+
+
+def measure(func: Callable[[], object], number: Optional[int] = None, repeat: int = 5,
+            min_time: float = 0.2) -> float:
+    """Время одного вызова func в секундах: лучшее из repeat серий по number вызовов.
+
+    Без number размер серии подбирается так, чтобы она длилась не меньше min_time.
+    """
+    if number is None:
+        number = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - started >= min_time:
+                break
+            number *= 2
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def _result(value: float, unit: str, higher_is_better: bool, **info) -> Dict[str, object]:
+    return dict(value=value, unit=unit, higher_is_better=higher_is_better, **info)
+
+
+def _latency(seconds: float) -> Dict[str, object]:
+    return _result(seconds * 1e6, 'us', False)
+
+
+def _throughput(seconds_per_item: float, unit: str, **info) -> Dict[str, object]:
+    return _result(1.0 / seconds_per_item, unit, True, **info)
+
+
+def generate_knowledge_base(db_path: str, rules: int, seed: int = 0):
+    """База знаний со штатными множествами и rules правилами: штатные и случайные (10 - только штатные)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_database(db_path)
+    if rules <= 10:
+        return
+    rng = random.Random(seed)
+    fuzzy_sets, stock_rules = load_knowledge_base(db_path).to_rows()
+    sets = {}
+    for variable, set_name, *_ in fuzzy_sets:
+        sets.setdefault(variable, []).append(set_name)
+    fan_terms = ['off', 'slow', 'medium', 'high']
+    heater_terms = ['off', 'on']
+
+    new_rules = []
+    for _ in range(rules - 10):
+        fan_term, heater_term, priority = rng.choice(fan_terms), rng.choice(heater_terms), rng.randint(0, 10)
+        conditions = tuple((variable, rng.choice(sets[variable]))
+                           for variable in rng.sample(sorted(sets), rng.randint(1, len(sets))))
+        new_rules.append((conditions, fan_term, heater_term, priority, ()))
+    import_version(db_path, rules=stock_rules + new_rules, source='benchmark')
+
+
+@contextlib.contextmanager
+def _override(fis: FuzzyInferenceSystem, attribute: str, value: str):
+    """Временная смена режима вывода (fan_defuzzification, inference)"""
+    previous = getattr(fis, attribute)
+    setattr(fis, attribute, value)
+    try:
+        yield
+    finally:
+        setattr(fis, attribute, previous)
+
+
+def bench_primitives(fis: FuzzyInferenceSystem) -> Dict[str, Dict[str, object]]:
+    """Задержка одиночного решения и его составляющих"""
+    fis.knowledge_base  # Компиляция базы не входит в замеры
+    rng = np.random.default_rng(0)
+    temperatures = rng.uniform(10, 30, 1024).tolist()
+    humidities = rng.uniform(20, 80, 1024).tolist()
+    points = iter(())
+
+    def next_point():
+        nonlocal points
+        try:
+            return next(points)
+        except StopIteration:
+            points = iter(zip(temperatures, humidities))
+            return next(points)
+
+    def infer():
+        temperature, humidity = next_point()
+        fis.infer(temperature, humidity)
+
+    def fuzzify():
+        fis.fuzzify(next_point()[0], 'temperature')
+
+    results = {
+        'trapezoid_mf.latency': _latency(measure(lambda: fis.trapezoid_mf(16.0, 15, 17, 23, 25))),
+        'fuzzify.latency': _latency(measure(fuzzify)),
+        'infer.latency': _latency(measure(infer)),
+    }
+    with _override(fis, 'fan_defuzzification', 'centroid'):
+        results['infer_centroid.latency'] = _latency(measure(infer))
+    with _override(fis, 'inference', 'sugeno'):
+        results['infer_sugeno.latency'] = _latency(measure(infer))
+
+    # Цена метрик: замер каждого решения и каждого сотого (infer.latency - сбор выключен)
+    from metrics import Metrics
+    for name, sample_every in (('infer_metrics.latency', 1), ('infer_metrics_sampled.latency', 100)):
+        fis.metrics = Metrics(sample_every)
+        try:
+            results[name] = _latency(measure(infer))
+        finally:
+            fis.metrics = None
+    return results
+
+
+def bench_batch(fis: FuzzyInferenceSystem, size: int = 100000) -> Dict[str, Dict[str, object]]:
+    """Пропускная способность пакетного вывода"""
+    rng = np.random.default_rng(0)
+    temperatures = rng.uniform(10, 30, size)
+    humidities = rng.uniform(20, 80, size)
+    seconds = measure(lambda: fis.infer_batch(temperatures, humidities), number=1)
+    results = {'infer_batch.throughput': _throughput(seconds / size, 'decisions/s', batch=size)}
+    with _override(fis, 'fan_defuzzification', 'centroid'):
+        seconds = measure(lambda: fis.infer_batch(temperatures, humidities), number=1)
+    results['infer_batch_centroid.throughput'] = _throughput(seconds / size, 'decisions/s', batch=size)
+    with _override(fis, 'inference', 'sugeno'):
+        seconds = measure(lambda: fis.infer_batch(temperatures, humidities), number=1)
+    results['infer_batch_sugeno.throughput'] = _throughput(seconds / size, 'decisions/s', batch=size)
+
+    # Один шаг управления с прогнозом для 500 цехов: нечеткий вывод и перебор кандидатов
+    from batch_simulation import BatchVentilationSimulator
+    from predictive import PredictiveController
+    simulator = BatchVentilationSimulator(fis, temperatures[:500], humidities[:500], rng.uniform(0, 2 * np.pi, 500),
+                                          predictive=PredictiveController())
+    mask = np.ones(500, dtype=bool)
+
+    def plan():
+        simulator.predictive.plan_batch(simulator, mask, fis.infer_batch(simulator.temperature, simulator.humidity))
+
+    results['predictive_step_500.latency'] = _result(measure(plan) * 1e3, 'ms', False, workshops=500,
+                                                     horizon=simulator.predictive.horizon)
+    return results
+
+
+def _run_scalar_steps(simulator, steps: int, visualizer=None):
+    """Шаги модели цеха как в VentilationSimulator.run, но без консоли и ожидания ввода"""
+    for step in range(1, steps + 1):
+        simulator.step = step
+        simulator.update_environment()
+        actions = simulator.fis.infer(simulator.temperature, simulator.humidity)
+        if visualizer is not None:
+            visualizer.update(step, simulator.temperature, simulator.humidity,
+                              actions['fan_speed'], actions['heater_state'])
+        simulator.apply_control_actions(actions['fan_speed'], actions['heater_state'])
+
+
+def bench_simulation(db_path: str, steps: int = 20000, workshops: int = 10000) -> Dict[str, Dict[str, object]]:
+    """Шаги симуляции в секунду: один цех без графиков, с графиками на Agg и пакет цехов"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from headless import HeadlessSimulation, generate_scenarios
+    from simulation import VentilationSimulator
+    from visualization import SimulationVisualizer
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = VentilationSimulator(temperature=12.0, humidity=75.0)
+    plt.close(simulator.visualizer.fig)
+    simulator.fis = FuzzyInferenceSystem(db_path)
+    simulator.fis.knowledge_base
+
+    results = {
+        'apply_control_actions.latency': _latency(measure(lambda: simulator.apply_control_actions(0.5, 1.0))),
+        'simulation.steps_per_s': _throughput(
+            measure(lambda: _run_scalar_steps(simulator, steps), number=1, repeat=3) / steps, 'steps/s'),
+    }
+
+    def plotted():
+        visualizer = SimulationVisualizer()
+        _run_scalar_steps(simulator, steps, visualizer)
+        plt.close(visualizer.fig)
+
+    results['simulation_agg.steps_per_s'] = _throughput(measure(plotted, number=1, repeat=3) / steps, 'steps/s')
+
+    scenarios = generate_scenarios(workshops, steps=15, seed=0)
+
+    def headless():
+        simulation = HeadlessSimulation(simulator.fis, scenarios)
+        statistics = simulation.run()
+        return int(statistics['total_steps'].sum())
+
+    workshop_steps = headless()
+    results['headless.workshop_steps_per_s'] = _throughput(
+        measure(headless, number=1, repeat=3) / workshop_steps, 'steps/s', workshops=workshops)
+    return results
+
+
+def bench_knowledge_base(directory: str, sizes=KB_SIZES) -> Dict[str, Dict[str, object]]:
+    """Время создания штатной базы, загрузки (компиляции) и импорта баз разного размера"""
+    results = {}
+    path = os.path.join(directory, 'init.db')
+
+    def initialize():
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_database(path)
+
+    results['init_database.time'] = _result(measure(initialize, number=1) * 1e3, 'ms', False)
+    for size in sizes:
+        path = os.path.join(directory, f'rules_{size}.db')
+        generate_knowledge_base(path, size)
+        seconds = measure(lambda: load_knowledge_base(path), number=1, repeat=3 if size >= 10000 else 5)
+        results[f'kb_load.rules_{size}'] = _result(seconds * 1e3, 'ms', False, rules=size)
+        # Импорт тех же правил новой версией (одна транзакция) с удалением предыдущей
+        _, rules = load_knowledge_base(path).to_rows()
+        seconds = measure(lambda: import_version(path, rules=rules, keep=1), number=1, repeat=3)
+        results[f'kb_import.rules_{size}'] = _result(seconds * 1e3, 'ms', False, rules=size)
+    return results
+
+
+def bench_startup(db_path: str, repeat: int = 5) -> Dict[str, Dict[str, object]]:
+    """Время запуска `python -m cli` в отдельном процессе и загружены ли тяжелые модули"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    commands = {
+        'python': ['-c', 'pass'],
+        'cli_help': ['-m', 'cli', '--help'],
+        'cli_infer': ['-m', 'cli', 'infer', '20', '50', '--db', os.path.abspath(db_path)],
+    }
+    probe = ('import runpy, sys; sys.argv = ["cli", "infer", "20", "50", "--db", sys.argv[1]]; '
+             'runpy.run_module("cli", run_name="__main__"); '
+             'print(",".join(name for name in ("numpy", "matplotlib") if name in sys.modules), file=sys.stderr)')
+    heavy = subprocess.run([sys.executable, '-c', probe, os.path.abspath(db_path)], cwd=directory,
+                           capture_output=True, text=True, check=True).stderr.strip()
+    heavy = heavy.split(',') if heavy else []
+
+    results = {}
+    for name, arguments in commands.items():
+        def run():
+            subprocess.run([sys.executable] + arguments, cwd=directory, capture_output=True, check=True)
+        info = {'limit': STARTUP_LIMITS_MS[name]} if name in STARTUP_LIMITS_MS else {}
+        if name == 'cli_infer':
+            info['heavy_modules'] = heavy
+        results[f'startup.{name}'] = _result(measure(run, number=1, repeat=repeat) * 1e3, 'ms', False, **info)
+    return results
+
+
+def run_benchmarks(db_path: str = 'knowledge_base.db', quick: bool = False,
+                   groups: Optional[List[str]] = None) -> Dict[str, object]:
+    """Прогон всех (или выбранных) групп замеров; результат - словарь для JSON"""
+    groups = groups or ['startup', 'primitives', 'batch', 'simulation', 'knowledge_base']
+    fis = FuzzyInferenceSystem(db_path)
+    results = {}
+    if 'startup' in groups:
+        results.update(bench_startup(db_path))
+    if 'primitives' in groups:
+        results.update(bench_primitives(fis))
+    if 'batch' in groups:
+        results.update(bench_batch(fis, 10000 if quick else 100000))
+    if 'simulation' in groups:
+        results.update(bench_simulation(db_path, 2000 if quick else 20000, 1000 if quick else 10000))
+    if 'knowledge_base' in groups:
+        with tempfile.TemporaryDirectory(prefix='fis-bench-') as directory:
+            results.update(bench_knowledge_base(directory, QUICK_KB_SIZES if quick else KB_SIZES))
+
+    return {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+        },
+        'quick': quick,
+        'results': results,
+    }
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, object]]:
+    """Замеры, ухудшившиеся относительно эталона больше допустимого"""
+    regressions = []
+    for name, reference in baseline.get('results', {}).items():
+        current = report['results'].get(name)
+        if current is None:
+            continue
+        limit = reference.get('tolerance', tolerance)
+        if reference['higher_is_better']:
+            change = reference['value'] / current['value'] - 1 if current['value'] else float('inf')
+        else:
+            change = current['value'] / reference['value'] - 1 if reference['value'] else 0.0
+        if change > limit:
+            regressions.append({'name': name, 'baseline': reference['value'], 'current': current['value'],
+                                'unit': current['unit'], 'slowdown': change, 'tolerance': limit})
+    return regressions
+
+
+def over_limit(report: Dict[str, object]) -> List[Dict[str, object]]:
+    """Замеры, вышедшие за собственную абсолютную границу (поле "limit"), без учета эталона"""
+    regressions = []
+    for name, current in report['results'].items():
+        if 'limit' in current and current['value'] > current['limit']:
+            regressions.append({'name': name, 'baseline': current['limit'], 'current': current['value'],
+                                'unit': current['unit'], 'slowdown': current['value'] / current['limit'] - 1,
+                                'tolerance': 0.0})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Замеры производительности нечеткого вывода и симуляции')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--output', help='файл для результатов в JSON (по умолчанию - stdout)')
+    parser.add_argument('--baseline', help='эталонные результаты для проверки на регрессии')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='допустимое ухудшение относительно эталона (доля)')
+    parser.add_argument('--quick', action='store_true', help='уменьшенные размеры для быстрой проверки')
+    parser.add_argument('--group', action='append',
+                        choices=['startup', 'primitives', 'batch', 'simulation', 'knowledge_base'],
+                        help='группа замеров (можно указать несколько раз)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.db, args.quick, args.group)
+    regressions = over_limit(report)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions += compare(report, json.load(f), args.tolerance)
+    if regressions or args.baseline:
+        report['regressions'] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    for regression in report.get('regressions', []):
+        print(f"Регрессия {regression['name']}: {regression['baseline']:.4g} -> {regression['current']:.4g} "
+              f"{regression['unit']} (хуже на {regression['slowdown']:.0%})", file=sys.stderr)
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+# Модули команд (NumPy, matplotlib, asyncio) импортируются внутри обработчиков, поэтому
+# короткий вызов вроде `python -m cli infer` загружает только нечеткий вывод и sqlite3
+
+
+def _init_db(args):
+    from init_database import init_database
+    init_database(args.db)
+
+
+def _attach_metrics(fis, args):
+    if args.metrics:
+        from metrics import Metrics
+        fis.metrics = Metrics()
+
+
+def _infer(args):
+    from fuzzy_system import FuzzyInferenceSystem
+    from simulation import is_comfortable_zone
+
+    fis = FuzzyInferenceSystem(args.db, version=args.kb_version)
+    _attach_metrics(fis, args)
+    if args.centroid:
+        fis.fan_defuzzification = 'centroid'
+    if args.sugeno:
+        fis.inference = 'sugeno'
+    if args.explain:
+        explanation = fis.explain(args.temperature, args.humidity)
+        print(explanation.render())
+    else:
+        decision = fis.infer(args.temperature, args.humidity)
+        decision['comfortable'] = is_comfortable_zone(args.temperature, args.humidity)
+        print(json.dumps(decision, ensure_ascii=False))
+    if fis.metrics is not None:
+        fis.metrics.write(args.metrics)
+
+
+def _simulate(args):
+    if args.headless:
+        from headless import main as headless_main
+        predictive = ['--predictive', '--horizon', str(args.horizon)] if args.predictive else []
+        headless_main(['--db', args.db, '--steps', str(args.steps)] + predictive + args.extra)
+        return
+    from simulation import VentilationSimulator
+    simulator = VentilationSimulator(args.record, args.temperature, args.humidity, db_path=args.db)
+    _attach_metrics(simulator.fis, args)
+    if args.predictive:
+        from predictive import PredictiveController
+        simulator.predictive = PredictiveController(args.horizon)
+    try:
+        simulator.run(steps=args.steps)
+    finally:
+        if simulator.fis.metrics is not None:
+            simulator.fis.metrics.write(args.metrics)
+
+
+def _import_kb(args):
+    from kb_import import main as import_main
+    import_main(['--db', args.db] + args.extra)
+
+
+def _benchmark(args):
+    from benchmark import main as benchmark_main
+    benchmark_main(['--db', args.db] + args.extra)
+
+
+def _replay(args):
+    from sensor_log import main as replay_main
+    replay_main(['--db', args.db] + args.extra)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Нечеткое управление вентиляцией цеха')
+    parser.add_argument('--timings', action='store_true', help='вывести время запуска и выполнения в stderr')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = subparsers.add_parser('init-db', help='создать базу знаний со штатными множествами и правилами')
+    init_parser.add_argument('--db', default='knowledge_base.db')
+    init_parser.set_defaults(handler=_init_db)
+
+    import_parser = subparsers.add_parser(
+        'import-kb', add_help=False, help='импорт новой версии базы знаний из CSV/JSON; аргументы - как у kb_import.py')
+    import_parser.add_argument('--db', default='knowledge_base.db')
+    import_parser.set_defaults(handler=_import_kb)
+
+    infer_parser = subparsers.add_parser('infer', help='одно решение регулятора (JSON)')
+    infer_parser.add_argument('temperature', type=float)
+    infer_parser.add_argument('humidity', type=float)
+    infer_parser.add_argument('--db', default='knowledge_base.db')
+    infer_parser.add_argument('--kb-version', type=int, help='версия базы знаний (иначе - последняя)')
+    infer_parser.add_argument('--centroid', action='store_true', help='дефаззификация вентилятора центроидом')
+    infer_parser.add_argument('--sugeno', action='store_true', help='вывод Такаги-Сугено (линейные заключения)')
+    infer_parser.add_argument('--explain', action='store_true', help='подробное объяснение вместо JSON')
+    infer_parser.add_argument('--metrics', help='файл метрик этапов (.prom - формат Prometheus, иначе JSON)')
+    infer_parser.set_defaults(handler=_infer)
+
+    simulate_parser = subparsers.add_parser(
+        'simulate', help='интерактивная симуляция с графиками или пакетный прогон (--headless)')
+    simulate_parser.add_argument('--db', default='knowledge_base.db')
+    simulate_parser.add_argument('--steps', type=int, default=15)
+    simulate_parser.add_argument('--temperature', type=float, help='начальная температура (иначе - ввод)')
+    simulate_parser.add_argument('--humidity', type=float, help='начальная влажность (иначе - ввод)')
+    simulate_parser.add_argument('--record', help='каталог для записи траектории')
+    simulate_parser.add_argument('--predictive', action='store_true', help='управление с прогнозом')
+    simulate_parser.add_argument('--horizon', type=int, default=4, help='горизонт прогноза, шагов')
+    simulate_parser.add_argument('--metrics', help='файл метрик этапов (.prom - формат Prometheus, иначе JSON)')
+    simulate_parser.add_argument('--headless', action='store_true',
+                                 help='прогон сценариев без графиков; остальные аргументы - как у headless.py')
+    simulate_parser.set_defaults(handler=_simulate)
+
+    replay_parser = subparsers.add_parser(
+        'replay', add_help=False, help='прогон журнала датчиков через регулятор; аргументы - как у sensor_log.py')
+    replay_parser.add_argument('--db', default='knowledge_base.db')
+    replay_parser.set_defaults(handler=_replay)
+
+    benchmark_parser = subparsers.add_parser('benchmark', add_help=False,
+                                             help='замеры производительности; аргументы - как у benchmark.py')
+    benchmark_parser.add_argument('--db', default='knowledge_base.db')
+    benchmark_parser.set_defaults(handler=_benchmark)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    # Неизвестные аргументы передаются только командам, которые делегируют разбор другому модулю
+    if extra and not (args.command in ('import-kb', 'benchmark', 'replay') or (args.command == 'simulate' and args.headless)):
+        parser.error(f"нераспознанные аргументы: {' '.join(extra)}")
+    args.extra = extra
+
+    dispatched = time.perf_counter()
+    args.handler(args)
+    if args.timings:
+        finished = time.perf_counter()
+        print(f"Запуск: {(dispatched - _STARTED) * 1e3:.1f} мс, команда: {(finished - dispatched) * 1e3:.1f} мс, "
+              f"модулей загружено: {len(sys.modules)}, NumPy: {'да' if 'numpy' in sys.modules else 'нет'}, "
+              f"matplotlib: {'да' if 'matplotlib' in sys.modules else 'нет'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import abc
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch_simulation import BatchVentilationSimulator
+from fuzzy_system import FuzzyInferenceSystem
+from ontology import PlantTopology, load_topology
+
+
+class SensorReading:
+    """Показание датчика цеха: kind - 'temperature' (TemperatureSensor) или 'humidity' (HumiditySensor)"""
+
+    __slots__ = ('workshop', 'kind', 'value', 'timestamp')
+
+    def __init__(self, workshop: str, kind: str, value: float, timestamp: Optional[float] = None):
+        self.workshop = workshop
+        self.kind = kind
+        self.value = value
+        # Момент получения показания (time.perf_counter); от него отсчитывается задержка решения
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+
+
+class ActuatorGateway(abc.ABC):
+    """Отправка команд исполнительным устройствам (Fan, Heater) пачкой по нескольким цехам"""
+
+    @abc.abstractmethod
+    async def dispatch(self, workshops: Sequence[str], fan_speeds: np.ndarray, heater_states: np.ndarray):
+        """Отправка команд цехам workshops; массивы - в том же порядке"""
+
+
+class LatencyTracker:
+    """Задержки решений в кольцевом буфере фиксированного размера и перцентили по ним"""
+
+    def __init__(self, window: int = 100000):
+        self._samples = np.zeros(window)
+        self._position = 0
+        self.count = 0
+
+    def add(self, latencies: np.ndarray):
+        latencies = latencies[-len(self._samples):]
+        n = len(latencies)
+        first = min(n, len(self._samples) - self._position)
+        self._samples[self._position:self._position + first] = latencies[:first]
+        self._samples[:n - first] = latencies[first:]
+        self._position = (self._position + n) % len(self._samples)
+        self.count += n
+
+    def percentiles(self) -> Dict[str, float]:
+        samples = self._samples[:min(self.count, len(self._samples))]
+        if not len(samples):
+            return {'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {'p50_ms': p50 * 1000, 'p99_ms': p99 * 1000, 'max_ms': float(samples.max()) * 1000}
+
+
+class ControlService:
+    """Асинхронный контур управления множеством цехов с микропакетным нечетким выводом.
+
+    Показания датчиков принимаются конкурентно через submit(). Цех с новым показанием ставится
+    в очередь на решение; очередь собирается в пакет, пока не наберется max_batch цехов или
+    не истечет max_delay с момента поступления самого старого показания. Пакет считается одним
+    вызовом controller (по умолчанию FuzzyInferenceSystem.infer_batch), команды отправляются
+    через ActuatorGateway. Пакет, на котором controller или отправка команд завершились ошибкой,
+    отбрасывается и учитывается в failed_batches / dropped (последняя ошибка - last_error):
+    решения для его цехов будут приняты по их следующим показаниям, а контур продолжает работу.
+    """
+
+    def __init__(self, fis: FuzzyInferenceSystem, actuators: ActuatorGateway, max_batch: int = 4096,
+                 max_delay: float = 0.002, controller: Optional[Callable] = None, latency_window: int = 100000):
+        self.fis = fis
+        self.actuators = actuators
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.controller = controller or fis.infer_batch
+
+        self._temperature: Dict[str, float] = {}
+        self._humidity: Dict[str, float] = {}
+        # Цех -> момент поступления самого старого еще не обработанного показания
+        self._pending: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.latency = LatencyTracker(latency_window)
+        self.batches = 0
+        self.decisions = 0
+        self.readings = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.last_error: Optional[BaseException] = None
+
+    async def submit(self, reading: SensorReading):
+        """Прием показания; решение будет принято, когда известны и температура, и влажность цеха.
+
+        Если цикл обработки запущен и завершился с ошибкой, показание не принимается (RuntimeError):
+        иначе очередь росла бы без решений до самой остановки.
+        """
+        task = self._task
+        if task is not None and task.done() and not task.cancelled() and task.exception() is not None:
+            raise RuntimeError("Цикл обработки сервиса управления завершился с ошибкой") from task.exception()
+        self.readings += 1
+        if reading.kind == 'temperature':
+            self._temperature[reading.workshop] = reading.value
+        elif reading.kind == 'humidity':
+            self._humidity[reading.workshop] = reading.value
+        else:
+            raise ValueError(f"Неизвестный тип датчика: {reading.kind}")
+
+        workshop = reading.workshop
+        if workshop in self._pending or workshop not in self._temperature or workshop not in self._humidity:
+            return
+        self._pending[workshop] = reading.timestamp
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    def start(self) -> asyncio.Task:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """Остановка после обработки уже принятых показаний.
+
+        Задача не отменяется: отправляемый пакет доходит до исполнительных устройств,
+        а оставшаяся очередь обрабатывается пакетами по max_batch цехов.
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._full.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            await self._wakeup.wait()
+            if not self._pending:
+                # Разбужены остановкой при пустой очереди
+                continue
+            # Ждем заполнения пакета, но не дольше срока самого старого показания
+            timeout = min(self._pending.values()) + self.max_delay - time.perf_counter()
+            if timeout > 0 and len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            await self._process_batch()
+        while self._pending:
+            await self._process_batch()
+
+    async def _process_batch(self):
+        pending = self._pending
+        workshops = list(pending)[:self.max_batch]
+        arrivals = np.array([pending.pop(workshop) for workshop in workshops])
+        if not pending:
+            self._wakeup.clear()
+        if len(pending) < self.max_batch:
+            self._full.clear()
+
+        temperatures = np.array([self._temperature[workshop] for workshop in workshops])
+        humidities = np.array([self._humidity[workshop] for workshop in workshops])
+        try:
+            actions = self.controller(temperatures, humidities)
+            await self.actuators.dispatch(workshops, actions['fan_speed'], actions['heater_state'])
+        except Exception as error:
+            self.failed_batches += 1
+            self.dropped += len(workshops)
+            self.last_error = error
+            return
+
+        self.latency.add(time.perf_counter() - arrivals)
+        self.batches += 1
+        self.decisions += len(workshops)
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики сервиса и перцентили задержки решения (от показания до отправки команды)"""
+        return dict(self.latency.percentiles(), readings=self.readings, decisions=self.decisions,
+                    batches=self.batches, mean_batch=self.decisions / self.batches if self.batches else 0.0,
+                    failed_batches=self.failed_batches, dropped=self.dropped)
+
+
+class SimulatedPlant:
+    """Имитация множества цехов для автономной нагрузочной проверки: модель BatchVentilationSimulator.
+
+    С топологией из онтологии (ontology.PlantTopology) цеха, их начальные показания и состав
+    исполнительных устройств берутся из нее, иначе создается workshops цехов со случайным состоянием.
+    """
+
+    def __init__(self, fis: FuzzyInferenceSystem, workshops: int = 0, seed: Optional[int] = None,
+                 step_period: float = 1.0, topology: Optional[PlantTopology] = None):
+        rng = np.random.default_rng(seed)
+        if topology is not None:
+            scenarios = topology.scenarios()
+            self.workshops: List[str] = [scenario.name for scenario in scenarios]
+            temperatures = [scenario.temperature for scenario in scenarios]
+            humidities = [scenario.humidity for scenario in scenarios]
+            fan_available = [scenario.fan for scenario in scenarios]
+            heater_available = [scenario.heater for scenario in scenarios]
+        else:
+            self.workshops = [f'workshop{i + 1}' for i in range(workshops)]
+            temperatures, humidities = rng.uniform(10, 30, workshops), rng.uniform(20, 80, workshops)
+            fan_available = heater_available = True
+        self.index = {workshop: i for i, workshop in enumerate(self.workshops)}
+        self.model = BatchVentilationSimulator(fis, temperatures, humidities,
+                                               external_phase=rng.uniform(0, 2 * np.pi, len(self.workshops)),
+                                               fan_available=fan_available, heater_available=heater_available)
+        # Один шаг модели внешнего климата соответствует step_period секундам реального времени
+        self.step_period = step_period
+        self._started = time.perf_counter()
+        self._rng = rng
+
+    def read(self, workshop: str, kind: str, noise: float = 0.0) -> float:
+        i = self.index[workshop]
+        value = self.model.temperature[i] if kind == 'temperature' else self.model.humidity[i]
+        return float(value + self._rng.normal(0, noise)) if noise else float(value)
+
+    def apply(self, workshops: Sequence[str], fan_speeds: np.ndarray, heater_states: np.ndarray):
+        indices = np.array([self.index[workshop] for workshop in workshops])
+        self.model.step = int((time.perf_counter() - self._started) / self.step_period)
+        self.model.update_environment(indices)
+        self.model.apply_control_actions(indices, np.asarray(fan_speeds) * self.model.fan_available[indices],
+                                         np.asarray(heater_states) * self.model.heater_available[indices])
+
+
+class SimulatedActuators(ActuatorGateway):
+    """Исполнительные устройства, применяющие команды к SimulatedPlant"""
+
+    def __init__(self, plant: SimulatedPlant):
+        self.plant = plant
+        self.commands = 0
+
+    async def dispatch(self, workshops: Sequence[str], fan_speeds: np.ndarray, heater_states: np.ndarray):
+        self.plant.apply(workshops, fan_speeds, heater_states)
+        self.commands += len(workshops)
+
+
+async def simulated_sensor(service: ControlService, plant: SimulatedPlant, workshop: str, kind: str,
+                           period: float, noise: float = 0.05):
+    """Датчик, периодически (со случайным сдвигом фазы) отправляющий показания в сервис"""
+    await asyncio.sleep(period * np.random.random())
+    while True:
+        await service.submit(SensorReading(workshop, kind, plant.read(workshop, kind, noise)))
+        await asyncio.sleep(period)
+
+
+async def run_load_test(db_path: str = 'knowledge_base.db', workshops: int = 1000, duration: float = 5.0,
+                        period: float = 0.1, max_batch: int = 4096, max_delay: float = 0.002,
+                        seed: Optional[int] = None, ontology: Optional[str] = None,
+                        kb_version: Optional[int] = None) -> Dict[str, float]:
+    """Нагрузочная проверка: по два датчика на цех, каждый шлет показания раз в period секунд.
+
+    С файлом онтологии ontology цеха и их датчики берутся из него, а не генерируются; kb_version -
+    закрепленная версия базы знаний (импорт новых версий во время проверки на вывод не влияет).
+    """
+    fis = FuzzyInferenceSystem(db_path, version=kb_version)
+    topology = load_topology(ontology) if ontology else None
+    plant = SimulatedPlant(fis, workshops, seed, topology=topology)
+    actuators = SimulatedActuators(plant)
+    service = ControlService(fis, actuators, max_batch=max_batch, max_delay=max_delay)
+    service.start()
+
+    if topology is not None:
+        readings = [(workshop.name, sensor.kind) for workshop in topology.workshops for sensor in workshop.sensors
+                    if sensor.kind in ('temperature', 'humidity')]
+    else:
+        readings = [(workshop, kind) for workshop in plant.workshops for kind in ('temperature', 'humidity')]
+    sensors = [asyncio.create_task(simulated_sensor(service, plant, workshop, kind, period))
+               for workshop, kind in readings]
+    await asyncio.sleep(duration)
+    for sensor in sensors:
+        sensor.cancel()
+    await asyncio.gather(*sensors, return_exceptions=True)
+    await service.stop()
+
+    stats = service.stats()
+    stats['commands'] = actuators.commands
+    stats['in_comfort_zone'] = float(plant.model.is_comfortable_zone().mean())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочная проверка асинхронного контура управления')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--workshops', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--period', type=float, default=0.1, help='период опроса датчика, с')
+    parser.add_argument('--max-batch', type=int, default=4096)
+    parser.add_argument('--max-delay', type=float, default=0.002, help='предельное ожидание пакета, с')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--ontology', help='онтология цеха (.ttl) вместо случайных цехов')
+    parser.add_argument('--kb-version', type=int, help='закрепленная версия базы знаний (иначе - последняя)')
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_load_test(args.db, args.workshops, args.duration, args.period,
+                                      args.max_batch, args.max_delay, args.seed, args.ontology, args.kb_version))
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import math
+from typing import Dict, List, Sequence, Tuple
+
+# Узлы двухточечной квадратуры Гаусса-Лежандра на отрезке [-1/2, 1/2] (в долях длины отрезка):
+# интеграл многочлена степени до 3 вычисляется точно
+GAUSS_NODE = 0.5 / math.sqrt(3.0)
+
+
+def _edges(params: Tuple[float, float, float, float]) -> List[Tuple[float, float, float, float]]:
+    """Наклонные стороны трапеции как прямые y = slope * x + intercept на [x0, x1]"""
+    a, b, c, d = params
+    edges = []
+    if b > a:
+        edges.append((a, b, 1.0 / (b - a), -a / (b - a)))
+    if d > c:
+        edges.append((c, d, -1.0 / (d - c), d / (d - c)))
+    return edges
+
+
+class CentroidDefuzzifier:
+    """Центроид (метод Мамдани) выходной переменной с трапециевидными множествами.
+
+    Агрегированная функция max_k min(alpha_k, T_k(x)) кусочно-линейна. Ее изломы - точки
+    трапеций, пересечения сторон разных трапеций и точки, где сторона трапеции достигает
+    уровня отсечения какого-либо терма. Между соседними изломами интегралы функции и x * функции
+    считаются точно квадратурой Гаусса, без дискретизации области выхода.
+    """
+
+    def __init__(self, names: Sequence[str], params: Sequence[Tuple[float, float, float, float]]):
+        self.names = tuple(names)
+        self.params = tuple(params)
+        self.edges = [_edges(p) for p in self.params]
+        # Вершины трапеции и прямые (slope, intercept) ее возрастающей и убывающей сторон
+        self.pieces = []
+        for a, b, c, d in self.params:
+            rising = (1.0 / (b - a), -a / (b - a)) if b > a else (0.0, 1.0)
+            falling = (-1.0 / (d - c), d / (d - c)) if d > c else (0.0, 1.0)
+            self.pieces.append((a, b, c, d, rising, falling))
+        # Имя -> индекс множества (при дублировании имени - последнее)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # Точки, не зависящие от уровней отсечения: вершины трапеции и пересечения ее сторон
+        # со сторонами каждой другой трапеции
+        self.own_points = [tuple(p) for p in self.params]
+        self.pair_points: Dict[Tuple[int, int], Tuple[float, ...]] = {}
+        for i in range(len(self.params)):
+            for j in range(i + 1, len(self.params)):
+                points = []
+                for x0, x1, slope, intercept in self.edges[i]:
+                    for u0, u1, other_slope, other_intercept in self.edges[j]:
+                        if slope == other_slope:
+                            continue
+                        x = (other_intercept - intercept) / (slope - other_slope)
+                        if max(x0, u0) <= x <= min(x1, u1):
+                            points.append(x)
+                self.pair_points[i, j] = tuple(points)
+
+    def term_indices(self, terms: Sequence[str]) -> List[int]:
+        """Индексы выходных множеств для термов заключений (при дублировании имени - последнее)"""
+        indices = []
+        for term in terms:
+            if term not in self.index:
+                raise ValueError(f"Для терма '{term}' нет выходного множества")
+            indices.append(self.index[term])
+        return indices
+
+    def _points(self, fired: List[Tuple[int, float]]) -> List[float]:
+        points = []
+        for position, (i, own_level) in enumerate(fired):
+            points.extend(self.own_points[i])
+            for j, _ in fired[position + 1:]:
+                points.extend(self.pair_points[min(i, j), max(i, j)])
+            # Стороны трапеции i на уровнях отсечения сработавших термов; выше собственного
+            # уровня отсечения трапеция i не поднимается
+            for x0, x1, slope, intercept in self.edges[i]:
+                for _, level in fired:
+                    if level <= own_level:
+                        points.append((level - intercept) / slope)
+        return sorted(set(points))
+
+    def centroid(self, fuzzy_output: Dict[str, float]) -> float:
+        """Центр тяжести агрегированного выходного множества; 0.0, если площадь нулевая"""
+        indices = self.term_indices(list(fuzzy_output))
+        levels: Dict[int, float] = {}
+        for i, level in zip(indices, fuzzy_output.values()):
+            if level > 0:
+                levels[i] = max(levels.get(i, 0.0), min(float(level), 1.0))
+        fired = list(levels.items())
+        if not fired:
+            return 0.0
+
+        pieces = [self.pieces[i] + (level,) for i, level in fired]
+        area = 0.0
+        moment = 0.0
+        points = self._points(fired)
+        for x0, x1 in zip(points, points[1:]):
+            # Между изломами функция совпадает с одной прямой: находим ее по середине отрезка
+            x = (x0 + x1) / 2
+            y = 0.0
+            slope = intercept = 0.0
+            for a, b, c, d, rising, falling, level in pieces:
+                if a < x < d:
+                    line = rising if x < b else falling if x > c else (0.0, 1.0)
+                    membership = line[0] * x + line[1]
+                    if membership > level:
+                        membership, line = level, (0.0, level)
+                    if membership > y:
+                        y = membership
+                        slope, intercept = line
+            if y > 0:
+                square = x1 * x1 - x0 * x0
+                area += slope * square / 2 + intercept * (x1 - x0)
+                moment += slope * (x1 * x1 * x1 - x0 * x0 * x0) / 3 + intercept * square / 2
+        return moment / area if area > 0 else 0.0
+
+    def centroid_batch(self, terms: Sequence[str], levels):
+        """Центроиды для уровней активации формы (число термов, *форма входа), термы в порядке terms"""
+        import numpy as np
+
+        indices = self.term_indices(terms)
+        levels = np.asarray(levels, dtype=float)
+        shape = levels.shape[1:]
+        levels = levels.reshape(len(indices), -1)
+        # Уровень отсечения каждого выходного множества (несколько термов могут ссылаться на одно)
+        clipped: Dict[int, np.ndarray] = {}
+        for i, term_levels in zip(indices, levels):
+            term_levels = np.clip(term_levels, 0.0, 1.0)
+            clipped[i] = np.maximum(clipped[i], term_levels) if i in clipped else term_levels
+        # Множества, не сработавшие ни в одной точке пакета, не влияют на результат
+        fired = [(i, level) for i, level in clipped.items() if level.any()]
+        size = levels.shape[1]
+        if not fired or size == 0:
+            return np.zeros(shape)
+
+        static_points = []
+        dynamic_points = []
+        for position, (i, own_level) in enumerate(fired):
+            static_points.extend(self.own_points[i])
+            for j, _ in fired[position + 1:]:
+                static_points.extend(self.pair_points[min(i, j), max(i, j)])
+            for x0, x1, slope, intercept in self.edges[i]:
+                for j, level in fired:
+                    # Уровень выше собственного дает точку отсечения самой трапеции i,
+                    # а уровень 0 - ее вершину; лишние точки лишь добавляют отрезки нулевой длины
+                    if j != i:
+                        level = np.minimum(level, own_level)
+                    dynamic_points.append((level - intercept) / slope)
+        static_points = np.unique(static_points)
+        points = np.concatenate([np.broadcast_to(static_points[:, None], (len(static_points), size)),
+                                 np.array(dynamic_points).reshape(-1, size)])
+        points.sort(axis=0)
+
+        lengths = np.diff(points, axis=0)
+        middles = (points[1:] + points[:-1]) / 2
+        area = np.zeros(size)
+        moment = np.zeros(size)
+        for sign in (-1.0, 1.0):
+            x = middles + sign * GAUSS_NODE * lengths
+            y = np.zeros_like(x)
+            for i, level in fired:
+                a, b, c, d = self.params[i]
+                # Узлы лежат строго внутри отрезков между изломами, поэтому значения
+                # в точках разрыва (вертикальные стороны) не используются
+                membership = np.interp(x, [a, b, c, d], [0.0, 1.0, 1.0, 0.0], left=0.0, right=0.0)
+                np.maximum(y, np.minimum(membership, level), out=y)
+            area += (y * lengths).sum(axis=0) / 2
+            moment += (x * y * lengths).sum(axis=0) / 2
+        result = np.divide(moment, area, out=np.zeros(size), where=area > 0)
+        return result.reshape(shape)
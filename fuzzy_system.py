@@ -1,13 +1,68 @@
-import sqlite3
-import numpy as np
-from typing import Dict, List, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from knowledge_base import SUGENO_OUTPUTS, CompiledKnowledgeBase, CompiledRule, FixedKnowledgeBase, KnowledgeBaseCache
+from tracing import InferenceExplanation, RuleTrace, Tracer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from metrics import Metrics
+
+# Переменная базы знаний, множества которой задают выход вентилятора в режиме центроида
+FAN_OUTPUT_VARIABLE = 'fan_speed'
+
+# Ограничение размера матрицы истинности (правила x точки) за один шаг пакетного вывода Такаги-Сугено
+# и наименьшее число точек в шаге (при большой базе матрица делится и по правилам)
+SUGENO_CHUNK_ELEMENTS = 1 << 16
+SUGENO_MIN_CHUNK_POINTS = 1024
 
 
 class FuzzyInferenceSystem:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, knowledge_base: Optional[CompiledKnowledgeBase] = None,
+                 version: Optional[int] = None):
         self.db_path = db_path
         self.fan_speed_map = {'off': 0, 'slow': 0.33, 'medium': 0.66, 'high': 1.0}
         self.heater_map = {'off': 0, 'on': 1}
+        # Дефаззификация скорости вентилятора: 'singleton' - взвешенное среднее fan_speed_map,
+        # 'centroid' - центр тяжести выходных множеств переменной fan_speed из базы знаний
+        self.fan_defuzzification = 'singleton'
+        # Вывод: 'mamdani' - агрегация термов и дефаззификация, 'sugeno' - первый порядок Такаги-Сугено:
+        # каждый выход - среднее линейных заключений сработавших правил, взвешенное по их истинности
+        # (правило без заключения дает константу своего терма из fan_speed_map / heater_map)
+        self.inference = 'mamdani'
+        # Получатель объяснений решений (см. tracing); None - трассировка выключена и ничего не стоит
+        self.tracer: Optional[Tracer] = None
+        # Счетчики и гистограммы этапов (см. metrics); None - сбор выключен
+        self.metrics: Optional['Metrics'] = None
+        # База знаний компилируется при первом обращении и перезагружается только при изменении файла;
+        # заранее скомпилированная база knowledge_base используется как есть, без чтения файла,
+        # а закрепленная версия version не перезагружается вовсе (см. pin_knowledge_base)
+        if knowledge_base is not None:
+            self._kb_cache = FixedKnowledgeBase(knowledge_base)
+        else:
+            self._kb_cache = KnowledgeBaseCache(db_path, version)
+        self._kb_cache.listeners.append(self._on_knowledge_base_reload)
+
+    @property
+    def knowledge_base(self) -> CompiledKnowledgeBase:
+        """Актуальная скомпилированная база знаний"""
+        return self._kb_cache.get()
+
+    def reload_knowledge_base(self) -> CompiledKnowledgeBase:
+        """Принудительная перекомпиляция базы знаний"""
+        return self._kb_cache.reload(force=True)
+
+    def pin_knowledge_base(self, version: Optional[int]) -> CompiledKnowledgeBase:
+        """Закрепление версии базы знаний (None - снова следовать за последней версией)"""
+        if isinstance(self._kb_cache, FixedKnowledgeBase):
+            raise ValueError("База знаний задана заранее скомпилированной, версию закрепить нельзя")
+        self._kb_cache.version = version
+        return self._kb_cache.reload(force=True)
+
+    def _on_knowledge_base_reload(self, kb: CompiledKnowledgeBase, seconds: float):
+        if self.metrics is not None:
+            self.metrics.record_reload(self.db_path, len(kb.rules), seconds)
 
     def trapezoid_mf(self, x: float, a: float, b: float, c: float, d: float) -> float:
         """ИСПРАВЛЕННАЯ трапециевидная функция принадлежности"""
@@ -26,110 +81,259 @@ class FuzzyInferenceSystem:
         else:
             return 0.0
 
+    def trapezoid_mf_batch(self, x: 'np.ndarray', a, b, c, d) -> 'np.ndarray':
+        """Векторная трапециевидная функция принадлежности (те же ветви, что и в trapezoid_mf)"""
+        import numpy as np
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rising = (x - a) / (b - a)
+            falling = (d - x) / (d - c)
+        return np.select(
+            [x < a, (a <= x) & (x < b), (b <= x) & (x <= c), (c < x) & (x <= d)],
+            [0.0, rising, 1.0, falling],
+            default=0.0,
+        )
+
     def fuzzify(self, value: float, variable: str) -> Dict[str, float]:
         """Фаззификация - преобразование четкого значения в нечеткое"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        kb = self.knowledge_base
+        return self._fuzzify(kb, variable, self._memberships(kb, value, variable))
 
-        cursor.execute('''
-        SELECT set_name, a, b, c, d FROM fuzzy_sets 
-        WHERE variable_name = ?
-        ''', (variable,))
+    def _memberships(self, kb: CompiledKnowledgeBase, value: float, variable: str) -> List[float]:
+        """Степени принадлежности значения ко всем множествам переменной (в порядке базы знаний)"""
+        return [self.trapezoid_mf(value, a, b, c, d) for a, b, c, d in kb.set_params(variable)]
 
+    def _fuzzify(self, kb: CompiledKnowledgeBase, variable: str, memberships: List[float]) -> Dict[str, float]:
         result = {}
-        for set_name, a, b, c, d in cursor.fetchall():
-            membership = self.trapezoid_mf(value, a, b, c, d)
+        for set_name, membership in zip(kb.set_names(variable), memberships):
             if membership > 0:  # Показываем только ненулевые значения
                 result[set_name] = membership
-
-        conn.close()
         return result
 
     def infer(self, temperature: float, humidity: float) -> Dict[str, float]:
         """Нечеткий вывод - основная функция"""
-        # Шаг 1: Фаззификация
-        temp_fuzzy = self.fuzzify(temperature, 'temperature')
-        hum_fuzzy = self.fuzzify(humidity, 'humidity')
+        return self.infer_inputs({'temperature': temperature, 'humidity': humidity})
 
-        print("🎯 ФАЗЗИФИКАЦИЯ:")
-        print(f"   Температура {temperature}°C → {temp_fuzzy}")
-        print(f"   Влажность {humidity}% → {hum_fuzzy}")
+    def infer_inputs(self, inputs: Dict[str, float]) -> Dict[str, float]:
+        """Нечеткий вывод по произвольному набору входных переменных (имя переменной -> значение)"""
+        metrics = self.metrics
+        if metrics is not None and metrics.sample():
+            return self._infer_measured(metrics, inputs)
+        if self.tracer is not None:
+            explanation = self.explain_inputs(inputs)
+            self.tracer.trace(explanation)
+            return explanation.decision()
 
-        # Шаг 2: Получение правил из БД
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM rules ORDER BY priority DESC')
-        rules = cursor.fetchall()
-        conn.close()
+        kb = self.knowledge_base
+        if self.inference == 'sugeno':
+            return self._sugeno(kb, inputs, self._fired_rules(kb, self._active_sets(kb, inputs)))
+        fan_output, heater_output = self._evaluate_indexed(kb, inputs)
+        return {
+            'fan_speed': self._defuzzify_fan(kb, fan_output),
+            'heater_state': self.defuzzify_heater(heater_output)
+        }
 
-        # Шаг 3: Агрегация и активация правил
-        fan_output = {}
-        heater_output = {}
+    def _infer_measured(self, metrics: 'Metrics', inputs: Dict[str, float]) -> Dict[str, float]:
+        """infer_inputs с замером этапов; объяснение для tracer строится отдельно и замеряется как 'trace'"""
+        clock = time.perf_counter
+        started = clock()
+        kb = self.knowledge_base
+        checked = clock()
+        active = self._active_sets(kb, inputs)
+        fuzzified = clock()
+        counts = []
+        fired = self._fired_rules(kb, active, counts)
+        sugeno = self.inference == 'sugeno'
+        if not sugeno:
+            fan_output, heater_output = self._aggregate(kb, fired)
+        evaluated = clock()
+        if sugeno:
+            decision = self._sugeno(kb, inputs, fired)
+        else:
+            decision = {
+                'fan_speed': self._defuzzify_fan(kb, fan_output),
+                'heater_state': self.defuzzify_heater(heater_output)
+            }
+        finished = clock()
+        metrics.observe('kb_check', checked - started)
+        metrics.observe('fuzzify', fuzzified - checked)
+        metrics.observe('rules', evaluated - fuzzified)
+        metrics.observe('defuzzify', finished - evaluated)
+        metrics.observe('infer', finished - started)
+        metrics.observe_count('evaluated', counts[0])
+        metrics.observe_count('fired', counts[1])
+        if self.tracer is not None:
+            self.tracer.trace(self.explain_inputs(inputs))
+            metrics.observe('trace', clock() - finished)
+        return decision
 
-        print("\n📋 ПРОВЕРКА ПРАВИЛ:")
+    def explain(self, temperature: float, humidity: float) -> InferenceExplanation:
+        """Нечеткий вывод с полным объяснением: принадлежности, истинность правил, заключения"""
+        return self.explain_inputs({'temperature': temperature, 'humidity': humidity})
 
-        for rule in rules:
-            rule_id, cond_temp, cond_hum, act_fan, act_heater, priority = rule
+    def explain_inputs(self, inputs: Dict[str, float]) -> InferenceExplanation:
+        kb = self.knowledge_base
+        truth_levels = []
+        memberships, fan_output, heater_output = self._evaluate(kb, inputs, truth_levels)
+        rules = [RuleTrace(rule.rule_id, tuple((variable, set_name) for variable, set_name, _ in rule.antecedents),
+                           rule.fan_term, rule.heater_term, rule.priority, truth_level)
+                 for rule, truth_level in zip(kb.rules, truth_levels)]
+        if self.inference == 'sugeno':
+            decision = self._sugeno(kb, inputs, [(rule, truth_level) for rule, truth_level
+                                                 in zip(kb.rules, truth_levels) if truth_level > 0])
+        else:
+            decision = {'fan_speed': self._defuzzify_fan(kb, fan_output),
+                        'heater_state': self.defuzzify_heater(heater_output)}
+        return InferenceExplanation(
+            dict(inputs),
+            {variable: self._fuzzify(kb, variable, values) for variable, values in memberships.items()},
+            rules, fan_output, heater_output, decision['fan_speed'], decision['heater_state'],
+        )
 
-            # Формируем читаемое условие
-            condition_parts = []
-            if cond_temp:
-                condition_parts.append(f"temp={cond_temp}")
-            if cond_hum:
-                condition_parts.append(f"hum={cond_hum}")
-            condition_str = " И ".join(condition_parts) if condition_parts else "ВСЕГДА"
+    def _evaluate(self, kb: CompiledKnowledgeBase, inputs: Dict[str, float],
+                  truth_levels: Optional[List[float]] = None):
+        """Фаззификация, активация всех правил (min) и агрегация заключений (max).
 
-            # Формируем читаемое действие
-            action_parts = []
-            if act_fan:
-                action_parts.append(f"вентилятор={act_fan}")
-            if act_heater:
-                action_parts.append(f"обогреватель={act_heater}")
-            action_str = ", ".join(action_parts)
+        Полный перебор правил нужен для объяснения: в список truth_levels дописывается
+        истинность каждого правила. Обычный вывод идет через _evaluate_indexed.
+        """
+        # Шаг 1: Фаззификация
+        memberships = {variable: self._memberships(kb, value, variable) for variable, value in inputs.items()}
 
+        # Шаг 2: Активация скомпилированных правил (уже отсортированы по приоритету)
+        fired = []
+        for rule in kb.rules:
             # Вычисляем степень истинности условия
             truth_level = 1.0
+            for variable, _, set_index in rule.antecedents:
+                truth = memberships[variable][set_index] if set_index >= 0 and variable in memberships else 0
+                truth_level = min(truth_level, truth)
+            if truth_levels is not None:
+                truth_levels.append(truth_level)
+            if truth_level > 0:
+                fired.append((rule, truth_level))
+
+        # Шаг 3: Агрегация заключений
+        fan_output, heater_output = self._aggregate(kb, fired)
+        return memberships, fan_output, heater_output
+
+    def _evaluate_indexed(self, kb: CompiledKnowledgeBase, inputs: Dict[str, float]):
+        """То же, что _evaluate, но с посещением только сработавших правил.
+
+        Интервальный индекс носителей дает множества, ненулевые в точке входа; комбинации этих
+        множеств (по одному на переменную) ищутся в индексе правил kb.rules_by_key. Стоимость
+        растет с числом сработавших правил, а не с размером базы.
+        """
+        return self._fire_indexed(kb, self._active_sets(kb, inputs))
+
+    def _active_sets(self, kb: CompiledKnowledgeBase, inputs: Dict[str, float]) -> Dict[str, List[Tuple[int, float]]]:
+        """Шаг 1: Фаззификация только множеств, в носитель которых попадает значение"""
+        active = {}
+        for variable, value in inputs.items():
+            params = kb.set_params(variable)
+            sets = []
+            for set_index in kb.support_candidates(variable, value):
+                a, b, c, d = params[set_index]
+                membership = self.trapezoid_mf(value, a, b, c, d)
+                if membership > 0:
+                    sets.append((set_index, membership))
+            active[variable] = sets
+        return active
 
-            if cond_temp:
-                temp_truth = temp_fuzzy.get(cond_temp, 0)
-                truth_level = min(truth_level, temp_truth)
-            if cond_hum:
-                hum_truth = hum_fuzzy.get(cond_hum, 0)
-                truth_level = min(truth_level, hum_truth)
+    def _fire_indexed(self, kb: CompiledKnowledgeBase, active: Dict[str, List[Tuple[int, float]]],
+                      counts: Optional[List[int]] = None):
+        """Шаги 2-3 индексного вывода; в counts дописываются числа проверенных и сработавших правил"""
+        return self._aggregate(kb, self._fired_rules(kb, active, counts))
 
-            # Красивый вывод правила
-            status = "✅ СРАБОТАЛО" if truth_level > 0 else "❌ НЕ СРАБОТАЛО"
-            print(f"   Правило {rule_id}: ЕСЛИ {condition_str} ТО {action_str}")
-            print(f"        Приоритет: {priority}, Истинность: {truth_level:.2f} → {status}")
+    def _fired_rules(self, kb: CompiledKnowledgeBase, active: Dict[str, List[Tuple[int, float]]],
+                     counts: Optional[List[int]] = None) -> List[Tuple[CompiledRule, float]]:
+        """Шаг 2 индексного вывода: сработавшие правила и их истинность"""
+        # Шаг 2: Комбинации активных множеств, с которых начинается хотя бы одно правило
+        combinations = [((), 1.0)]
+        for variable in kb.rule_variables:
+            sets = active.get(variable)
+            if not sets:
+                continue
+            extended = []
+            for key, truth_level in combinations:
+                for set_index, membership in sets:
+                    extended_key = key + ((variable, set_index),)
+                    if extended_key in kb.rule_prefixes:
+                        extended.append((extended_key, min(truth_level, membership)))
+            combinations.extend(extended)
 
+        fired = [(rule, truth_level) for key, truth_level in combinations
+                 for rule in kb.rules_by_key.get(key, ())]
+        indexed = len(fired)
+        for rule in kb.unindexed_rules:
+            truth_level = 1.0
+            for variable, _, set_index in rule.antecedents:
+                truth_level = min(truth_level, dict(active.get(variable, ())).get(set_index, 0))
             if truth_level > 0:
-                # Активация заключений
-                if act_fan:
-                    current_value = fan_output.get(act_fan, 0)
-                    fan_output[act_fan] = max(current_value, truth_level)
+                fired.append((rule, truth_level))
+        if counts is not None:
+            # Найденные по индексу правила срабатывают всегда; правила вне индекса проверяются все
+            counts.extend((indexed + len(kb.unindexed_rules), len(fired)))
+        # Порядок полного перебора (по приоритету): от него зависит порядок сложения при дефаззификации
+        if len(fired) > 1:
+            fired.sort(key=lambda item: item[0].position)
+        return fired
 
-                if act_heater:
-                    current_value = heater_output.get(act_heater, 0)
-                    heater_output[act_heater] = max(current_value, truth_level)
+    def _aggregate(self, kb: CompiledKnowledgeBase, fired: List[Tuple[CompiledRule, float]]):
+        """Шаг 3: Агрегация заключений сработавших правил (max по каждому терму).
 
-        print(f"\n🎛 АКТИВИРОВАННЫЕ ДЕЙСТВИЯ:")
-        print(f"   Вентилятор: {fan_output}")
-        print(f"   Обогреватель: {heater_output}")
+        Термы идут в словарях в порядке срабатывания правил, как и в исходном выводе по таблице:
+        в этом порядке складываются слагаемые дефаззификации и печатаются заключения.
+        """
+        fan_output = {}
+        heater_output = {}
+        for rule, truth_level in fired:
+            if rule.fan_index >= 0:
+                fan_output[rule.fan_term] = max(fan_output.get(rule.fan_term, 0.0), truth_level)
+            if rule.heater_index >= 0:
+                heater_output[rule.heater_term] = max(heater_output.get(rule.heater_term, 0.0), truth_level)
+        return fan_output, heater_output
 
-        # Шаг 4: Дефаззификация
-        fan_result = self.defuzzify_fan(fan_output)
-        heater_result = self.defuzzify_heater(heater_output)
+    def _sugeno(self, kb: CompiledKnowledgeBase, inputs: Dict[str, float],
+                fired: List[Tuple[CompiledRule, float]]) -> Dict[str, float]:
+        """Выходы Такаги-Сугено по сработавшим правилам; ограничиваются диапазоном [0, 1] исполнительных устройств"""
+        self._check_sugeno_inputs(kb, inputs)
+        term_values = {'fan_speed': self.fan_speed_map, 'heater_state': self.heater_map}
+        decision = {}
+        for output, term_attribute in SUGENO_OUTPUTS.items():
+            numerator = 0.0
+            denominator = 0.0
+            for rule, truth_level in fired:
+                terms = [(variable, coefficient) for rule_output, variable, coefficient in rule.consequents
+                         if rule_output == output]
+                if terms:
+                    value = sum(coefficient * (1.0 if variable is None else float(inputs[variable]))
+                                for variable, coefficient in terms)
+                else:
+                    term = getattr(rule, term_attribute)
+                    if term is None or term not in term_values[output]:
+                        continue
+                    value = term_values[output][term]
+                numerator += truth_level * value
+                denominator += truth_level
+            decision[output] = min(max(numerator / denominator, 0.0), 1.0) if denominator > 0 else 0.0
+        return decision
 
-        return {
-            'fan_speed': fan_result,
-            'heater_state': heater_result
-        }
+    @staticmethod
+    def _check_sugeno_inputs(kb: CompiledKnowledgeBase, inputs: Dict[str, object]):
+        missing = [variable for variable in kb.sugeno_inputs if variable not in inputs]
+        if missing:
+            raise ValueError(f"Для линейных заключений правил нужны входы: {missing}")
 
     def defuzzify_fan(self, fuzzy_output: Dict[str, float]) -> float:
         """Дефаззификация для скорости вентилятора"""
+        return self._defuzzify_fan(self.knowledge_base, fuzzy_output)
+
+    def _defuzzify_fan(self, kb: CompiledKnowledgeBase, fuzzy_output: Dict[str, float]) -> float:
         if not fuzzy_output:
-            print("   Вентилятор: нет активированных правил → ВЫКЛ")
             return 0.0
+        if self.fan_defuzzification == 'centroid':
+            return kb.centroid_defuzzifier(FAN_OUTPUT_VARIABLE).centroid(fuzzy_output)
 
         numerator = 0.0
         denominator = 0.0
@@ -141,20 +345,282 @@ class FuzzyInferenceSystem:
             numerator += crisp_value * membership_val
             denominator += membership_val
 
-        result = numerator / denominator if denominator != 0 else 0.0
-        print(f"   Вентилятор: {fuzzy_output} → скорость {result:.2f}")
-        return result
+        return numerator / denominator if denominator != 0 else 0.0
 
     def defuzzify_heater(self, fuzzy_output: Dict[str, float]) -> float:
         """Дефаззификация для обогревателя"""
         if not fuzzy_output:
-            print("   Обогреватель: нет активированных правил → ВЫКЛ")
             return 0.0
 
         on_value = fuzzy_output.get('on', 0)
         off_value = fuzzy_output.get('off', 0)
 
-        result = 1.0 if on_value > off_value else 0.0
-        status = "ВКЛ" if result > 0.5 else "ВЫКЛ"
-        print(f"   Обогреватель: {fuzzy_output} → {status}")
-        return result
\ No newline at end of file
+        return 1.0 if on_value > off_value else 0.0
+
+    def infer_batch(self, temperatures, humidities) -> Dict[str, 'np.ndarray']:
+        """Пакетный нечеткий вывод по массивам входов; совпадает с infer поэлементно"""
+        return self.infer_inputs_batch({'temperature': temperatures, 'humidity': humidities})
+
+    def infer_inputs_batch(self, inputs: Dict[str, object]) -> Dict[str, 'np.ndarray']:
+        """Пакетный вывод по произвольному набору входных переменных (имя -> массив значений)"""
+        metrics = self.metrics
+        if metrics is not None and metrics.sample():
+            return self._infer_batch_measured(metrics, inputs)
+        kb = self.knowledge_base
+        if self.inference == 'sugeno':
+            return self._sugeno_batch(kb, inputs)
+        fan_sums = [] if self.fan_defuzzification == 'singleton' else None
+        fan_levels, heater_levels = self._rule_levels_batch(kb, inputs, fan_sums=fan_sums)
+
+        # Шаг 4: Дефаззификация
+        return {
+            'fan_speed': self._defuzzify_fan_batch(kb, fan_levels, fan_sums),
+            'heater_state': self._defuzzify_heater_batch(kb, heater_levels),
+        }
+
+    def _infer_batch_measured(self, metrics: 'Metrics', inputs: Dict[str, object]) -> Dict[str, 'np.ndarray']:
+        """infer_inputs_batch с замером этапов; пакет считается одним решением"""
+        started = time.perf_counter()
+        kb = self.knowledge_base
+        stats = {}
+        if self.inference == 'sugeno':
+            result = self._sugeno_batch(kb, inputs, stats)
+        else:
+            fan_sums = [] if self.fan_defuzzification == 'singleton' else None
+            fan_levels, heater_levels = self._rule_levels_batch(kb, inputs, stats, fan_sums)
+            evaluated = time.perf_counter()
+            result = {
+                'fan_speed': self._defuzzify_fan_batch(kb, fan_levels, fan_sums),
+                'heater_state': self._defuzzify_heater_batch(kb, heater_levels),
+            }
+            stats['defuzzify'] = time.perf_counter() - evaluated
+        finished = time.perf_counter()
+        metrics.observe('batch_fuzzify', stats['fuzzify'])
+        metrics.observe('batch_rules', stats['rules'])
+        metrics.observe('batch_defuzzify', stats['defuzzify'])
+        metrics.observe('batch_infer', finished - started)
+        metrics.observe_count('batch_evaluated', stats['evaluated'])
+        metrics.observe_count('batch_fired', stats['fired'])
+        return result
+
+    def _memberships_batch(self, kb: CompiledKnowledgeBase, inputs: Dict[str, object]):
+        """Шаг 1: Фаззификация - матрица (число множеств, *форма входа) на каждую переменную.
+
+        Возвращает входы, приведенные к общей форме, эту форму, матрицы принадлежности и
+        отметки множеств, ненулевых хотя бы в одной точке пакета.
+        """
+        import numpy as np
+
+        arrays = np.broadcast_arrays(*[np.asarray(values, dtype=float) for values in inputs.values()])
+        inputs = dict(zip(inputs, arrays))
+        memberships = {}
+        active = {}
+        for variable, values in inputs.items():
+            params = kb.param_array(variable).T.reshape((4, -1) + (1,) * values.ndim)
+            memberships[variable] = self.trapezoid_mf_batch(values, *params)
+            active[variable] = memberships[variable].reshape(len(params[0]), values.size).any(axis=1)
+        return inputs, arrays[0].shape, memberships, active
+
+    def _rule_levels_batch(self, kb: CompiledKnowledgeBase, inputs: Dict[str, object],
+                           stats: Optional[Dict[str, float]] = None,
+                           fan_sums: Optional[List[Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']]] = None
+                           ) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Степени активации термов вентилятора и обогревателя (формы (число термов, *форма входа)).
+
+        В stats, если он передан, записываются время фаззификации и активации правил ('fuzzify',
+        'rules') и числа проверенных и сработавших хотя бы в одной точке правил. В список fan_sums
+        дописываются суммы дефаззификации в порядке срабатывания термов (см. _ordered_fan_sums).
+        """
+        # NumPy нужен только пакетному выводу и не загружается при импорте модуля
+        import numpy as np
+
+        started = time.perf_counter() if stats is not None else 0.0
+        _, shape, memberships, active = self._memberships_batch(kb, inputs)
+        if stats is not None:
+            fuzzified = time.perf_counter()
+            stats.update(fuzzify=fuzzified - started, evaluated=0, fired=0)
+
+        # Шаг 2-3: Активация правил (min) и агрегация заключений (max); правила с множеством,
+        # нулевым во всем пакете, не дают вклада и пропускаются
+        fan_levels = np.zeros((len(kb.fan_terms),) + shape)
+        heater_levels = np.zeros((len(kb.heater_terms),) + shape)
+        for rule in kb.rules:
+            if not all(set_index >= 0 and variable in active and active[variable][set_index]
+                       for variable, _, set_index in rule.antecedents):
+                continue
+            truth_level = np.ones(shape)
+            for variable, _, set_index in rule.antecedents:
+                truth_level = np.minimum(truth_level, memberships[variable][set_index])
+            if stats is not None:
+                stats['evaluated'] += 1
+                stats['fired'] += bool(truth_level.any())
+            if rule.fan_index >= 0:
+                fan_levels[rule.fan_index] = np.maximum(fan_levels[rule.fan_index], truth_level)
+            if rule.heater_index >= 0:
+                heater_levels[rule.heater_index] = np.maximum(heater_levels[rule.heater_index], truth_level)
+        if fan_sums is not None:
+            fan_sums.append(self._ordered_fan_sums(kb, memberships, fan_levels))
+        if stats is not None:
+            stats['rules'] = time.perf_counter() - fuzzified
+        return fan_levels, heater_levels
+
+    def _ordered_fan_sums(self, kb: CompiledKnowledgeBase, memberships: Dict[str, 'np.ndarray'],
+                          fan_levels: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """Числитель и знаменатель дефаззификации синглтонов, сложенные в порядке срабатывания термов
+        (как в defuzzify_fan), в точках пакета, где сработали три терма и больше.
+
+        В остальных точках порядок не важен: сложение двух чисел коммутативно, а нулевые слагаемые
+        сумму не меняют. Правила проходятся по приоритету, и слагаемое терма добавляется там, где
+        впервые сработало правило с этим термом; правило сработало, если ненулевы принадлежности
+        всех его условий. Возвращает индексы точек в развернутом пакете и суммы в них.
+        """
+        import numpy as np
+
+        levels = fan_levels.reshape(len(kb.fan_terms), -1)
+        points = np.flatnonzero(np.count_nonzero(levels > 0, axis=0) > 2)
+        numerator = np.zeros(len(points))
+        denominator = np.zeros(len(points))
+        if not len(points):
+            return points, numerator, denominator
+        levels = levels[:, points]
+        products = np.array([self.fan_speed_map[term] for term in kb.fan_terms], dtype=float)[:, None] * levels
+        # Сработавшие термы, слагаемые которых еще не добавлены
+        pending = levels > 0
+        remaining = np.count_nonzero(pending)
+        nonzero = {}
+        for rule in kb.rules:
+            if rule.fan_index < 0:
+                continue
+            first = pending[rule.fan_index].copy()
+            for variable, _, set_index in rule.antecedents:
+                if set_index < 0 or variable not in memberships:
+                    break
+                key = (variable, set_index)
+                if key not in nonzero:
+                    values = memberships[variable].reshape(len(kb.set_names(variable)), -1)
+                    nonzero[key] = values[set_index, points] > 0
+                first &= nonzero[key]
+            else:
+                # Умножение на маску точно: слагаемое или 0.0
+                numerator += products[rule.fan_index] * first
+                denominator += levels[rule.fan_index] * first
+                pending[rule.fan_index] &= ~first
+                remaining -= np.count_nonzero(first)
+                if not remaining:
+                    break
+        return points, numerator, denominator
+
+    def _sugeno_batch(self, kb: CompiledKnowledgeBase, inputs: Dict[str, object],
+                      stats: Optional[Dict[str, float]] = None) -> Dict[str, 'np.ndarray']:
+        """Пакетный вывод Такаги-Сугено без цикла по правилам.
+
+        Истинность правил - матрица (правила, точки): выборка из матриц принадлежности по индексам
+        kb.antecedent_index и минимум по условиям. Выход - отношение матричных произведений:
+        (коэффициенты^T @ истинность) поэлементно на [1, входы] и (маска правил @ истинность).
+        Точки и правила обрабатываются кусками, чтобы матрица не превышала SUGENO_CHUNK_ELEMENTS.
+        В stats записываются те же поля, что и в _rule_levels_batch, и время взвешенных сумм ('defuzzify').
+        """
+        import numpy as np
+
+        self._check_sugeno_inputs(kb, inputs)
+        started = time.perf_counter()
+        inputs, shape, memberships, active = self._memberships_batch(kb, inputs)
+        size = int(np.prod(shape))
+        if size == 0:
+            if stats is not None:
+                stats.update(fuzzify=time.perf_counter() - started, rules=0.0, evaluated=0, fired=0, defuzzify=0.0)
+            return {output: np.zeros(shape) for output in SUGENO_OUTPUTS}
+        memberships = {variable: values.reshape(-1, size) for variable, values in memberships.items()}
+        fuzzified = time.perf_counter()
+
+        # Правила, все условия которых ненулевы хотя бы в одной точке пакета; за отметками множеств
+        # идут отметки "условия нет" (всегда выполнено) и "неизвестное множество" (не выполнено никогда)
+        live = np.ones(len(kb.rules), dtype=bool)
+        for variable in kb.rule_variables:
+            sets_active = active.get(variable, np.zeros(len(kb.set_names(variable)), dtype=bool))
+            live &= np.append(sets_active, [True, False])[kb.antecedent_index(variable)].all(axis=1)
+        rows = np.flatnonzero(live)
+        indexes = {variable: kb.antecedent_index(variable)[rows] for variable in kb.rule_variables}
+        term_values = {'fan_speed': self.fan_speed_map, 'heater_state': self.heater_map}
+        matrices = {}
+        for output in SUGENO_OUTPUTS:
+            coefficients, mask = kb.sugeno_matrix(output, term_values[output])
+            matrices[output] = (coefficients[rows], mask[rows].astype(float))
+        points = np.vstack([np.ones(size)] + [inputs[variable].reshape(size) for variable in kb.sugeno_inputs])
+
+        outputs = {output: np.zeros(size) for output in SUGENO_OUTPUTS}
+        firing_started = time.perf_counter()
+        padded = {}
+        for variable in indexes:
+            values = memberships.get(variable)
+            if values is None:
+                values = np.zeros((len(kb.set_names(variable)), size))
+            padded[variable] = np.vstack([values, np.ones(size), np.zeros(size)])
+        fired = np.zeros(len(rows), dtype=bool)
+        firing_seconds = time.perf_counter() - firing_started
+        chunk = min(size, max(SUGENO_MIN_CHUNK_POINTS, SUGENO_CHUNK_ELEMENTS // max(1, len(rows))))
+        block = max(1, SUGENO_CHUNK_ELEMENTS // max(1, chunk))
+        for start in range(0, size, chunk):
+            stop = min(start + chunk, size)
+            numerators = {output: np.zeros(stop - start) for output in SUGENO_OUTPUTS}
+            denominators = {output: np.zeros(stop - start) for output in SUGENO_OUTPUTS}
+            # Большая база делится еще и на блоки правил; суммы по блокам накапливаются
+            for first in range(0, len(rows), block):
+                last = min(first + block, len(rows))
+                block_started = time.perf_counter()
+                truth_level = np.ones((last - first, stop - start))
+                for variable, index in indexes.items():
+                    values = padded[variable][:, start:stop]
+                    for column in index[first:last].T:
+                        np.minimum(truth_level, values[column], out=truth_level)
+                if stats is not None:
+                    fired[first:last] |= truth_level.any(axis=1)
+                firing_seconds += time.perf_counter() - block_started
+
+                for output, (coefficients, mask) in matrices.items():
+                    numerators[output] += ((coefficients[first:last].T @ truth_level)
+                                           * points[:, start:stop]).sum(axis=0)
+                    denominators[output] += mask[first:last] @ truth_level
+            for output in SUGENO_OUTPUTS:
+                np.divide(numerators[output], denominators[output], out=outputs[output][start:stop],
+                          where=denominators[output] > 0)
+
+        result = {output: np.clip(values, 0.0, 1.0).reshape(shape) for output, values in outputs.items()}
+        if stats is not None:
+            stats.update(fuzzify=fuzzified - started, rules=firing_seconds, evaluated=len(rows),
+                         fired=int(fired.sum()),
+                         defuzzify=time.perf_counter() - fuzzified - firing_seconds)
+        return result
+
+    def _defuzzify_fan_batch(self, kb: CompiledKnowledgeBase, fan_levels: 'np.ndarray',
+                             fan_sums: Optional[List[Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']]] = None
+                             ) -> 'np.ndarray':
+        """Взвешенное среднее синглтонов; с fan_sums из _rule_levels_batch - до бита как в defuzzify_fan"""
+        import numpy as np
+
+        if self.fan_defuzzification == 'centroid':
+            return kb.centroid_defuzzifier(FAN_OUTPUT_VARIABLE).centroid_batch(kb.fan_terms, fan_levels)
+        numerator = np.zeros(fan_levels.shape[1:])
+        denominator = np.zeros(fan_levels.shape[1:])
+        for term, levels in zip(kb.fan_terms, fan_levels):
+            numerator += self.fan_speed_map[term] * levels
+            denominator += levels
+        if fan_sums:
+            points, ordered_numerator, ordered_denominator = fan_sums[0]
+            numerator.reshape(-1)[points] = ordered_numerator
+            denominator.reshape(-1)[points] = ordered_denominator
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+    def _defuzzify_heater_batch(self, kb: CompiledKnowledgeBase, heater_levels: 'np.ndarray') -> 'np.ndarray':
+        import numpy as np
+
+        return np.where(self._heater_margin_batch(kb, heater_levels) > 0, 1.0, 0.0)
+
+    def _heater_margin_batch(self, kb: CompiledKnowledgeBase, heater_levels: 'np.ndarray') -> 'np.ndarray':
+        """Перевес терма 'on' над 'off': обогреватель включен, когда значение положительно"""
+        import numpy as np
+
+        zeros = np.zeros(heater_levels.shape[1:])
+        on_value = heater_levels[kb.heater_terms.index('on')] if 'on' in kb.heater_terms else zeros
+        off_value = heater_levels[kb.heater_terms.index('off')] if 'off' in kb.heater_terms else zeros
+        return on_value - off_value
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch_simulation import DEFAULT_CLIMATE, BatchVentilationSimulator
+from fuzzy_system import FuzzyInferenceSystem
+from simulation import get_comfort_zone_bounds
+
+
+class Scenario:
+    """Сценарий симуляции: начальные условия, число шагов, внешний климат и комфортная зона"""
+
+    def __init__(self, temperature: float, humidity: float, steps: int = 15, name: str = '',
+                 external_phase: float = 0.0, climate: Optional[Dict[str, float]] = None,
+                 temp_bounds: Optional[Sequence[float]] = None, hum_bounds: Optional[Sequence[float]] = None,
+                 fan: bool = True, heater: bool = True):
+        default_temp_bounds, default_hum_bounds = get_comfort_zone_bounds()
+        self.name = name
+        self.temperature = float(temperature)
+        self.humidity = float(humidity)
+        self.steps = int(steps)
+        self.external_phase = float(external_phase)
+        # Параметры синусоидального внешнего климата (ключи DEFAULT_CLIMATE)
+        self.climate = dict(DEFAULT_CLIMATE, **(climate or {}))
+        unknown = set(self.climate) - set(DEFAULT_CLIMATE)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры климата: {sorted(unknown)}")
+        self.temp_bounds = tuple(temp_bounds or default_temp_bounds)
+        self.hum_bounds = tuple(hum_bounds or default_hum_bounds)
+        # Есть ли в цехе вентилятор и обогреватель (см. ontology.PlantTopology.scenarios)
+        self.fan = bool(fan)
+        self.heater = bool(heater)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Scenario':
+        return cls(**data)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'steps': self.steps,
+            'external_phase': self.external_phase,
+            'climate': dict(self.climate),
+            'temp_bounds': list(self.temp_bounds),
+            'hum_bounds': list(self.hum_bounds),
+            'fan': self.fan,
+            'heater': self.heater,
+        }
+
+
+def load_scenarios(path: str) -> List[Scenario]:
+    """Чтение сценариев из JSON: один объект, список объектов или {"scenarios": [...]}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('scenarios', [data])
+    return [Scenario.from_dict(item) for item in data]
+
+
+def save_scenarios(scenarios: Sequence[Scenario], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'scenarios': [scenario.to_dict() for scenario in scenarios]}, f, ensure_ascii=False, indent=2)
+
+
+def generate_scenarios(count: int, steps: int = 15, seed: Optional[int] = None) -> List[Scenario]:
+    """Случайные сценарии Монте-Карло в пределах, допустимых для интерактивного ввода"""
+    rng = np.random.default_rng(seed)
+    temperatures = rng.uniform(10, 30, count)
+    humidities = rng.uniform(20, 80, count)
+    phases = rng.uniform(0, 2 * np.pi, count)
+    return [Scenario(t, h, steps, name=f'mc-{i}', external_phase=p)
+            for i, (t, h, p) in enumerate(zip(temperatures, humidities, phases))]
+
+
+# Наблюдатель шага: (номер шага, маска работающих цехов, температуры и влажности до управления,
+# скорости вентилятора, состояния обогревателя)
+StepObserver = Callable[[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray], None]
+
+
+class HeadlessSimulation:
+    """Симуляция без stdin и matplotlib: набор сценариев шагает вместе в BatchVentilationSimulator"""
+
+    def __init__(self, fis: FuzzyInferenceSystem, scenarios: Sequence[Scenario], controller=None, predictive=None):
+        self.scenarios = list(scenarios)
+        self.steps = np.array([scenario.steps for scenario in self.scenarios])
+        self.simulator = BatchVentilationSimulator(
+            fis,
+            [scenario.temperature for scenario in self.scenarios],
+            [scenario.humidity for scenario in self.scenarios],
+            external_phase=[scenario.external_phase for scenario in self.scenarios],
+            temp_bounds=[scenario.temp_bounds for scenario in self.scenarios],
+            hum_bounds=[scenario.hum_bounds for scenario in self.scenarios],
+            controller=controller,
+            climate={key: [scenario.climate[key] for scenario in self.scenarios] for key in DEFAULT_CLIMATE},
+            fan_available=[scenario.fan for scenario in self.scenarios],
+            heater_available=[scenario.heater for scenario in self.scenarios],
+            predictive=predictive,
+        )
+
+    def run(self, observer: Optional[StepObserver] = None) -> Dict[str, np.ndarray]:
+        """Прогон до завершения всех сценариев; observer получает состояние каждого шага"""
+        simulator = self.simulator
+        while True:
+            temperatures, humidities = simulator.temperature.copy(), simulator.humidity.copy()
+            running = simulator.advance(self.steps)
+            if not running.any():
+                break
+            if observer is not None:
+                observer(simulator.step, running, temperatures, humidities,
+                         simulator.last_fan_speed, simulator.last_heater_state)
+        return simulator.statistics()
+
+
+def run_scenario(fis: FuzzyInferenceSystem, scenario: Scenario) -> Dict[str, list]:
+    """Одиночный сценарий с полной траекторией в формате истории SimulationVisualizer"""
+    trajectory = {'steps': [], 'temperatures': [], 'humidities': [], 'fan_speeds': [], 'heater_states': []}
+
+    def record(step, running, temperatures, humidities, fan_speeds, heater_states):
+        trajectory['steps'].append(step)
+        trajectory['temperatures'].append(float(temperatures[0]))
+        trajectory['humidities'].append(float(humidities[0]))
+        trajectory['fan_speeds'].append(float(fan_speeds[0]))
+        trajectory['heater_states'].append(float(heater_states[0]))
+
+    statistics = HeadlessSimulation(fis, [scenario]).run(record)
+    trajectory.update({key: values[0].item() for key, values in statistics.items()})
+    return trajectory
+
+
+# Система вывода создается в каждом рабочем процессе один раз и переиспользуется между пачками
+_worker_systems: Dict[str, FuzzyInferenceSystem] = {}
+
+
+def _run_chunk(db_path: str, scenario_dicts: List[Dict], predictive: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    fis = _worker_systems.get(db_path)
+    if fis is None:
+        fis = _worker_systems[db_path] = FuzzyInferenceSystem(db_path)
+    controller = None
+    if predictive is not None:
+        from predictive import PredictiveController
+        controller = PredictiveController(**predictive)
+    return HeadlessSimulation(fis, [Scenario.from_dict(item) for item in scenario_dicts], predictive=controller).run()
+
+
+def summarize(statistics: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """Сводка по достижению комфортной зоны для набора сценариев"""
+    total_steps = statistics['total_steps']
+    temp_margin, hum_margin = statistics['temp_margin'], statistics['hum_margin']
+    return {
+        'scenarios': int(total_steps.size),
+        'comfort_attained': float(statistics['in_comfort_zone'].mean()) if total_steps.size else 0.0,
+        'comfort_step_share': float(statistics['comfort_steps'].sum() / max(total_steps.sum(), 1)),
+        'mean_active_steps': float(statistics['active_steps'].mean()) if total_steps.size else 0.0,
+        'temp_margin_p50': float(np.percentile(temp_margin, 50)) if total_steps.size else 0.0,
+        'temp_margin_p95': float(np.percentile(temp_margin, 95)) if total_steps.size else 0.0,
+        'hum_margin_p50': float(np.percentile(hum_margin, 50)) if total_steps.size else 0.0,
+        'hum_margin_p95': float(np.percentile(hum_margin, 95)) if total_steps.size else 0.0,
+    }
+
+
+def run_sweep(scenarios: Sequence[Scenario], db_path: str = 'knowledge_base.db',
+              processes: Optional[int] = None, chunk_size: int = 1024,
+              predictive: Optional[Dict] = None) -> Dict[str, object]:
+    """Параллельный прогон сценариев пачками по процессам; возвращает сводку и статистику по сценариям.
+
+    Каждая пачка моделируется векторно в одном процессе, поэтому пропускная способность растет
+    с числом ядер, пока пачек не меньше, чем процессов. predictive - параметры PredictiveController
+    (словарь, возможно пустой) для режима с прогнозом.
+    """
+    db_path = os.path.abspath(db_path)
+    chunks = [[scenario.to_dict() for scenario in scenarios[start:start + chunk_size]]
+              for start in range(0, len(scenarios), chunk_size)]
+    if processes == 1 or len(chunks) <= 1:
+        results = [_run_chunk(db_path, chunk, predictive) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_run_chunk, [db_path] * len(chunks), chunks, [predictive] * len(chunks)))
+
+    if results:
+        statistics = {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+    else:
+        statistics = BatchVentilationSimulator(FuzzyInferenceSystem(db_path), np.empty(0), np.empty(0)).statistics()
+    return {'summary': summarize(statistics), 'statistics': statistics}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Пакетный прогон сценариев без графиков и ввода')
+    parser.add_argument('scenarios', nargs='?', help='JSON-файл со сценариями (по умолчанию - случайные)')
+    parser.add_argument('--ontology', help='онтология цеха (.ttl): по сценарию на каждый цех')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--count', type=int, default=10000, help='число случайных сценариев')
+    parser.add_argument('--steps', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--predictive', action='store_true', help='управление с прогнозом (predictive.py)')
+    parser.add_argument('--horizon', type=int, default=4, help='горизонт прогноза, шагов')
+    args = parser.parse_args(argv)
+
+    if args.ontology:
+        from ontology import load_topology
+        scenarios = load_topology(args.ontology).scenarios(args.steps)
+    elif args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        scenarios = generate_scenarios(args.count, args.steps, args.seed)
+    result = run_sweep(scenarios, args.db, args.processes, args.chunk_size,
+                       {'horizon': args.horizon} if args.predictive else None)
+    print(json.dumps(result['summary'], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,8 @@
-import sqlite3
+from knowledge_base import KB_TABLES, create_schema, insert_version, open_database, write_transaction
 
 
-def init_database():
-    conn = sqlite3.connect('knowledge_base.db')
-    cursor = conn.cursor()
-
-    # Таблица с нечеткими множествами
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS fuzzy_sets (
-        id INTEGER PRIMARY KEY,
-        variable_name TEXT NOT NULL,
-        set_name TEXT NOT NULL,
-        a REAL, b REAL, c REAL, d REAL
-    )
-    ''')
-
-    # Таблица правил
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS rules (
-        id INTEGER PRIMARY KEY,
-        condition_temp TEXT,
-        condition_humidity TEXT,
-        action_fan_speed TEXT,
-        action_heater_state TEXT,
-        priority INTEGER
-    )
-    ''')
-
-    # Очищаем таблицы
-    cursor.execute("DELETE FROM fuzzy_sets")
-    cursor.execute("DELETE FROM rules")
-
+def init_database(db_path: str = 'knowledge_base.db'):
+    """База знаний заново: схема с версиями (knowledge_base.SCHEMA), штатные множества и правила - версия 1"""
     # Обновите параметры нечетких множеств:
     temp_sets = [
         ('temperature', 'cold', 10, 10, 15, 17),  # было 10,10,16,18
@@ -44,8 +16,14 @@ def init_database():
         ('humidity', 'high', 65, 70, 100, 100)  # было 60,70,100,100
     ]
 
-    cursor.executemany('INSERT INTO fuzzy_sets VALUES (NULL, ?, ?, ?, ?, ?, ?)',
-                       temp_sets + humidity_sets)
+    # Выходные множества скорости вентилятора для дефаззификации центроидом (режим 'centroid');
+    # вершины совпадают со значениями fan_speed_map
+    fan_speed_sets = [
+        ('fan_speed', 'off', 0, 0, 0, 0.33),
+        ('fan_speed', 'slow', 0, 0.33, 0.33, 0.66),
+        ('fan_speed', 'medium', 0.33, 0.66, 0.66, 1.0),
+        ('fan_speed', 'high', 0.66, 1.0, 1.0, 1.0)
+    ]
 
     # В разделе с правилами добавьте:
     rules = [
@@ -63,12 +41,21 @@ def init_database():
         ('comfortable', None, 'off', 'off', 3),  # Выключение при комфортной температуре
     ]
 
-    cursor.executemany('''
-    INSERT INTO rules VALUES (NULL, ?, ?, ?, ?, ?)
-    ''', rules)
-
-    conn.commit()
-    conn.close()
+    rules = [(tuple((variable, set_name) for variable, set_name in (('temperature', temp), ('humidity', humidity))
+                    if set_name), fan_speed, heater_state, priority, ())
+             for temp, humidity, fan_speed, heater_state, priority in rules]
+
+    conn = open_database(db_path)
+    try:
+        # Пересоздание и заполнение - одна транзакция: читатели видят либо старую базу, либо новую.
+        # Таблицы прежней схемы (без версий, с колонками condition_temp/condition_humidity) удаляются.
+        with write_transaction(conn):
+            for table in KB_TABLES:
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+            create_schema(conn)
+            insert_version(conn, temp_sets + humidity_sets + fan_speed_sets, rules, 'init_database')
+    finally:
+        conn.close()
     print("База данных инициализирована!")
 
 
@@ -0,0 +1,126 @@
+import argparse
+import csv
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from knowledge_base import RuleRow, SetRow, import_version, list_versions
+
+# Колонки CSV множеств (как в таблице fuzzy_sets)
+SET_COLUMNS = ('variable_name', 'set_name', 'a', 'b', 'c', 'd')
+
+# Колонки заключений и приоритета в CSV правил. Колонки вида 'выход:переменная' - коэффициенты
+# линейного заключения Такаги-Сугено ('выход:1' - свободный член), остальные - условия по
+# одноименным переменным (пустая ячейка - условия или коэффициента нет)
+RULE_ACTION_COLUMNS = ('action_fan_speed', 'action_heater_state', 'priority')
+
+# Имя "переменной" свободного члена в колонках и в JSON
+CONSTANT_TERM = '1'
+
+
+def _set_row(record: Dict[str, object], where: str) -> SetRow:
+    try:
+        return (str(record['variable_name']), str(record['set_name']),
+                float(record['a']), float(record['b']), float(record['c']), float(record['d']))
+    except KeyError as error:
+        raise ValueError(f"{where}: нет поля {error}")
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"{where}: {error}")
+
+
+def _rule_row(conditions: Iterable[Tuple[str, str]], consequents: Iterable[Tuple[str, str, object]],
+              record: Dict[str, object], where: str) -> RuleRow:
+    try:
+        priority = int(record.get('priority') or 0)
+        consequents = tuple((str(output), None if variable == CONSTANT_TERM else str(variable), float(coefficient))
+                            for output, variable, coefficient in consequents)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"{where}: {error}")
+    return (tuple((str(variable), str(set_name)) for variable, set_name in conditions),
+            record.get('action_fan_speed') or None, record.get('action_heater_state') or None, priority,
+            consequents)
+
+
+def read_sets_csv(path: str) -> List[SetRow]:
+    """Множества из CSV с колонками SET_COLUMNS"""
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = set(SET_COLUMNS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"В заголовке {path} нет колонок: {sorted(missing)}")
+        return [_set_row(record, f"{path}, строка {reader.line_num}") for record in reader]
+
+
+def read_rules_csv(path: str) -> List[RuleRow]:
+    """Правила из CSV: колонки RULE_ACTION_COLUMNS, условия по входным переменным и коэффициенты 'выход:переменная'"""
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = [column for column in reader.fieldnames or () if column not in RULE_ACTION_COLUMNS]
+        variables = [column for column in columns if ':' not in column]
+        terms = [(column,) + tuple(column.split(':', 1)) for column in columns if ':' in column]
+        return [_rule_row(((variable, record[variable]) for variable in variables if record[variable]),
+                          ((output, variable, record[column]) for column, output, variable in terms if record[column]),
+                          record, f"{path}, строка {reader.line_num}") for record in reader]
+
+
+def read_json(path: str) -> Tuple[Optional[List[SetRow]], Optional[List[RuleRow]]]:
+    """Множества и правила из JSON вида {"fuzzy_sets": [...], "rules": [...]}.
+
+    Множество - объект с полями SET_COLUMNS; правило - объект с полями RULE_ACTION_COLUMNS,
+    conditions: {"переменная": "множество"} или [["переменная", "множество"], ...] и, для вывода
+    Такаги-Сугено, consequents: {"выход": {"переменная": коэффициент, "1": свободный член}}.
+    Отсутствующий раздел - None (берется из текущей версии базы).
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    fuzzy_sets = rules = None
+    if 'fuzzy_sets' in data:
+        fuzzy_sets = [_set_row(record, f"{path}, множество {number}")
+                      for number, record in enumerate(data['fuzzy_sets'], 1)]
+    if 'rules' in data:
+        rules = []
+        for number, record in enumerate(data['rules'], 1):
+            conditions = record.get('conditions') or {}
+            if isinstance(conditions, dict):
+                conditions = conditions.items()
+            consequents = [(output, variable, coefficient)
+                           for output, terms in (record.get('consequents') or {}).items()
+                           for variable, coefficient in terms.items()]
+            rules.append(_rule_row(conditions, consequents, record, f"{path}, правило {number}"))
+    return fuzzy_sets, rules
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Импорт множеств и правил как новой версии базы знаний')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--json', help='множества и/или правила в JSON')
+    parser.add_argument('--sets', help='множества в CSV')
+    parser.add_argument('--rules', help='правила в CSV')
+    parser.add_argument('--keep', type=int, help='сколько последних версий хранить')
+    parser.add_argument('--list', action='store_true', help='только вывести список версий')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print(json.dumps(list_versions(args.db), ensure_ascii=False, indent=2))
+        return
+    if not (args.json or args.sets or args.rules):
+        parser.error("нужен --json, --sets или --rules")
+
+    started = time.perf_counter()
+    fuzzy_sets, rules = read_json(args.json) if args.json else (None, None)
+    if args.sets:
+        fuzzy_sets = read_sets_csv(args.sets)
+    if args.rules:
+        rules = read_rules_csv(args.rules)
+    parsed = time.perf_counter()
+    sources = [path for path in (args.json, args.sets, args.rules) if path]
+    version = import_version(args.db, fuzzy_sets, rules, ', '.join(sources), args.keep)
+    finished = time.perf_counter()
+    print(json.dumps({'version': version, 'fuzzy_sets': None if fuzzy_sets is None else len(fuzzy_sets),
+                      'rules': None if rules is None else len(rules),
+                      'read_seconds': parsed - started, 'write_seconds': finished - parsed},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
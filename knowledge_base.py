@@ -0,0 +1,641 @@
+import bisect
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from defuzzification import CentroidDefuzzifier
+
+# Строка fuzzy_sets: (переменная, множество, a, b, c, d)
+SetRow = Tuple[str, str, float, float, float, float]
+# Слагаемое линейного заключения Такаги-Сугено: (выход, входная переменная или None - свободный член, коэффициент)
+ConsequentRow = Tuple[str, Optional[str], float]
+# Правило: (условия ((переменная, множество), ...), заключение вентилятора, обогревателя, приоритет,
+# линейные заключения (ConsequentRow, ...))
+RuleRow = Tuple[Tuple[Tuple[str, str], ...], Optional[str], Optional[str], int, Tuple[ConsequentRow, ...]]
+
+# Выходы вывода Такаги-Сугено и атрибут CompiledRule с термом, который задает выход правила без
+# линейного заключения (как константа из fan_speed_map / heater_map)
+SUGENO_OUTPUTS = {'fan_speed': 'fan_term', 'heater_state': 'heater_term'}
+
+
+class CompiledRule:
+    """Правило базы знаний с заранее разрешенными индексами множеств"""
+
+    __slots__ = ('rule_id', 'antecedents', 'fan_term', 'heater_term', 'priority',
+                 'fan_index', 'heater_index', 'consequents', 'position')
+
+    def __init__(self, rule_id: int, antecedents: Tuple[Tuple[str, str, int], ...],
+                 fan_term: Optional[str], heater_term: Optional[str], priority: int,
+                 fan_index: int, heater_index: int, consequents: Tuple[ConsequentRow, ...] = (),
+                 position: int = 0):
+        self.rule_id = rule_id
+        # (переменная, имя множества, индекс множества или -1, если множество не найдено)
+        self.antecedents = antecedents
+        self.fan_term = fan_term
+        self.heater_term = heater_term
+        self.priority = priority
+        # Индексы заключений в fan_terms / heater_terms (-1 - заключения нет)
+        self.fan_index = fan_index
+        self.heater_index = heater_index
+        # Линейные заключения для вывода Такаги-Сугено (выход, переменная или None, коэффициент)
+        self.consequents = consequents
+        # Номер в порядке проверки правил (по убыванию приоритета, затем по id)
+        self.position = position
+
+
+class SupportIndex:
+    """Интервальный индекс носителей [a, d] трапеций одной переменной.
+
+    Точки a и d всех множеств делят ось на элементарные отрезки; для каждой точки и каждого
+    интервала между соседними точками заранее известны множества, которые там могут быть ненулевыми.
+    """
+
+    def __init__(self, params: Tuple[Tuple[float, float, float, float], ...]):
+        self.points = sorted({p[0] for p in params} | {p[3] for p in params})
+        # Кандидаты в самих точках излома и в интервалах между ними (интервал i - перед точкой i)
+        self.at_point = [tuple(i for i, p in enumerate(params) if p[0] <= x <= p[3]) for x in self.points]
+        self.between = [()] + [tuple(i for i, p in enumerate(params) if p[0] <= low and high <= p[3])
+                               for low, high in zip(self.points, self.points[1:])] + [()]
+
+    def candidates(self, value: float) -> Tuple[int, ...]:
+        """Индексы множеств, чей носитель содержит value"""
+        i = bisect.bisect_left(self.points, value)
+        if i < len(self.points) and self.points[i] == value:
+            return self.at_point[i]
+        return self.between[i]
+
+
+class CompiledKnowledgeBase:
+    """База знаний, скомпилированная в память: параметры множеств, антецеденты и заключения правил"""
+
+    def __init__(self, variables: Dict[str, Tuple[Tuple[str, ...], Tuple[Tuple[float, float, float, float], ...]]],
+                 rules: Tuple[CompiledRule, ...], fan_terms: Tuple[str, ...],
+                 heater_terms: Tuple[str, ...], signature: tuple, version: Optional[int] = None):
+        # переменная -> (имена множеств, параметры (a, b, c, d) в том же порядке)
+        self.variables = variables
+        # Правила в порядке убывания приоритета
+        self.rules = rules
+        self.fan_terms = fan_terms
+        self.heater_terms = heater_terms
+        # Отпечаток файла БД, из которого скомпилирована база
+        self.signature = signature
+        # Версия базы в файле (kb_versions); None - база без версий
+        self.version = version
+        # Параметры множеств в виде массивов NumPy (строятся при первом пакетном выводе)
+        self._param_arrays = {}
+        # Вычислители центроида выходных переменных (строятся при первой дефаззификации)
+        self._centroid_defuzzifiers = {}
+        # Массивы вывода Такаги-Сугено (строятся при первом пакетном выводе в этом режиме)
+        self._sugeno_arrays = {}
+
+        self.support_index = {variable: SupportIndex(params) for variable, (_, params) in variables.items()}
+        self._build_rule_index()
+
+    def _build_rule_index(self):
+        """Индекс правил по комбинации (переменная, множество) их условий.
+
+        Правило срабатывает, только если ненулевы все его условия, поэтому при выводе достаточно
+        перебрать комбинации активных множеств и найти правила с такой комбинацией.
+        Условия упорядочены по rule_variables; rule_prefixes (все начальные отрезки ключей, включая
+        сами ключи) отсекает комбинации, с которых не начинается ни одно правило.
+        """
+        self.rule_variables = tuple(sorted({variable for rule in self.rules for variable, _, _ in rule.antecedents}))
+        order = {variable: i for i, variable in enumerate(self.rule_variables)}
+        self.rules_by_key: Dict[tuple, List[CompiledRule]] = {}
+        self.rule_prefixes = {()}
+        # Правила с несколькими условиями на одну переменную не укладываются в индекс и проверяются всегда
+        self.unindexed_rules: List[CompiledRule] = []
+        for rule in self.rules:
+            if any(set_index < 0 for _, _, set_index in rule.antecedents):
+                continue  # Условие на неизвестное множество никогда не выполняется
+            variables = [variable for variable, _, _ in rule.antecedents]
+            if len(set(variables)) != len(variables):
+                self.unindexed_rules.append(rule)
+                continue
+            key = tuple(sorted(((variable, set_index) for variable, _, set_index in rule.antecedents),
+                               key=lambda item: order[item[0]]))
+            self.rules_by_key.setdefault(key, []).append(rule)
+            for length in range(1, len(key) + 1):
+                self.rule_prefixes.add(key[:length])
+        # Входы, от которых зависят линейные заключения правил
+        self.sugeno_inputs = tuple(sorted({variable for rule in self.rules
+                                           for _, variable, _ in rule.consequents if variable is not None}))
+
+    def support_candidates(self, variable: str, value: float) -> Tuple[int, ...]:
+        """Индексы множеств переменной, которые могут быть ненулевыми в точке value"""
+        index = self.support_index.get(variable)
+        return index.candidates(value) if index is not None else ()
+
+    def set_names(self, variable: str) -> Tuple[str, ...]:
+        return self.variables.get(variable, ((), ()))[0]
+
+    def set_params(self, variable: str) -> Tuple[Tuple[float, float, float, float], ...]:
+        return self.variables.get(variable, ((), ()))[1]
+
+    def content_hash(self) -> str:
+        """Хэш содержимого базы (множества и правила), не зависящий от расположения файла"""
+        digest = hashlib.sha256()
+        for variable in sorted(self.variables):
+            digest.update(repr((variable, self.variables[variable])).encode())
+        for rule in self.rules:
+            digest.update(repr((rule.rule_id, rule.antecedents, rule.fan_term, rule.heater_term,
+                                rule.priority) + ((rule.consequents,) if rule.consequents else ())).encode())
+        return digest.hexdigest()
+
+    def domain(self, variable: str) -> Tuple[float, float]:
+        """Область определения переменной: от минимального a до максимального d ее множеств"""
+        params = self.set_params(variable)
+        return min(p[0] for p in params), max(p[3] for p in params)
+
+    def breakpoints(self, variable: str) -> List[float]:
+        """Отсортированные точки излома всех трапеций переменной"""
+        return sorted({point for params in self.set_params(variable) for point in params})
+
+    def param_array(self, variable: str):
+        """Параметры множеств переменной в виде массива формы (число множеств, 4)"""
+        array = self._param_arrays.get(variable)
+        if array is None:
+            import numpy as np
+            array = np.array(self.set_params(variable), dtype=float).reshape(-1, 4)
+            self._param_arrays[variable] = array
+        return array
+
+    def with_params(self, params: Dict[str, Tuple[Tuple[float, float, float, float], ...]]) -> 'CompiledKnowledgeBase':
+        """Копия базы с другими параметрами множеств указанных переменных (имена и правила те же)"""
+        variables = dict(self.variables)
+        for variable, values in params.items():
+            names, old_values = self.variables[variable]
+            if len(values) != len(old_values):
+                raise ValueError(f"Для переменной '{variable}' нужно {len(old_values)} множеств, получено {len(values)}")
+            variables[variable] = (names, tuple(tuple(float(x) for x in p) for p in values))
+        return CompiledKnowledgeBase(variables, self.rules, self.fan_terms, self.heater_terms, ())
+
+    def antecedent_index(self, variable: str):
+        """Индексы множеств variable в условиях правил - массив формы (число правил, k) в порядке rules.
+
+        k - наибольшее число условий на переменную в одном правиле. Индекс len(множеств) означает
+        отсутствие условия (принадлежность 1), len(множеств) + 1 - условие на неизвестное множество (0).
+        """
+        key = ('antecedents', variable)
+        index = self._sugeno_arrays.get(key)
+        if index is None:
+            import numpy as np
+            no_condition = len(self.set_names(variable))
+            columns = [[no_condition + 1 if set_index < 0 else set_index
+                        for rule_variable, _, set_index in rule.antecedents if rule_variable == variable]
+                       for rule in self.rules]
+            width = max(1, max(map(len, columns), default=0))
+            index = np.full((len(self.rules), width), no_condition, dtype=np.intp)
+            for row, values in enumerate(columns):
+                index[row, :len(values)] = values
+            self._sugeno_arrays[key] = index
+        return index
+
+    def sugeno_matrix(self, output: str, term_values: Dict[str, float]):
+        """Коэффициенты линейных заключений выхода: матрица (число правил, 1 + len(sugeno_inputs)).
+
+        Столбец 0 - свободный член, остальные - коэффициенты sugeno_inputs. Правило без линейного
+        заключения для output дает константу term_values[терм правила]; правило без терма не участвует
+        в выходе (второй результат - маска участвующих правил).
+        """
+        key = (output, tuple(sorted(term_values.items())))
+        arrays = self._sugeno_arrays.get(key)
+        if arrays is None:
+            import numpy as np
+            columns = {variable: i for i, variable in enumerate((None,) + self.sugeno_inputs)}
+            coefficients = np.zeros((len(self.rules), len(columns)))
+            mask = np.zeros(len(self.rules), dtype=bool)
+            for row, rule in enumerate(self.rules):
+                terms = [(variable, coefficient) for rule_output, variable, coefficient in rule.consequents
+                         if rule_output == output]
+                if not terms:
+                    term = getattr(rule, SUGENO_OUTPUTS[output])
+                    if term is None or term not in term_values:
+                        continue
+                    terms = [(None, term_values[term])]
+                for variable, coefficient in terms:
+                    coefficients[row, columns[variable]] += coefficient
+                mask[row] = True
+            arrays = self._sugeno_arrays[key] = (coefficients, mask)
+        return arrays
+
+    def to_rows(self) -> Tuple[List[SetRow], List[RuleRow]]:
+        """Множества и правила в виде строк для insert_version (правила - в порядке приоритета)"""
+        fuzzy_sets = [(variable, name) + params for variable, (names, all_params) in self.variables.items()
+                      for name, params in zip(names, all_params)]
+        rules = [(tuple((variable, set_name) for variable, set_name, _ in rule.antecedents),
+                  rule.fan_term, rule.heater_term, rule.priority, rule.consequents) for rule in self.rules]
+        return fuzzy_sets, rules
+
+    def centroid_defuzzifier(self, variable: str) -> CentroidDefuzzifier:
+        """Центроидная дефаззификация по выходным множествам переменной, хранящимся в fuzzy_sets"""
+        defuzzifier = self._centroid_defuzzifiers.get(variable)
+        if defuzzifier is None:
+            if variable not in self.variables:
+                raise ValueError(f"В базе знаний нет выходных множеств переменной '{variable}'")
+            defuzzifier = CentroidDefuzzifier(*self.variables[variable])
+            self._centroid_defuzzifiers[variable] = defuzzifier
+        return defuzzifier
+
+
+def file_signature(db_path: str) -> tuple:
+    """Отпечаток файла БД (и его WAL-журнала) для обнаружения изменений без чтения данных"""
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+def _term_index(terms: List[str], term: Optional[str]) -> int:
+    if not term:
+        return -1
+    if term not in terms:
+        terms.append(term)
+    return terms.index(term)
+
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def compile_knowledge_base(conn: sqlite3.Connection, signature: tuple = (),
+                           version: Optional[int] = None) -> CompiledKnowledgeBase:
+    """Компиляция базы знаний из открытого соединения (чтение в одной транзакции).
+
+    Условия правил берутся из таблицы rule_conditions (любое число переменных); базы в старой
+    схеме с колонками condition_temp/condition_humidity в таблице rules тоже поддерживаются.
+    В базе с версиями (create_schema) читается версия version, по умолчанию - последняя.
+    """
+    cursor = conn.cursor()
+    rule_columns = _table_columns(cursor, 'rules')
+    if 'version' in rule_columns:
+        if version is None:
+            version = current_version(conn)
+        elif cursor.execute('SELECT 1 FROM kb_versions WHERE version = ?', (version,)).fetchone() is None:
+            raise ValueError(f"В базе знаний нет версии {version}")
+        where, params = 'WHERE version = ? ', (version,)
+    elif version is not None:
+        raise ValueError("База знаний в схеме без версий")
+    else:
+        where, params = '', ()
+
+    cursor.execute(f'SELECT variable_name, set_name, a, b, c, d FROM fuzzy_sets {where}ORDER BY id', params)
+    set_rows = cursor.fetchall()
+
+    legacy_conditions = 'condition_temp' in rule_columns
+    legacy_select = 'condition_temp, condition_humidity' if legacy_conditions else 'NULL, NULL'
+    cursor.execute(f'SELECT id, {legacy_select}, action_fan_speed, action_heater_state, priority '
+                   f'FROM rules {where}ORDER BY priority DESC, id', params)
+    rule_rows = cursor.fetchall()
+
+    conditions: Dict[int, List[Tuple[str, str]]] = {}
+    if _table_columns(cursor, 'rule_conditions'):
+        cursor.execute(f'SELECT rule_id, variable_name, set_name FROM rule_conditions {where}ORDER BY id', params)
+        for rule_id, variable, set_name in cursor.fetchall():
+            conditions.setdefault(rule_id, []).append((variable, set_name))
+
+    consequents: Dict[int, List[ConsequentRow]] = {}
+    if _table_columns(cursor, 'rule_consequents'):
+        cursor.execute(f'SELECT rule_id, output_name, variable_name, coefficient FROM rule_consequents '
+                       f'{where}ORDER BY id', params)
+        for rule_id, output, variable, coefficient in cursor.fetchall():
+            consequents.setdefault(rule_id, []).append((output, variable, float(coefficient)))
+
+    names: Dict[str, List[str]] = {}
+    params: Dict[str, List[Tuple[float, float, float, float]]] = {}
+    for variable, set_name, a, b, c, d in set_rows:
+        names.setdefault(variable, []).append(set_name)
+        params.setdefault(variable, []).append((float(a), float(b), float(c), float(d)))
+    variables = {variable: (tuple(names[variable]), tuple(params[variable])) for variable in names}
+
+    def set_index(variable: str, set_name: str) -> int:
+        variable_names = names.get(variable, [])
+        # Как и при поиске по словарю, при дублировании имени побеждает последнее множество
+        for index in range(len(variable_names) - 1, -1, -1):
+            if variable_names[index] == set_name:
+                return index
+        return -1
+
+    fan_terms: List[str] = []
+    heater_terms: List[str] = []
+    rules = []
+    for rule_id, cond_temp, cond_hum, act_fan, act_heater, priority in rule_rows:
+        rule_conditions = []
+        if cond_temp:
+            rule_conditions.append(('temperature', cond_temp))
+        if cond_hum:
+            rule_conditions.append(('humidity', cond_hum))
+        rule_conditions.extend(conditions.get(rule_id, []))
+        antecedents = tuple((variable, set_name, set_index(variable, set_name))
+                            for variable, set_name in rule_conditions)
+        rules.append(CompiledRule(rule_id, antecedents, act_fan, act_heater, priority,
+                                  _term_index(fan_terms, act_fan), _term_index(heater_terms, act_heater),
+                                  tuple(consequents.get(rule_id, ())), len(rules)))
+
+    return CompiledKnowledgeBase(variables, tuple(rules), tuple(fan_terms), tuple(heater_terms), signature, version)
+
+
+def load_knowledge_base(db_path: str, signature: tuple = (), version: Optional[int] = None) -> CompiledKnowledgeBase:
+    """Загрузка и компиляция базы знаний из файла SQLite (версии version, по умолчанию - последней)"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('BEGIN')
+        try:
+            return compile_knowledge_base(conn, signature, version)
+        finally:
+            conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+# Схема базы знаний с версиями: каждая версия - полный снимок множеств и правил, вывод читает
+# последнюю или закрепленную (KnowledgeBaseCache.version). Индексы покрывают запросы компиляции
+# и поиска множеств переменной, поэтому они читаются из индекса без сортировки.
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS kb_versions (
+        version INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        source TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS fuzzy_sets (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        variable_name TEXT NOT NULL,
+        set_name TEXT NOT NULL,
+        a REAL, b REAL, c REAL, d REAL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS rules (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        action_fan_speed TEXT,
+        action_heater_state TEXT,
+        priority INTEGER
+    )''',
+    # Условия правил "variable_name IS set_name", объединяются через И
+    '''CREATE TABLE IF NOT EXISTS rule_conditions (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        rule_id INTEGER NOT NULL REFERENCES rules(id),
+        variable_name TEXT NOT NULL,
+        set_name TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_fuzzy_sets_variable '
+    'ON fuzzy_sets(version, variable_name, id, set_name, a, b, c, d)',
+    'CREATE INDEX IF NOT EXISTS idx_rules_priority '
+    'ON rules(version, priority DESC, id, action_fan_speed, action_heater_state)',
+    # Линейные заключения правил для вывода Такаги-Сугено: выход output_name правила равен сумме
+    # coefficient * variable_name (NULL в variable_name - свободный член)
+    '''CREATE TABLE IF NOT EXISTS rule_consequents (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        rule_id INTEGER NOT NULL REFERENCES rules(id),
+        output_name TEXT NOT NULL,
+        variable_name TEXT,
+        coefficient REAL NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_rule_conditions_version '
+    'ON rule_conditions(version, id, rule_id, variable_name, set_name)',
+    'CREATE INDEX IF NOT EXISTS idx_rule_consequents_version '
+    'ON rule_consequents(version, id, rule_id, output_name, variable_name, coefficient)',
+)
+
+KB_TABLES = ('rule_consequents', 'rule_conditions', 'rules', 'fuzzy_sets', 'kb_versions')
+
+
+def open_database(db_path: str) -> sqlite3.Connection:
+    """Соединение для записи: режим WAL (читатели не блокируются во время импорта), транзакции вручную"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    # Кэш страниц побольше: при импорте больших баз индексы обновляются в памяти
+    conn.execute('PRAGMA cache_size=-65536')
+    return conn
+
+
+@contextlib.contextmanager
+def write_transaction(conn: sqlite3.Connection):
+    """Транзакция записи: все изменения видны читателям одновременно после COMMIT"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def current_version(conn: sqlite3.Connection) -> Optional[int]:
+    """Последняя версия базы знаний; None - версий нет (или база в старой схеме)"""
+    if not _table_columns(conn.cursor(), 'kb_versions'):
+        return None
+    return conn.execute('SELECT MAX(version) FROM kb_versions').fetchone()[0]
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Таблицы и индексы базы с версиями (внутри транзакции вызывающего).
+
+    База в старой схеме (без колонки version) компилируется, пересоздается и сохраняется как версия 1.
+    """
+    rule_columns = _table_columns(conn.cursor(), 'rules')
+    legacy = compile_knowledge_base(conn) if rule_columns and 'version' not in rule_columns else None
+    if legacy is not None:
+        for table in KB_TABLES:
+            conn.execute(f'DROP TABLE IF EXISTS {table}')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    if legacy is not None:
+        insert_version(conn, *legacy.to_rows(), 'migrated')
+
+
+def insert_version(conn: sqlite3.Connection, fuzzy_sets: Optional[Sequence[SetRow]],
+                   rules: Optional[Sequence[RuleRow]], source: str = '') -> int:
+    """Новая версия базы знаний (внутри транзакции вызывающего); возвращает ее номер.
+
+    Не заданные fuzzy_sets или rules (вместе с линейными заключениями) копируются из текущей
+    версии. Условие на множество, которого нет в новой версии, заключение для выхода не из
+    SUGENO_OUTPUTS и трапеция с нарушенным порядком a <= b <= c <= d - ошибка.
+    """
+    previous = current_version(conn)
+    if previous is None and (fuzzy_sets is None or rules is None):
+        raise ValueError("В базе знаний нет версии, из которой можно взять множества или правила")
+    version = (previous or 0) + 1
+
+    if fuzzy_sets is None:
+        conn.execute('INSERT INTO fuzzy_sets (version, variable_name, set_name, a, b, c, d) '
+                     'SELECT ?, variable_name, set_name, a, b, c, d FROM fuzzy_sets WHERE version = ? ORDER BY id',
+                     (version, previous))
+    else:
+        set_rows = []
+        for variable, set_name, a, b, c, d in fuzzy_sets:
+            params = (float(a), float(b), float(c), float(d))
+            if not params[0] <= params[1] <= params[2] <= params[3]:
+                raise ValueError(f"Множество '{set_name}' переменной '{variable}': нужно a <= b <= c <= d, "
+                                 f"получено {params}")
+            set_rows.append((version, variable, set_name) + params)
+        conn.executemany('INSERT INTO fuzzy_sets (version, variable_name, set_name, a, b, c, d) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', set_rows)
+
+    # Номера правил сквозные по всем версиям; правила версии получают номера подряд с first_id
+    first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM rules').fetchone()[0]
+    if rules is None:
+        offset = first_id - conn.execute('SELECT MIN(id) FROM rules WHERE version = ?', (previous,)).fetchone()[0]
+        conn.execute('INSERT INTO rules (id, version, action_fan_speed, action_heater_state, priority) '
+                     'SELECT id + ?, ?, action_fan_speed, action_heater_state, priority FROM rules WHERE version = ?',
+                     (offset, version, previous))
+        conn.execute('INSERT INTO rule_conditions (version, rule_id, variable_name, set_name) '
+                     'SELECT ?, rule_id + ?, variable_name, set_name FROM rule_conditions WHERE version = ? '
+                     'ORDER BY id', (version, offset, previous))
+        conn.execute('INSERT INTO rule_consequents (version, rule_id, output_name, variable_name, coefficient) '
+                     'SELECT ?, rule_id + ?, output_name, variable_name, coefficient FROM rule_consequents '
+                     'WHERE version = ? ORDER BY id', (version, offset, previous))
+    else:
+        rule_rows = []
+        condition_rows = []
+        consequent_rows = []
+        for rule_id, (conditions, fan_term, heater_term, priority, consequents) in enumerate(rules, first_id):
+            rule_rows.append((rule_id, version, fan_term or None, heater_term or None, int(priority)))
+            condition_rows.extend((version, rule_id, variable, set_name) for variable, set_name in conditions)
+            for output, variable, coefficient in consequents:
+                if output not in SUGENO_OUTPUTS:
+                    raise ValueError(f"Правило {rule_id - first_id + 1}: неизвестный выход заключения '{output}'")
+                consequent_rows.append((version, rule_id, output, variable or None, float(coefficient)))
+        conn.executemany('INSERT INTO rules (id, version, action_fan_speed, action_heater_state, priority) '
+                         'VALUES (?, ?, ?, ?, ?)', rule_rows)
+        conn.executemany('INSERT INTO rule_conditions (version, rule_id, variable_name, set_name) '
+                         'VALUES (?, ?, ?, ?)', condition_rows)
+        conn.executemany('INSERT INTO rule_consequents (version, rule_id, output_name, variable_name, coefficient) '
+                         'VALUES (?, ?, ?, ?, ?)', consequent_rows)
+
+    unknown = conn.execute(
+        'SELECT rule_id, variable_name, set_name FROM rule_conditions c WHERE version = ? AND NOT EXISTS '
+        '(SELECT 1 FROM fuzzy_sets s WHERE s.version = c.version AND s.variable_name = c.variable_name '
+        'AND s.set_name = c.set_name) LIMIT 1', (version,)).fetchone()
+    if unknown is not None:
+        rule_id, variable, set_name = unknown
+        raise ValueError(f"Правило {rule_id - first_id + 1}: нет множества '{set_name}' переменной '{variable}'")
+
+    conn.execute('INSERT INTO kb_versions VALUES (?, ?, ?)', (version, time.time(), source))
+    return version
+
+
+def delete_versions(conn: sqlite3.Connection, keep: int) -> int:
+    """Удаление всех версий, кроме keep последних (внутри транзакции вызывающего); возвращает число удаленных"""
+    if keep < 1:
+        raise ValueError("Нужно сохранить хотя бы одну версию базы знаний")
+    cutoff = conn.execute('SELECT version FROM kb_versions ORDER BY version DESC LIMIT 1 OFFSET ?',
+                          (keep,)).fetchone()
+    if cutoff is None:
+        return 0
+    deleted = conn.execute('SELECT COUNT(*) FROM kb_versions WHERE version <= ?', cutoff).fetchone()[0]
+    for table in KB_TABLES:
+        conn.execute(f'DELETE FROM {table} WHERE version <= ?', cutoff)
+    return deleted
+
+
+def import_version(db_path: str, fuzzy_sets: Optional[Sequence[SetRow]] = None,
+                   rules: Optional[Sequence[RuleRow]] = None, source: str = '',
+                   keep: Optional[int] = None) -> int:
+    """Импорт новой версии базы знаний одной транзакцией (см. insert_version); keep - сколько версий хранить"""
+    conn = open_database(db_path)
+    try:
+        with write_transaction(conn):
+            create_schema(conn)
+            version = insert_version(conn, fuzzy_sets, rules, source)
+            if keep is not None:
+                delete_versions(conn, keep)
+        return version
+    finally:
+        conn.close()
+
+
+def list_versions(db_path: str) -> List[Dict[str, object]]:
+    """Версии базы знаний: номер, время создания, источник и число правил"""
+    conn = sqlite3.connect(db_path)
+    try:
+        if current_version(conn) is None:
+            return []
+        counts = dict(conn.execute('SELECT version, COUNT(*) FROM rules GROUP BY version'))
+        return [{'version': version, 'created_at': created_at, 'source': source, 'rules': counts.get(version, 0)}
+                for version, created_at, source in conn.execute('SELECT * FROM kb_versions ORDER BY version')]
+    finally:
+        conn.close()
+
+
+class KnowledgeBaseCache:
+    """Скомпилированная база знаний с автоматической перезагрузкой при изменении файла БД.
+
+    Если задана version, используется эта версия базы: она не меняется, поэтому после
+    компиляции файл больше не проверяется и импорт новых версий на вывод не влияет.
+    """
+
+    # Сколько раз повторять загрузку, если файл меняется прямо во время чтения
+    max_reload_attempts = 5
+
+    def __init__(self, db_path: str, version: Optional[int] = None):
+        self.db_path = db_path
+        self.version = version
+        self._compiled: Optional[CompiledKnowledgeBase] = None
+        self._lock = threading.Lock()
+        # Вызываются после каждой компиляции: (новая база, время компиляции в секундах)
+        self.listeners: List[Callable[[CompiledKnowledgeBase, float], None]] = []
+
+    def get(self) -> CompiledKnowledgeBase:
+        """Текущая скомпилированная база; перекомпилируется, только если файл БД изменился"""
+        compiled = self._compiled
+        if compiled is not None:
+            if self.version is not None and compiled.version == self.version:
+                return compiled
+            if compiled.signature == file_signature(self.db_path):
+                return compiled
+        return self.reload()
+
+    def reload(self, force: bool = False) -> CompiledKnowledgeBase:
+        """Перекомпиляция базы; новая версия подменяет старую одной операцией присваивания"""
+        with self._lock:
+            signature = file_signature(self.db_path)
+            compiled = self._compiled
+            if not force and compiled is not None and compiled.signature == signature:
+                return compiled
+
+            started = time.perf_counter()
+            for _ in range(self.max_reload_attempts):
+                compiled = load_knowledge_base(self.db_path, signature, self.version)
+                new_signature = file_signature(self.db_path)
+                if new_signature == signature:
+                    break
+                # Файл изменился во время чтения - читаем заново
+                signature = new_signature
+                compiled = None
+            if compiled is None:
+                compiled = load_knowledge_base(self.db_path, signature, self.version)
+
+            self._compiled = compiled
+            seconds = time.perf_counter() - started
+        for listener in self.listeners:
+            listener(compiled, seconds)
+        return compiled
+
+
+class FixedKnowledgeBase:
+    """Источник базы знаний без файла: всегда отдает одну скомпилированную базу (например, кандидата тюнера)"""
+
+    def __init__(self, compiled: CompiledKnowledgeBase):
+        self._compiled = compiled
+        # Фиксированная база не перекомпилируется; список - для единообразия с KnowledgeBaseCache
+        self.listeners: List[Callable[[CompiledKnowledgeBase, float], None]] = []
+
+    def get(self) -> CompiledKnowledgeBase:
+        return self._compiled
+
+    def reload(self, force: bool = False) -> CompiledKnowledgeBase:
+        return self._compiled
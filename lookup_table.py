@@ -0,0 +1,382 @@
+import bisect
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from fuzzy_system import FAN_OUTPUT_VARIABLE, FuzzyInferenceSystem
+
+# Версия формата файла поверхности; при изменении формата старые файлы перестраиваются
+# (2 - ошибка ячеек оценивается сверху, а не по контрольным точкам)
+SURFACE_FORMAT_VERSION = 2
+
+# Коды ячеек таблицы: обогреватель постоянен во всей ячейке либо ячейка считается точным выводом
+CELL_HEATER_OFF = 0
+CELL_HEATER_ON = 1
+CELL_EXACT = -1
+
+# Ограничение числа контрольных точек за один вызов infer_batch при проверке сетки
+CHECK_CHUNK_POINTS = 1_000_000
+
+
+def surface_hash(fis: FuzzyInferenceSystem) -> str:
+    """Хэш всего, от чего зависит поверхность управления: базы правил, способа вывода и дефаззификации"""
+    digest = hashlib.sha256()
+    digest.update(str(SURFACE_FORMAT_VERSION).encode())
+    digest.update(fis.knowledge_base.content_hash().encode())
+    digest.update(json.dumps(fis.fan_speed_map, sort_keys=True).encode())
+    digest.update(fis.fan_defuzzification.encode())
+    if fis.inference != 'mamdani':
+        digest.update(fis.inference.encode())
+    return digest.hexdigest()
+
+
+def _metadata_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.json'
+
+
+def _cells_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.cells.npy'
+
+
+def _initial_axis(kb, variable: str, step: float) -> np.ndarray:
+    """Начальная сетка по оси: равномерный шаг плюс все точки излома трапеций"""
+    low, high = kb.domain(variable)
+    points = set(np.arange(low, high, step).tolist())
+    points.update(p for p in kb.breakpoints(variable) if low <= p <= high)
+    points.update((low, high))
+    return np.array(sorted(points))
+
+
+def _cell_ranges(fis: FuzzyInferenceSystem, kb, variable: str, axis: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Наименьшая и наибольшая принадлежность каждого множества переменной в ячейках оси (число множеств, ячейки).
+
+    Узлы оси содержат все изломы трапеций, поэтому внутри ячейки принадлежность линейна
+    и ее крайние значения достигаются в узлах (у скачка трапеции с a == b - тоже).
+    """
+    nodes = fis.trapezoid_mf_batch(axis, *kb.param_array(variable).T[:, :, None])
+    return np.minimum(nodes[:, :-1], nodes[:, 1:]), np.maximum(nodes[:, :-1], nodes[:, 1:])
+
+
+class ControlSurface:
+    """Предвычисленная поверхность infer() на сетке с билинейной интерполяцией.
+
+    Скорость вентилятора интерполируется по узлам сетки. Обогреватель - дискретный выход, поэтому
+    для каждой ячейки хранится его постоянное состояние; ячейки, где оно может меняться или где
+    оценка ошибки интерполяции вентилятора больше max_error, помечаются CELL_EXACT, и запросы
+    в них отвечаются точным выводом. achieved_error - наибольшая оценка ошибки сверху по остальным
+    ячейкам, так что ни в одной точке сетки ошибка вентилятора его не превосходит.
+    """
+
+    def __init__(self, fis: FuzzyInferenceSystem, temp_axis: np.ndarray, hum_axis: np.ndarray,
+                 fan: np.ndarray, cells: np.ndarray, rule_base_hash: str,
+                 max_error: float, achieved_error: float):
+        self.fis = fis
+        self.temp_axis = temp_axis
+        self.hum_axis = hum_axis
+        self.fan = fan
+        self.cells = cells
+        self.rule_base_hash = rule_base_hash
+        self.max_error = max_error
+        self.achieved_error = achieved_error
+
+        # Списки осей для скалярного поиска через bisect (быстрее NumPy на одиночных значениях)
+        self._temp_list = temp_axis.tolist()
+        self._hum_list = hum_axis.tolist()
+        # Копии таблиц в виде списков строятся при первом скалярном запросе
+        self._fan_rows = None
+        self._cell_rows = None
+
+    @classmethod
+    def build(cls, fis: FuzzyInferenceSystem, max_error: float = 0.005,
+              initial_step: Tuple[float, float] = (1.0, 5.0), samples_per_cell: int = 5,
+              max_nodes: int = 1025) -> 'ControlSurface':
+        """Построение сетки с дроблением ячеек, пока оценка ошибки вентилятора больше max_error.
+
+        Ошибка ячейки оценивается сверху (см. _fan_error_bound): ошибка в samples_per_cell x
+        samples_per_cell контрольных точках плюс наибольший рост ошибки на пути до ближайшей из них.
+        Состояние обогревателя в ячейке считается постоянным, только если это следует из границ
+        степеней активации его термов. Ячейки, не уложившиеся в точность при max_nodes узлах по оси,
+        отдаются точному выводу. Оценка выводится для вывода Мамдани; поверхность Такаги-Сугено
+        не поддерживается.
+        """
+        if fis.inference != 'mamdani':
+            raise ValueError(f"Таблица поверхности строится только для вывода Мамдани, а не '{fis.inference}'")
+        kb = fis.knowledge_base
+        temp_axis = _initial_axis(kb, 'temperature', initial_step[0])
+        hum_axis = _initial_axis(kb, 'humidity', initial_step[1])
+
+        while True:
+            fan = fis.infer_batch(temp_axis[:, None], hum_axis[None, :])['fan_speed']
+            bounds = cls._level_bounds(fis, temp_axis, hum_axis)
+            fan_error = cls._fan_error_bound(fis, temp_axis, hum_axis, fan, bounds, samples_per_cell, max_error)
+            bad_cells = fan_error > max_error
+            if not bad_cells.any() or len(temp_axis) >= max_nodes or len(hum_axis) >= max_nodes:
+                break
+
+            # Делим пополам все интервалы осей, через которые проходят плохие ячейки
+            temp_axis = np.union1d(temp_axis, ((temp_axis[:-1] + temp_axis[1:]) / 2)[bad_cells.any(axis=1)])
+            hum_axis = np.union1d(hum_axis, ((hum_axis[:-1] + hum_axis[1:]) / 2)[bad_cells.any(axis=0)])
+
+        cells = np.where(bad_cells, CELL_EXACT, cls._heater_cells(kb, bounds)).astype(np.int8)
+        trusted_error = fan_error[cells != CELL_EXACT]
+        achieved_error = float(trusted_error.max()) if trusted_error.size else 0.0
+        return cls(fis, temp_axis, hum_axis, fan, cells, surface_hash(fis), max_error, achieved_error)
+
+    @staticmethod
+    def _level_bounds(fis: FuzzyInferenceSystem, temp_axis: np.ndarray,
+                      hum_axis: np.ndarray) -> Dict[str, np.ndarray]:
+        """Границы степеней активации термов в ячейках сетки (формы (число термов, ячейки по t, ячейки по h)).
+
+        'fan_low'/'fan_high' и 'heater_low'/'heater_high' - нижняя и верхняя граница степени терма;
+        'fan_temperature'/'fan_humidity' - наибольшее изменение принадлежности условия по оси поперек
+        ячейки среди правил терма, срабатывающих в ней (степень терма меняется не быстрее).
+        Правило - min принадлежностей условий, поэтому его границы в ячейке - min границ условий.
+        """
+        kb = fis.knowledge_base
+        temp_low, temp_high = _cell_ranges(fis, kb, 'temperature', temp_axis)
+        hum_low, hum_high = _cell_ranges(fis, kb, 'humidity', hum_axis)
+        ranges = {'temperature': (temp_low[:, :, None], temp_high[:, :, None]),
+                  'humidity': (hum_low[:, None, :], hum_high[:, None, :])}
+
+        shape = (len(temp_axis) - 1, len(hum_axis) - 1)
+        bounds = {name: np.zeros((len(kb.fan_terms),) + shape)
+                  for name in ('fan_low', 'fan_high', 'fan_temperature', 'fan_humidity')}
+        bounds.update((name, np.zeros((len(kb.heater_terms),) + shape)) for name in ('heater_low', 'heater_high'))
+        for rule in kb.rules:
+            # Как и в infer_batch: правило с условием по другой переменной или неизвестному множеству не срабатывает
+            if not all(set_index >= 0 and variable in ranges for variable, _, set_index in rule.antecedents):
+                continue
+            low = high = 1.0
+            change = {'temperature': 0.0, 'humidity': 0.0}
+            for variable, _, set_index in rule.antecedents:
+                set_low, set_high = ranges[variable]
+                low = np.minimum(low, set_low[set_index])
+                high = np.minimum(high, set_high[set_index])
+                change[variable] = np.maximum(change[variable], set_high[set_index] - set_low[set_index])
+            if rule.fan_index >= 0:
+                t = rule.fan_index
+                np.maximum(bounds['fan_low'][t], low, out=bounds['fan_low'][t])
+                np.maximum(bounds['fan_high'][t], high, out=bounds['fan_high'][t])
+                for variable in ('temperature', 'humidity'):
+                    target = bounds['fan_' + variable][t]
+                    np.maximum(target, np.where(high > 0, change[variable], 0.0), out=target)
+            if rule.heater_index >= 0:
+                t = rule.heater_index
+                np.maximum(bounds['heater_low'][t], low, out=bounds['heater_low'][t])
+                np.maximum(bounds['heater_high'][t], high, out=bounds['heater_high'][t])
+        return bounds
+
+    @staticmethod
+    def _fan_error_bound(fis: FuzzyInferenceSystem, temp_axis: np.ndarray, hum_axis: np.ndarray,
+                         fan: np.ndarray, bounds: Dict[str, np.ndarray], samples_per_cell: int,
+                         max_error: float) -> np.ndarray:
+        """Верхняя граница ошибки интерполяции вентилятора в каждой ячейке сетки.
+
+        Контрольные точки - центры частей ячейки k x k (k = samples_per_cell), поэтому до ближайшей
+        из них не больше 1/(2k) ячейки по t и по h, а на этом пути ошибка меняется не больше чем
+        на 1/(2k) суммы изменений вывода (_fan_change) и интерполянта поперек ячейки. Там, где
+        эта добавка больше max_error, ячейку все равно делить, и ошибка в точках не считается;
+        где она нулевая, вывод и интерполянт в ячейке постоянны и совпадают.
+        """
+        kb = fis.knowledge_base
+        growth = (ControlSurface._fan_change(fis, kb, bounds, bounds['fan_temperature'])
+                  + ControlSurface._fan_change(fis, kb, bounds, bounds['fan_humidity']))
+        growth += np.maximum(np.abs(fan[1:, :-1] - fan[:-1, :-1]), np.abs(fan[1:, 1:] - fan[:-1, 1:]))
+        growth += np.maximum(np.abs(fan[:-1, 1:] - fan[:-1, :-1]), np.abs(fan[1:, 1:] - fan[1:, :-1]))
+        error = growth / (2 * samples_per_cell)
+        checked = (error > 0) & (error <= max_error)
+        error[checked] += ControlSurface._check_cells(fis, temp_axis, hum_axis, fan, samples_per_cell,
+                                                      *np.nonzero(checked))
+        return error
+
+    @staticmethod
+    def _fan_change(fis: FuzzyInferenceSystem, kb, bounds: Dict[str, np.ndarray], change: np.ndarray) -> np.ndarray:
+        """Граница изменения скорости вентилятора поперек ячейки по оси, вдоль которой степени термов
+        меняются не больше чем на change (форма (число термов, ячейки)); бесконечность - оценки нет.
+
+        Синглтоны: f = sum(v * mu) / sum(mu), df/dmu_t = (v_t - f) / sum(mu), а f лежит между
+        значениями сработавших в ячейке термов; сумма |v_t - f| * change_t выпукла по f и потому
+        наибольшая на краю этого отрезка. Центроид: с ростом степени терма площадь и момент
+        прирастают только на той части его множества на уровне степени, где не преобладает
+        множество другого терма, поэтому |dc/dmu_t| не больше ширины этой части, умноженной на
+        наибольшее |x - c| и деленной на площадь; площадь не меньше площади любого множества,
+        отсеченного на нижней границе степени его терма.
+        """
+        low, high = bounds['fan_low'], bounds['fan_high']
+        fired = high > 0
+        weights = np.where(fired, change, 0.0)
+        column = (-1,) + (1,) * (low.ndim - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if fis.fan_defuzzification == 'centroid':
+                defuzzifier = kb.centroid_defuzzifier(FAN_OUTPUT_VARIABLE)
+                params = np.array(defuzzifier.params, dtype=float)[defuzzifier.term_indices(kb.fan_terms)]
+                a, b, c, d = (values.reshape(column) for values in params.T)
+                level = np.minimum(low, 1.0)
+                # Множество терма на нижней границе степени: выше по степени оно только уже
+                start, end = a + level * (b - a), d - level * (d - c)
+                area = (level * ((d - a) + (end - start)) / 2).max(axis=0)
+                # Части, где множество терма s выше верхней границы степени терма t (и s сработал сильнее)
+                covered = np.zeros_like(low)
+                for t in range(len(kb.fan_terms)):
+                    for other in range(len(kb.fan_terms)):
+                        if other == t:
+                            continue
+                        cut = high[t]
+                        other_start = a[other] + cut * (b[other] - a[other])
+                        other_end = d[other] - cut * (d[other] - c[other])
+                        overlap = np.minimum(end[t], other_end) - np.maximum(start[t], other_start)
+                        covered[t] = np.maximum(covered[t], np.where(low[other] > cut, overlap, 0.0))
+                width = np.maximum(end - start - covered, 0.0)
+                # Центроид лежит между краями множеств сработавших термов
+                left = np.where(fired, a, np.inf).min(axis=0)
+                right = np.where(fired, d, -np.inf).max(axis=0)
+                reach = np.maximum(end - left, right - start)
+                total = np.where(weights > 0, width * reach * weights, 0.0).sum(axis=0)
+                denominator = area
+            else:
+                values = np.array([fis.fan_speed_map[term] for term in kb.fan_terms], dtype=float).reshape(column)
+                lowest = np.where(fired, values, np.inf).min(axis=0)
+                highest = np.where(fired, values, -np.inf).max(axis=0)
+                total = np.maximum(np.where(weights > 0, (values - lowest) * weights, 0.0).sum(axis=0),
+                                   np.where(weights > 0, (highest - values) * weights, 0.0).sum(axis=0))
+                denominator = low.sum(axis=0)
+            return np.where(total > 0, total / denominator, 0.0)
+
+    @staticmethod
+    def _check_cells(fis: FuzzyInferenceSystem, temp_axis: np.ndarray, hum_axis: np.ndarray, fan: np.ndarray,
+                     samples_per_cell: int, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """Максимальная ошибка вентилятора в контрольных точках ячеек (rows, columns): центрах частей k x k"""
+        k = samples_per_cell
+        fractions = (np.arange(k) + 0.5) / k
+        u, v = fractions[:, None], fractions[None, :]
+        fan_error = np.empty(len(rows))
+        cells_per_chunk = max(1, CHECK_CHUNK_POINTS // (k * k))
+        for start in range(0, len(rows), cells_per_chunk):
+            i, j = rows[start:start + cells_per_chunk, None, None], columns[start:start + cells_per_chunk, None, None]
+            temperatures = temp_axis[i] + (temp_axis[i + 1] - temp_axis[i]) * u
+            humidities = hum_axis[j] + (hum_axis[j + 1] - hum_axis[j]) * v
+            exact = fis.infer_batch(temperatures, humidities)['fan_speed']
+            interpolated = (fan[i, j] * (1 - u) * (1 - v) + fan[i + 1, j] * u * (1 - v)
+                            + fan[i, j + 1] * (1 - u) * v + fan[i + 1, j + 1] * u * v)
+            fan_error[start:start + cells_per_chunk] = np.abs(interpolated - exact).max(axis=(1, 2))
+        return fan_error
+
+    @staticmethod
+    def _heater_cells(kb, bounds: Dict[str, np.ndarray]) -> np.ndarray:
+        """Код обогревателя ячеек: включен (off < on всюду), выключен (on <= off всюду) или CELL_EXACT"""
+        def term_bounds(term):
+            if term not in kb.heater_terms:
+                return 0.0, 0.0
+            index = kb.heater_terms.index(term)
+            return bounds['heater_low'][index], bounds['heater_high'][index]
+
+        on_low, on_high = term_bounds('on')
+        off_low, off_high = term_bounds('off')
+        heater_cells = np.full(bounds['fan_low'].shape[1:], CELL_EXACT, dtype=np.int8)
+        heater_cells[on_low > off_high] = CELL_HEATER_ON
+        heater_cells[on_high <= off_low] = CELL_HEATER_OFF
+        return heater_cells
+
+    def save(self, path: str):
+        """Сохранение: узлы вентилятора в path (.npy), коды ячеек в *.cells.npy, метаданные в .json"""
+        metadata = {
+            'format_version': SURFACE_FORMAT_VERSION,
+            'rule_base_hash': self.rule_base_hash,
+            'max_error': self.max_error,
+            'achieved_error': self.achieved_error,
+            'temp_axis': self.temp_axis.tolist(),
+            'hum_axis': self.hum_axis.tolist(),
+        }
+        # Пишем во временные файлы и подменяем атомарно; метаданные - последними,
+        # так как именно по ним (хэшу базы) проверяется актуальность таблицы
+        for target, array in ((path, self.fan), (_cells_path(path), self.cells)):
+            np.save(target + '.tmp.npy', array)
+            os.replace(target + '.tmp.npy', target)
+        with open(_metadata_path(path) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(_metadata_path(path) + '.tmp', _metadata_path(path))
+
+    @classmethod
+    def load(cls, fis: FuzzyInferenceSystem, path: str) -> Optional['ControlSurface']:
+        """Загрузка таблицы через memmap; None, если файла нет или он построен для другой базы правил"""
+        try:
+            with open(_metadata_path(path), encoding='utf-8') as f:
+                metadata = json.load(f)
+            fan = np.load(path, mmap_mode='r')
+            cells = np.load(_cells_path(path), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+        if metadata.get('rule_base_hash') != surface_hash(fis):
+            return None
+        temp_axis, hum_axis = np.array(metadata['temp_axis']), np.array(metadata['hum_axis'])
+        if fan.shape != (len(temp_axis), len(hum_axis)) or cells.shape != (len(temp_axis) - 1, len(hum_axis) - 1):
+            return None
+        return cls(fis, temp_axis, hum_axis, fan, cells, metadata['rule_base_hash'],
+                   metadata['max_error'], metadata['achieved_error'])
+
+    @classmethod
+    def build_or_load(cls, fis: FuzzyInferenceSystem, path: str, max_error: float = 0.005) -> 'ControlSurface':
+        """Готовая таблица из файла, если она соответствует базе и точности, иначе - построение и сохранение"""
+        surface = cls.load(fis, path)
+        if surface is None or surface.max_error > max_error:
+            surface = cls.build(fis, max_error=max_error)
+            surface.save(path)
+        return surface
+
+    def is_current(self) -> bool:
+        """Соответствует ли таблица текущей (возможно, перезагруженной) базе правил"""
+        return self.rule_base_hash == surface_hash(self.fis)
+
+    def exact_fraction(self) -> float:
+        """Доля площади области, запросы в которой отдаются точному выводу"""
+        areas = np.diff(self.temp_axis)[:, None] * np.diff(self.hum_axis)[None, :]
+        return float(areas[self.cells == CELL_EXACT].sum() / areas.sum())
+
+    def lookup_batch(self, temperatures, humidities) -> Dict[str, np.ndarray]:
+        """Пакетный поиск по таблице; точки вне сетки и в ячейках CELL_EXACT считаются точным выводом"""
+        temperatures, humidities = np.broadcast_arrays(np.asarray(temperatures, dtype=float),
+                                                       np.asarray(humidities, dtype=float))
+        temp_axis, hum_axis = self.temp_axis, self.hum_axis
+        i = np.clip(np.searchsorted(temp_axis, temperatures, side='right') - 1, 0, len(temp_axis) - 2)
+        j = np.clip(np.searchsorted(hum_axis, humidities, side='right') - 1, 0, len(hum_axis) - 2)
+        u = (temperatures - temp_axis[i]) / (temp_axis[i + 1] - temp_axis[i])
+        v = (humidities - hum_axis[j]) / (hum_axis[j + 1] - hum_axis[j])
+
+        fan = self.fan
+        fan_speed = (fan[i, j] * (1 - u) * (1 - v) + fan[i + 1, j] * u * (1 - v)
+                     + fan[i, j + 1] * (1 - u) * v + fan[i + 1, j + 1] * u * v)
+        cells = self.cells[i, j]
+        heater_state = (cells == CELL_HEATER_ON).astype(float)
+
+        exact = ((cells == CELL_EXACT) | (temperatures < temp_axis[0]) | (temperatures > temp_axis[-1])
+                 | (humidities < hum_axis[0]) | (humidities > hum_axis[-1]))
+        if exact.any():
+            result = self.fis.infer_batch(temperatures[exact], humidities[exact])
+            fan_speed[exact] = result['fan_speed']
+            heater_state[exact] = result['heater_state']
+
+        return {'fan_speed': fan_speed, 'heater_state': heater_state}
+
+    def decide(self, temperature: float, humidity: float) -> Dict[str, float]:
+        """Одиночное решение по таблице (тот же результат, что lookup_batch, без накладных расходов NumPy)"""
+        temp_list, hum_list = self._temp_list, self._hum_list
+        if temp_list[0] <= temperature <= temp_list[-1] and hum_list[0] <= humidity <= hum_list[-1]:
+            i = min(bisect.bisect_right(temp_list, temperature) - 1, len(temp_list) - 2)
+            j = min(bisect.bisect_right(hum_list, humidity) - 1, len(hum_list) - 2)
+            if self._fan_rows is None:
+                self._fan_rows = self.fan.tolist()
+                self._cell_rows = self.cells.tolist()
+            cell = self._cell_rows[i][j]
+            if cell != CELL_EXACT:
+                u = (temperature - temp_list[i]) / (temp_list[i + 1] - temp_list[i])
+                v = (humidity - hum_list[j]) / (hum_list[j + 1] - hum_list[j])
+                row, next_row = self._fan_rows[i], self._fan_rows[i + 1]
+                fan_speed = (row[j] * (1 - u) * (1 - v) + next_row[j] * u * (1 - v)
+                             + row[j + 1] * (1 - u) * v + next_row[j + 1] * u * v)
+                return {'fan_speed': fan_speed, 'heater_state': float(cell)}
+
+        result = self.fis.infer_batch(temperature, humidity)
+        return {'fan_speed': float(result['fan_speed']), 'heater_state': float(result['heater_state'])}
@@ -0,0 +1,188 @@
+import bisect
+import contextlib
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+# Границы корзин гистограмм задержки, с (как le у гистограмм Prometheus)
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Границы корзин гистограмм числа правил на решение
+# (до 2^20 - с запасом больше самых больших баз в замерах производительности)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: число значений не больше каждой границы, сумма, количество, максимум"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'maximum')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def cumulative(self) -> List[int]:
+        result = []
+        running = 0
+        for count in self.counts:
+            running += count
+            result.append(running)
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля сверху: граница корзины, в которую он попадает (за последней границей - максимум)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, cumulative in zip(self.bounds, self.cumulative()):
+            if cumulative >= rank:
+                return bound
+        return self.maximum
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': self.maximum,
+            'buckets': {str(bound): count for bound, count in zip(self.bounds + ('+Inf',), self.cumulative())},
+        }
+
+
+class Metrics:
+    """Счетчики и гистограммы контура управления.
+
+    Подключается через FuzzyInferenceSystem.metrics (и VentilationSimulator берет их оттуда);
+    None - сбор выключен, и вывод платит одну проверку атрибута. Замеряется каждое
+    sample_every-е решение, остальные только подсчитываются.
+    """
+
+    def __init__(self, sample_every: int = 1, max_reload_events: int = 100):
+        if sample_every < 1:
+            raise ValueError("sample_every должен быть не меньше 1")
+        self.sample_every = sample_every
+        self._countdown = 1
+        self.decisions = 0
+        self.sampled = 0
+        self.stages: Dict[str, Histogram] = {}
+        self.counts: Dict[str, Histogram] = {}
+        self.reloads = 0
+        self.reload_events = deque(maxlen=max_reload_events)
+
+    def sample(self) -> bool:
+        """Учет решения; True - его нужно замерить"""
+        self.decisions += 1
+        self._countdown -= 1
+        if self._countdown:
+            return False
+        self._countdown = self.sample_every
+        self.sampled += 1
+        return True
+
+    def observe(self, stage: str, seconds: float):
+        """Задержка этапа, с"""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def observe_count(self, name: str, value: int):
+        """Количество на решение (например, проверенных или сработавших правил)"""
+        histogram = self.counts.get(name)
+        if histogram is None:
+            histogram = self.counts[name] = Histogram(COUNT_BUCKETS)
+        histogram.observe(value)
+
+    def record_reload(self, db_path: str, rules: int, seconds: float):
+        """Событие перекомпиляции базы знаний"""
+        self.reloads += 1
+        self.reload_events.append({'time': time.time(), 'db_path': db_path, 'rules': rules, 'seconds': seconds})
+        self.observe('kb_reload', seconds)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'decisions': self.decisions,
+            'sampled': self.sampled,
+            'sample_every': self.sample_every,
+            'stages': {name: histogram.to_dict() for name, histogram in self.stages.items()},
+            'counts': {name: histogram.to_dict() for name, histogram in self.counts.items()},
+            'kb_reloads': self.reloads,
+            'kb_reload_events': list(self.reload_events),
+        }
+
+    def to_json(self) -> str:
+        # allow_nan=False: Infinity и NaN - не JSON, строгие разборщики такой файл не читают
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2, allow_nan=False)
+
+    def to_prometheus(self, prefix: str = 'fuzzy_') -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines = [
+            f'# HELP {prefix}decisions_total Решения регулятора (включая незамеренные).',
+            f'# TYPE {prefix}decisions_total counter',
+            f'{prefix}decisions_total {self.decisions}',
+            f'# HELP {prefix}decisions_sampled_total Замеренные решения.',
+            f'# TYPE {prefix}decisions_sampled_total counter',
+            f'{prefix}decisions_sampled_total {self.sampled}',
+            f'# HELP {prefix}kb_reloads_total Перекомпиляции базы знаний.',
+            f'# TYPE {prefix}kb_reloads_total counter',
+            f'{prefix}kb_reloads_total {self.reloads}',
+        ]
+        lines += _prometheus_histograms(f'{prefix}stage_seconds', 'stage', self.stages,
+                                        'Задержка этапов контура управления, с.')
+        lines += _prometheus_histograms(f'{prefix}rules', 'kind', self.counts,
+                                        'Число правил на решение (пакет считается одним решением).')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Запись в файл: .prom - формат Prometheus, иначе JSON"""
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json() + '\n'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def _prometheus_histograms(name: str, label: str, histograms: Dict[str, Histogram], help_text: str) -> List[str]:
+    if not histograms:
+        return []
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, histogram in histograms.items():
+        for bound, count in zip(histogram.bounds + ('+Inf',), histogram.cumulative()):
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.total!r}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+    return lines
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+
+
+def stage(metrics: Optional[Metrics], name: str):
+    """Замер блока, если сбор включен; иначе - общий пустой контекстный менеджер"""
+    return _NO_STAGE if metrics is None else _Stage(metrics, name)
@@ -0,0 +1,430 @@
+import hashlib
+import marshal
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# Пространство имен онтологии вентиляции (префикс ':' в ontology.ttl)
+VENTILATION_NS = 'http://www.semanticweb.org/ventilation#'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS_SUBCLASS_OF = 'http://www.w3.org/2000/01/rdf-schema#subClassOf'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# Версия формата кэша топологии; при изменении формата кэш перестраивается
+TOPOLOGY_CACHE_VERSION = 1
+_CACHE_MAGIC = b'VENTTOPO'
+
+# Классы онтологии -> вид датчика (как в SensorReading.kind) и вид исполнительного устройства
+SENSOR_KINDS = {'TemperatureSensor': 'temperature', 'HumiditySensor': 'humidity'}
+ACTUATOR_KINDS = {'Fan': 'fan', 'Heater': 'heater'}
+
+_TOKEN = re.compile(r'''
+    (?P<skip>\s+|\#[^\n]*)
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<string>"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^'\\]|\\.|'(?!''))*\'\'\'
+               |"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<langtag>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<datatype>\^\^)
+  | (?P<number>[+-]?(?:\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?))
+  | (?P<punct>[;,.\[\]()])
+  | (?P<name>_:[\w\-]+(?:[\w\-.]*[\w\-])?
+             |(?:[^\W\d][\w\-]*(?:[\w\-.]*[\w\-])?)?:(?:[\w\-:%]+(?:[\w\-.:%]*[\w\-:%])?)?
+             |[A-Za-z]+)
+''', re.VERBOSE)
+
+_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+class Literal:
+    """Литерал RDF: значение Python (float, int, bool или str), тип данных и языковой тег"""
+
+    __slots__ = ('value', 'datatype', 'language')
+
+    def __init__(self, value, datatype: Optional[str] = None, language: Optional[str] = None):
+        self.value = value
+        self.datatype = datatype
+        self.language = language
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, Literal) and self.value == other.value
+                and self.datatype == other.datatype and self.language == other.language)
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.datatype, self.language))
+
+    def __repr__(self) -> str:
+        return f'Literal({self.value!r})'
+
+
+def _unescape(text: str) -> str:
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] in 'uU':
+            return chr(int(escape[1:], 16))
+        return _ESCAPES[escape]
+    return re.sub(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[tbnrf"\'\\])', replace, text)
+
+
+def _typed_value(text: str, datatype: str):
+    if datatype in (XSD + 'float', XSD + 'double', XSD + 'decimal'):
+        return float(text)
+    if datatype in (XSD + 'integer', XSD + 'int', XSD + 'long'):
+        return int(text)
+    if datatype == XSD + 'boolean':
+        return text == 'true'
+    return text
+
+
+class TurtleParser:
+    """Разбор подмножества Turtle, которого достаточно для онтологий цеха (без rdflib).
+
+    Поддерживаются директивы @prefix/@base (и PREFIX/BASE), IRI и имена с префиксами, 'a',
+    списки ';' и ',', пустые узлы _:b и [ ... ], строки (в том числе тройные кавычки)
+    с языковым тегом или типом данных, числа и true/false. Коллекции ( ... ) не поддерживаются.
+    """
+
+    def __init__(self, text: str):
+        self.tokens = self._tokenize(text)
+        self.position = 0
+        self.prefixes: Dict[str, str] = {}
+        self.base = ''
+        self.triples: List[Tuple[str, str, object]] = []
+        self._blank_nodes = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens = []
+        position = 0
+        for match in _TOKEN.finditer(text):
+            if match.start() != position:
+                break
+            position = match.end()
+            if match.lastgroup != 'skip':
+                tokens.append((match.lastgroup, match.group()))
+        if position != len(text):
+            line = text.count('\n', 0, position) + 1
+            raise ValueError(f"Ошибка разбора Turtle в строке {line}: {text[position:position + 20]!r}")
+        return tokens
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ('eof', '')
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _expect(self, value: str):
+        kind, token = self._next()
+        if token != value:
+            raise ValueError(f"Ошибка разбора Turtle: ожидалось '{value}', получено '{token}'")
+
+    def parse(self) -> List[Tuple[str, str, object]]:
+        while self._peek()[0] != 'eof':
+            kind, token = self._peek()
+            if token in ('@prefix', '@base') or (kind == 'name' and token.upper() in ('PREFIX', 'BASE')):
+                self._directive()
+            else:
+                self._triples()
+                self._expect('.')
+        return self.triples
+
+    def _directive(self):
+        kind, token = self._next()
+        sparql_style = not token.startswith('@')
+        if token.lower().endswith('prefix'):
+            _, prefix = self._next()
+            _, iri = self._next()
+            self.prefixes[prefix[:-1]] = self._iri(iri)
+        else:
+            _, iri = self._next()
+            self.base = self._iri(iri)
+        if not sparql_style:
+            self._expect('.')
+
+    def _iri(self, token: str) -> str:
+        iri = _unescape(token[1:-1])
+        if self.base and not re.match(r'[A-Za-z][\w+.\-]*:', iri):
+            iri = self.base + iri
+        return iri
+
+    def _resource(self, kind: str, token: str) -> str:
+        if kind == 'iri':
+            return self._iri(token)
+        if token.startswith('_:'):
+            return token
+        prefix, _, local = token.partition(':')
+        if prefix not in self.prefixes:
+            raise ValueError(f"Неизвестный префикс Turtle: '{prefix}:'")
+        return self.prefixes[prefix] + local
+
+    def _new_blank_node(self) -> str:
+        self._blank_nodes += 1
+        return f'_:anonymous{self._blank_nodes}'
+
+    def _triples(self):
+        kind, token = self._next()
+        if token == '[':
+            subject = self._blank_node_properties()
+            if self._peek()[1] == '.':
+                return
+        else:
+            subject = self._resource(kind, token)
+        self._predicate_objects(subject)
+
+    def _blank_node_properties(self) -> str:
+        node = self._new_blank_node()
+        if self._peek()[1] != ']':
+            self._predicate_objects(node)
+        self._expect(']')
+        return node
+
+    def _predicate_objects(self, subject: str):
+        while True:
+            kind, token = self._next()
+            predicate = RDF_TYPE if token == 'a' else self._resource(kind, token)
+            while True:
+                self.triples.append((subject, predicate, self._object()))
+                if self._peek()[1] != ',':
+                    break
+                self._next()
+            if self._peek()[1] != ';':
+                return
+            while self._peek()[1] == ';':
+                self._next()
+            if self._peek()[1] in ('.', ']'):
+                return
+
+    def _object(self):
+        kind, token = self._next()
+        if token == '[':
+            return self._blank_node_properties()
+        if token == '(':
+            raise ValueError("Коллекции RDF ( ... ) не поддерживаются")
+        if kind == 'number':
+            if re.fullmatch(r'[+-]?\d+', token):
+                return Literal(int(token), XSD + 'integer')
+            return Literal(float(token), XSD + ('double' if 'e' in token.lower() else 'decimal'))
+        if kind == 'name' and token in ('true', 'false'):
+            return Literal(token == 'true', XSD + 'boolean')
+        if kind == 'string':
+            quote = 3 if token[:3] in ('"""', "'''") else 1
+            text = _unescape(token[quote:-quote])
+            next_kind, next_token = self._peek()
+            if next_kind == 'langtag':
+                self._next()
+                return Literal(text, language=next_token[1:])
+            if next_kind == 'datatype':
+                self._next()
+                datatype = self._resource(*self._next())
+                return Literal(_typed_value(text, datatype), datatype)
+            return Literal(text)
+        return self._resource(kind, token)
+
+
+def parse_turtle(text: str) -> List[Tuple[str, str, object]]:
+    """Тройки (субъект, предикат, объект); IRI - строки, литералы - Literal"""
+    return TurtleParser(text).parse()
+
+
+def _local_name(iri: str) -> str:
+    return re.split(r'[#/:]', iri)[-1]
+
+
+class SensorSpec:
+    """Датчик цеха: имя экземпляра, вид ('temperature', 'humidity' или имя класса) и значение hasValue"""
+
+    __slots__ = ('name', 'kind', 'value')
+
+    def __init__(self, name: str, kind: str, value: Optional[float] = None):
+        self.name = name
+        self.kind = kind
+        self.value = value
+
+
+class ActuatorSpec:
+    """Исполнительное устройство цеха: имя экземпляра и вид ('fan', 'heater' или имя класса)"""
+
+    __slots__ = ('name', 'kind')
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+
+
+class WorkshopSpec:
+    """Цех с его датчиками и исполнительными устройствами"""
+
+    def __init__(self, name: str, sensors: List[SensorSpec], actuators: List[ActuatorSpec]):
+        self.name = name
+        self.sensors = sensors
+        self.actuators = actuators
+
+    def sensor_value(self, kind: str) -> Optional[float]:
+        """Начальное значение первого датчика вида kind, у которого задано hasValue"""
+        for sensor in self.sensors:
+            if sensor.kind == kind and sensor.value is not None:
+                return sensor.value
+        return None
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return self.sensor_value('temperature')
+
+    @property
+    def humidity(self) -> Optional[float]:
+        return self.sensor_value('humidity')
+
+    def has_actuator(self, kind: str) -> bool:
+        return any(actuator.kind == kind for actuator in self.actuators)
+
+
+class PlantTopology:
+    """Топология предприятия, построенная по онтологии: цеха, их датчики и исполнительные устройства"""
+
+    def __init__(self, workshops: List[WorkshopSpec], content_hash: str = ''):
+        self.workshops = workshops
+        # sha256 файла онтологии, из которого построена топология
+        self.content_hash = content_hash
+
+    def __len__(self) -> int:
+        return len(self.workshops)
+
+    def workshop(self, name: str) -> WorkshopSpec:
+        for workshop in self.workshops:
+            if workshop.name == name:
+                return workshop
+        raise KeyError(name)
+
+    def scenarios(self, steps: int = 15, **kwargs) -> list:
+        """Сценарии headless-симуляции: по одному на цех, начальные условия - показания датчиков"""
+        from headless import Scenario
+        scenarios = []
+        for workshop in self.workshops:
+            if workshop.temperature is None or workshop.humidity is None:
+                raise ValueError(f"У цеха '{workshop.name}' нет начальных значений температуры и влажности")
+            scenarios.append(Scenario(workshop.temperature, workshop.humidity, steps, name=workshop.name,
+                                      fan=workshop.has_actuator('fan'), heater=workshop.has_actuator('heater'),
+                                      **kwargs))
+        return scenarios
+
+    def to_compact(self) -> tuple:
+        return tuple((workshop.name,
+                      tuple((sensor.name, sensor.kind, sensor.value) for sensor in workshop.sensors),
+                      tuple((actuator.name, actuator.kind) for actuator in workshop.actuators))
+                     for workshop in self.workshops)
+
+    @classmethod
+    def from_compact(cls, data: tuple, content_hash: str = '') -> 'PlantTopology':
+        return cls([WorkshopSpec(name, [SensorSpec(*sensor) for sensor in sensors],
+                                 [ActuatorSpec(*actuator) for actuator in actuators])
+                    for name, sensors, actuators in data], content_hash)
+
+
+def build_topology(triples: List[Tuple[str, str, object]], namespace: str = VENTILATION_NS,
+                   content_hash: str = '') -> PlantTopology:
+    """Топология из троек онтологии: классы определяются с учетом rdfs:subClassOf"""
+    types: Dict[str, Set[str]] = {}
+    parents: Dict[str, Set[str]] = {}
+    properties: Dict[Tuple[str, str], List[object]] = {}
+    for subject, predicate, obj in triples:
+        if predicate == RDF_TYPE:
+            types.setdefault(subject, set()).add(obj)
+        elif predicate == RDFS_SUBCLASS_OF:
+            parents.setdefault(subject, set()).add(obj)
+        properties.setdefault((subject, predicate), []).append(obj)
+
+    closures: Dict[str, Set[str]] = {}
+
+    def ancestors(classes: Set[str]) -> Set[str]:
+        result = set()
+        for start in classes:
+            closure = closures.get(start)
+            if closure is None:
+                closure = set()
+                pending = [start]
+                while pending:
+                    cls = pending.pop()
+                    if cls not in closure:
+                        closure.add(cls)
+                        pending.extend(parents.get(cls, ()))
+                closures[start] = closure
+            result |= closure
+        return result
+
+    def kind(instance: str, kinds: Dict[str, str]) -> str:
+        classes = ancestors(types.get(instance, set()))
+        for class_name, kind_name in kinds.items():
+            if namespace + class_name in classes:
+                return kind_name
+        direct = sorted(types.get(instance, ()))
+        return _local_name(direct[0]) if direct else ''
+
+    workshop_class = namespace + 'Workshop'
+    workshops = []
+    for instance in types:
+        if workshop_class not in ancestors(types[instance]):
+            continue
+        sensors = []
+        for sensor in properties.get((instance, namespace + 'hasSensor'), []):
+            values = [obj.value for obj in properties.get((sensor, namespace + 'hasValue'), [])
+                      if isinstance(obj, Literal) and isinstance(obj.value, (int, float))]
+            sensors.append(SensorSpec(_local_name(sensor), kind(sensor, SENSOR_KINDS),
+                                      float(values[0]) if values else None))
+        actuators = [ActuatorSpec(_local_name(actuator), kind(actuator, ACTUATOR_KINDS))
+                     for actuator in properties.get((instance, namespace + 'hasActuator'), [])]
+        workshops.append(WorkshopSpec(_local_name(instance), sensors, actuators))
+    return PlantTopology(workshops, content_hash)
+
+
+def _cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.topology.bin'
+
+
+def _read_cache(cache_path: str, digest: bytes) -> Optional[tuple]:
+    try:
+        with open(cache_path, 'rb') as f:
+            header = f.read(len(_CACHE_MAGIC) + 1 + len(digest))
+            if header != _CACHE_MAGIC + bytes([TOPOLOGY_CACHE_VERSION]) + digest:
+                return None
+            return marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _write_cache(cache_path: str, digest: bytes, data: tuple):
+    temporary_path = cache_path + '.tmp'
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(_CACHE_MAGIC + bytes([TOPOLOGY_CACHE_VERSION]) + digest)
+            marshal.dump(data, f)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        # Кэш - только ускорение: без права записи топология просто строится заново
+        pass
+
+
+def load_topology(path: str = 'ontology.ttl', namespace: str = VENTILATION_NS,
+                  use_cache: bool = True) -> PlantTopology:
+    """Топология из файла онтологии.
+
+    Результат разбора кэшируется рядом с файлом (<имя>.topology.bin) в компактном бинарном
+    виде (marshal) с sha256 содержимого онтологии в заголовке; при совпадении хэша разбор
+    Turtle не выполняется.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    hasher = hashlib.sha256(content)
+    hasher.update(namespace.encode())
+    digest = hasher.digest()
+    cache_path = _cache_path(path)
+
+    if use_cache:
+        data = _read_cache(cache_path, digest)
+        if data is not None:
+            return PlantTopology.from_compact(data, digest.hex())
+
+    topology = build_topology(parse_turtle(content.decode('utf-8')), namespace, digest.hex())
+    if use_cache:
+        _write_cache(cache_path, digest, topology.to_compact())
+    return topology
@@ -0,0 +1,128 @@
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+import numpy as np
+
+from batch_simulation import DEFAULT_CLIMATE, external_climate, plant_step
+from simulation import get_comfort_zone_bounds
+
+if TYPE_CHECKING:
+    from batch_simulation import BatchVentilationSimulator
+
+# Уровни, из которых собираются последовательности управления (как fan_speed_map и heater_map)
+FAN_LEVELS = (0.0, 0.33, 0.66, 1.0)
+HEATER_LEVELS = (0.0, 1.0)
+
+
+class PredictiveController:
+    """Управление с прогнозом (MPC) поверх нечеткого регулятора.
+
+    Кандидат - первое действие и действие, удерживаемое на остальных шагах горизонта; каждое
+    выбирается из сетки FAN_LEVELS x HEATER_LEVELS и решения нечеткого регулятора. Все
+    кандидаты всех цехов прогоняются по модели цеха (batch_simulation.plant_step) одним
+    массивом формы (цеха, кандидаты), как в симуляторе: в комфортной зоне шаг пропускается.
+    Стоимость - шаги вне зоны с квадратом выхода за границы, усилие исполнительных устройств,
+    отклонение от середины зоны в конце горизонта и отклонение первого действия от нечеткого.
+    Применяется первое действие лучшего кандидата.
+    """
+
+    def __init__(self, horizon: int = 4, fan_levels: Sequence[float] = FAN_LEVELS,
+                 heater_levels: Sequence[float] = HEATER_LEVELS, prior_weight: float = 0.5,
+                 effort_weight: float = 0.05, center_weight: float = 0.2):
+        if horizon < 1:
+            raise ValueError("Горизонт прогноза должен быть не меньше 1 шага")
+        self.horizon = horizon
+        self.prior_weight = prior_weight
+        self.effort_weight = effort_weight
+        self.center_weight = center_weight
+        fan, heater = np.meshgrid(np.asarray(fan_levels, dtype=float), np.asarray(heater_levels, dtype=float))
+        self.grid_fan = fan.ravel()
+        self.grid_heater = heater.ravel()
+        # Пары (первое действие, удерживаемое действие); последний вариант - решение регулятора
+        options = len(self.grid_fan) + 1
+        self.first, self.hold = [index.ravel() for index in np.meshgrid(np.arange(options), np.arange(options),
+                                                                         indexing='ij')]
+
+    def plan(self, temperature, humidity, prior: Dict[str, np.ndarray], external_temp, external_humidity,
+             temp_bounds, hum_bounds, fan_available=True, heater_available=True) -> Dict[str, np.ndarray]:
+        """Действия для цехов по текущему состоянию и прогнозу внешнего климата формы (цеха, горизонт).
+
+        prior - решение нечеткого регулятора для тех же цехов; temp_bounds и hum_bounds -
+        границы комфортной зоны формы (цеха, 2) или (2,).
+        """
+        temperature = np.asarray(temperature, dtype=float)[:, None]
+        humidity = np.asarray(humidity, dtype=float)[:, None]
+        n = temperature.shape[0]
+        external_temp = np.broadcast_to(np.asarray(external_temp, dtype=float), (n, self.horizon))
+        external_humidity = np.broadcast_to(np.asarray(external_humidity, dtype=float), (n, self.horizon))
+        temp_bounds = np.broadcast_to(np.asarray(temp_bounds, dtype=float), (n, 2))
+        hum_bounds = np.broadcast_to(np.asarray(hum_bounds, dtype=float), (n, 2))
+        temp_low, temp_high = temp_bounds[:, :1], temp_bounds[:, 1:]
+        hum_low, hum_high = hum_bounds[:, :1], hum_bounds[:, 1:]
+        ideal_temp, ideal_hum = (temp_low + temp_high) / 2, (hum_low + hum_high) / 2
+        temp_scale, hum_scale = (temp_high - temp_low) / 2, (hum_high - hum_low) / 2
+
+        prior_fan = np.broadcast_to(np.asarray(prior['fan_speed'], dtype=float), (n,))[:, None]
+        prior_heater = np.broadcast_to(np.asarray(prior['heater_state'], dtype=float), (n,))[:, None]
+        fan_options = np.concatenate([np.broadcast_to(self.grid_fan, (n, len(self.grid_fan))), prior_fan], axis=1)
+        heater_options = np.concatenate([np.broadcast_to(self.grid_heater, (n, len(self.grid_heater))),
+                                         prior_heater], axis=1)
+        fan_options = fan_options * np.broadcast_to(np.asarray(fan_available, dtype=float), (n,))[:, None]
+        heater_options = heater_options * np.broadcast_to(np.asarray(heater_available, dtype=float), (n,))[:, None]
+        hold_fan, hold_heater = fan_options[:, self.hold], heater_options[:, self.hold]
+
+        # Первый шаг (цех вне зоны, управляется всегда) общий для кандидатов с одинаковым первым
+        # действием: считается по вариантам и раскладывается на кандидатов индексом self.first
+        temperatures, humidities = plant_step(temperature, humidity, external_temp[:, :1], external_humidity[:, :1],
+                                              ideal_temp, ideal_hum, fan_options, heater_options)
+        cost = self.prior_weight * ((fan_options - prior_fan) ** 2 + (heater_options - prior_heater) ** 2)
+        cost += self.effort_weight * (fan_options + heater_options)
+        outside, excess = self._zone_cost(temperatures, humidities, temp_low, temp_high, hum_low, hum_high,
+                                          temp_scale, hum_scale)
+        cost = (cost + excess)[:, self.first]
+        temperatures, humidities, outside = temperatures[:, self.first], humidities[:, self.first], outside[:, self.first]
+
+        # Следующие шаги: удерживаемое действие, пока цех не вошел в комфортную зону
+        hold_effort = self.effort_weight * (hold_fan + hold_heater)
+        for step in range(1, self.horizon):
+            next_temperatures, next_humidities = plant_step(
+                temperatures, humidities, external_temp[:, step:step + 1], external_humidity[:, step:step + 1],
+                ideal_temp, ideal_hum, hold_fan, hold_heater)
+            cost += hold_effort * outside
+            temperatures = np.where(outside, next_temperatures, temperatures)
+            humidities = np.where(outside, next_humidities, humidities)
+            outside, excess = self._zone_cost(temperatures, humidities, temp_low, temp_high, hum_low, hum_high,
+                                              temp_scale, hum_scale)
+            cost += excess
+        cost += self.center_weight * (((temperatures - ideal_temp) / temp_scale) ** 2
+                                      + ((humidities - ideal_hum) / hum_scale) ** 2)
+
+        best = self.first[np.argmin(cost, axis=1)]
+        rows = np.arange(n)
+        return {'fan_speed': fan_options[rows, best], 'heater_state': heater_options[rows, best]}
+
+    @staticmethod
+    def _zone_cost(temperatures, humidities, temp_low, temp_high, hum_low, hum_high, temp_scale, hum_scale):
+        """Маска состояний вне комфортной зоны и штраф шага: 1 вне зоны плюс квадрат выхода за границы"""
+        temp_excess = (np.maximum(temp_low - temperatures, 0) + np.maximum(temperatures - temp_high, 0)) / temp_scale
+        hum_excess = (np.maximum(hum_low - humidities, 0) + np.maximum(humidities - hum_high, 0)) / hum_scale
+        outside = (temp_excess > 0) | (hum_excess > 0)
+        return outside, outside + temp_excess ** 2 + hum_excess ** 2
+
+    def plan_batch(self, simulator: 'BatchVentilationSimulator', mask: np.ndarray,
+                   prior: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Действия для цехов mask пакетного симулятора (после update_environment текущего шага)"""
+        external_temp, external_humidity = simulator.climate_forecast(mask, self.horizon)
+        return self.plan(simulator.temperature[mask], simulator.humidity[mask], prior, external_temp,
+                         external_humidity, simulator.temp_bounds[mask], simulator.hum_bounds[mask],
+                         simulator.fan_available[mask], simulator.heater_available[mask])
+
+    def decide(self, temperature: float, humidity: float, step: int, prior: Dict[str, float],
+               climate: Optional[Dict[str, float]] = None, phase: float = 0.0) -> Dict[str, float]:
+        """Одно действие для VentilationSimulator (климат по умолчанию - как в update_environment)"""
+        climate = dict(DEFAULT_CLIMATE, **(climate or {}))
+        external_temp, external_humidity = external_climate(climate, phase, step + np.arange(self.horizon))
+        temp_bounds, hum_bounds = get_comfort_zone_bounds()
+        actions = self.plan([temperature], [humidity], prior, external_temp, external_humidity,
+                            temp_bounds, hum_bounds)
+        return {'fan_speed': float(actions['fan_speed'][0]), 'heater_state': float(actions['heater_state'][0])}
+
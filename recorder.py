@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+# Версия формата каталога траектории
+TRAJECTORY_FORMAT_VERSION = 1
+
+# Колонки траектории и их типы; каждая колонка - отдельный бинарный файл <имя>.bin
+TRAJECTORY_COLUMNS = {
+    'step': np.int64,
+    'workshop': np.int32,
+    'temperature': np.float64,
+    'humidity': np.float64,
+    'fan_speed': np.float64,
+    'heater_state': np.float64,
+}
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, name + '.bin')
+
+
+def _meta_path(path: str) -> str:
+    return os.path.join(path, 'meta.json')
+
+
+class RingBuffer:
+    """Окно последних строк траектории фиксированного размера (для живого графика)"""
+
+    def __init__(self, capacity: int, columns: Dict[str, type] = TRAJECTORY_COLUMNS):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in columns.items()}
+        self.count = 0
+        self._position = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, row: Dict[str, float]):
+        for name, column in self.columns.items():
+            column[self._position] = row[name]
+        self._position = (self._position + 1) % self.capacity
+        self.count += 1
+
+    def append_batch(self, values: Dict[str, np.ndarray]):
+        n = len(next(iter(values.values())))
+        if n >= self.capacity:
+            # В окно помещаются только последние capacity строк
+            values = {name: column[-self.capacity:] for name, column in values.items()}
+            skipped = n - self.capacity
+            self.count += skipped
+            self._position = (self._position + skipped) % self.capacity
+            n = self.capacity
+        first = min(n, self.capacity - self._position)
+        for name, column in self.columns.items():
+            column[self._position:self._position + first] = values[name][:first]
+            column[:n - first] = values[name][first:n]
+        self._position = (self._position + n) % self.capacity
+        self.count += n
+
+    def view(self, name: str) -> np.ndarray:
+        """Строки окна в хронологическом порядке (копия)"""
+        column = self.columns[name]
+        if self.count < self.capacity:
+            return column[:self.count].copy()
+        return np.concatenate([column[self._position:], column[:self._position]])
+
+
+class TrajectoryRecorder:
+    """Потоковая запись траектории в колоночный каталог на диске.
+
+    Файл каждой колонки растет кусками по chunk_size строк: место под кусок выделяется заранее,
+    кусок отображается в память (np.memmap) и заполняется по мере записи, так что в ОЗУ
+    никогда не держится вся история. Необязательное окно window хранит последние строки
+    в кольцевом буфере для живого графика. Без path запись идет во временный каталог,
+    удаляемый вместе с объектом.
+    """
+
+    def __init__(self, path: Optional[str] = None, chunk_size: int = 65536, window: Optional[int] = None):
+        self._temporary_dir = None
+        if path is None:
+            self._temporary_dir = tempfile.mkdtemp(prefix='trajectory-')
+            weakref.finalize(self, shutil.rmtree, self._temporary_dir, True)
+            path = self._temporary_dir
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.window = RingBuffer(window) if window else None
+
+        self.length = 0
+        self._capacity = 0
+        self._chunk_start = 0
+        self._chunks: Dict[str, np.memmap] = {}
+        self._files = {name: open(_column_path(path, name), 'w+b') for name in TRAJECTORY_COLUMNS}
+        self._write_meta()
+
+    def __enter__(self) -> 'TrajectoryRecorder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_meta(self):
+        meta = {
+            'format_version': TRAJECTORY_FORMAT_VERSION,
+            'length': self.length,
+            'columns': {name: np.dtype(dtype).str for name, dtype in TRAJECTORY_COLUMNS.items()},
+        }
+        with open(_meta_path(self.path) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(_meta_path(self.path) + '.tmp', _meta_path(self.path))
+
+    def _new_chunk(self):
+        """Выделение места под следующий кусок во всех колонках и отображение его в память"""
+        self._flush_chunks()
+        start = self._capacity
+        for name, dtype in TRAJECTORY_COLUMNS.items():
+            itemsize = np.dtype(dtype).itemsize
+            f = self._files[name]
+            f.truncate((start + self.chunk_size) * itemsize)
+            self._chunks[name] = np.memmap(f, dtype=dtype, mode='r+', offset=start * itemsize,
+                                           shape=(self.chunk_size,))
+        self._chunk_start = start
+        self._capacity += self.chunk_size
+
+    def _flush_chunks(self):
+        for chunk in self._chunks.values():
+            chunk.flush()
+
+    def append(self, step: int, temperature: float, humidity: float, fan_speed: float,
+               heater_state: float, workshop: int = 0):
+        """Запись одной строки (интерфейс SimulationVisualizer.update)"""
+        if self.length >= self._capacity:
+            self._new_chunk()
+        index = self.length - self._chunk_start
+        chunks = self._chunks
+        chunks['step'][index] = step
+        chunks['workshop'][index] = workshop
+        chunks['temperature'][index] = temperature
+        chunks['humidity'][index] = humidity
+        chunks['fan_speed'][index] = fan_speed
+        chunks['heater_state'][index] = heater_state
+        self.length += 1
+        if self.window is not None:
+            self.window.append({'step': step, 'workshop': workshop, 'temperature': temperature,
+                                'humidity': humidity, 'fan_speed': fan_speed, 'heater_state': heater_state})
+
+    def append_batch(self, step, workshop, temperature, humidity, fan_speed, heater_state):
+        """Запись пачки строк (например, всех цехов на одном шаге)"""
+        arrays = np.broadcast_arrays(np.asarray(step), np.asarray(workshop), np.asarray(temperature),
+                                     np.asarray(humidity), np.asarray(fan_speed), np.asarray(heater_state))
+        values = {name: np.ravel(array) for name, array in zip(TRAJECTORY_COLUMNS, arrays)}
+        n = len(values['step'])
+        written = 0
+        while written < n:
+            if self.length >= self._capacity:
+                self._new_chunk()
+            index = self.length - self._chunk_start
+            count = min(n - written, self.chunk_size - index)
+            for name, chunk in self._chunks.items():
+                chunk[index:index + count] = values[name][written:written + count]
+            self.length += count
+            written += count
+        if self.window is not None and n:
+            self.window.append_batch(values)
+
+    def record_step(self, step, running, temperatures, humidities, fan_speeds, heater_states):
+        """Наблюдатель шага для HeadlessSimulation.run: записывает все работающие цеха"""
+        workshops = np.flatnonzero(running)
+        self.append_batch(step, workshops, temperatures[workshops], humidities[workshops],
+                          fan_speeds[workshops], heater_states[workshops])
+
+    def column(self, name: str) -> np.ndarray:
+        """Вся записанная колонка, отображенная в память (без загрузки в ОЗУ)"""
+        if self.length == 0:
+            return np.zeros(0, dtype=TRAJECTORY_COLUMNS[name])
+        return np.memmap(self._files[name], dtype=TRAJECTORY_COLUMNS[name], mode='r', shape=(self.length,))
+
+    def flush(self):
+        """Сброс записанного на диск; после flush файл можно читать TrajectoryReader"""
+        self._flush_chunks()
+        self._write_meta()
+
+    def close(self):
+        if not self._files:
+            return
+        self.flush()
+        self._chunks = {}
+        # Отрезаем заранее выделенное, но не заполненное место
+        for name, f in self._files.items():
+            f.truncate(self.length * np.dtype(TRAJECTORY_COLUMNS[name]).itemsize)
+            f.close()
+        self._files = {}
+
+    def reader(self) -> 'TrajectoryReader':
+        self.flush()
+        return TrajectoryReader(self.path)
+
+
+class TrajectoryReader:
+    """Чтение колоночного каталога траектории через memmap, кусками, без загрузки целиком"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(_meta_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != TRAJECTORY_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата траектории: {meta.get('format_version')}")
+        self.length = meta['length']
+        self.columns = {name: np.dtype(dtype) for name, dtype in meta['columns'].items()}
+
+    def __len__(self) -> int:
+        return self.length
+
+    def column(self, name: str) -> np.ndarray:
+        if self.length == 0:
+            return np.zeros(0, dtype=self.columns[name])
+        return np.memmap(_column_path(self.path, name), dtype=self.columns[name], mode='r', shape=(self.length,))
+
+    def iter_chunks(self, rows: int = 65536, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """Последовательный обход траектории кусками по rows строк"""
+        mapped = {name: self.column(name) for name in (columns or self.columns)}
+        for start in range(0, self.length, rows):
+            yield {name: column[start:start + rows] for name, column in mapped.items()}
+
+    def workshop(self, workshop: int, rows: int = 65536) -> Dict[str, np.ndarray]:
+        """Траектория одного цеха (в память попадают только его строки)"""
+        parts = {name: [] for name in self.columns}
+        for chunk in self.iter_chunks(rows):
+            mask = chunk['workshop'] == workshop
+            for name in parts:
+                parts[name].append(np.asarray(chunk[name][mask]))
+        return {name: np.concatenate(values) if values else np.zeros(0, dtype=self.columns[name])
+                for name, values in parts.items()}
+
+    def summary(self, rows: int = 65536) -> Dict[str, object]:
+        """Сводка по всей траектории за один проход: число цехов, шагов и min/max/mean колонок"""
+        stats = {name: {'min': np.inf, 'max': -np.inf, 'sum': 0.0}
+                 for name in ('temperature', 'humidity', 'fan_speed', 'heater_state')}
+        workshops = set()
+        last_step = 0
+        for chunk in self.iter_chunks(rows):
+            workshops.update(np.unique(chunk['workshop']).tolist())
+            last_step = max(last_step, int(chunk['step'].max()))
+            for name, item in stats.items():
+                item['min'] = min(item['min'], float(chunk[name].min()))
+                item['max'] = max(item['max'], float(chunk[name].max()))
+                item['sum'] += float(chunk[name].sum())
+        return {
+            'rows': self.length,
+            'workshops': len(workshops),
+            'last_step': last_step,
+            'columns': {name: {'min': item['min'], 'max': item['max'],
+                               'mean': item['sum'] / self.length if self.length else 0.0}
+                        for name, item in stats.items()},
+        }
+
+
+def replay(path: str, workshop: int = 0, visualizer=None, rows: int = 65536):
+    """Воспроизведение записанной траектории цеха в SimulationVisualizer"""
+    if visualizer is None:
+        from visualization import SimulationVisualizer
+        visualizer = SimulationVisualizer()
+    reader = TrajectoryReader(path)
+    for chunk in reader.iter_chunks(rows):
+        mask = chunk['workshop'] == workshop
+        for step, temperature, humidity, fan_speed, heater_state in zip(
+                chunk['step'][mask].tolist(), chunk['temperature'][mask].tolist(),
+                chunk['humidity'][mask].tolist(), chunk['fan_speed'][mask].tolist(),
+                chunk['heater_state'][mask].tolist()):
+            visualizer.update(step, temperature, humidity, fan_speed, heater_state)
+    visualizer.show_final()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Просмотр и воспроизведение записанных траекторий')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    info_parser = subparsers.add_parser('info', help='сводка по траектории')
+    info_parser.add_argument('path')
+    replay_parser = subparsers.add_parser('replay', help='воспроизведение на графиках')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--workshop', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        print(json.dumps(TrajectoryReader(args.path).summary(), ensure_ascii=False, indent=2))
+    else:
+        replay(args.path, args.workshop)
+
+
+if __name__ == "__main__":
+    main()
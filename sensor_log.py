@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from fuzzy_system import FuzzyInferenceSystem
+from simulation import get_comfort_zone_bounds
+
+# Строк журнала в одном куске: память конвейера не зависит от размера файла
+DEFAULT_CHUNK_ROWS = 65536
+
+# CSV читается блоками текста такого размера (символов) и режется на строки целиком
+CSV_BLOCK_SIZE = 4 << 20
+
+# Запись двоичного журнала по умолчанию: пары float64 (температура, влажность)
+DEFAULT_LOG_DTYPE = 'temperature:<f8,humidity:<f8'
+
+# Запись двоичного файла решений; описание формата сохраняется рядом в <файл>.json
+DECISION_DTYPE = np.dtype([
+    ('temperature', '<f8'),
+    ('humidity', '<f8'),
+    ('fan_speed', '<f8'),
+    ('heater_state', '<f8'),
+    ('comfortable', 'u1'),
+])
+DECISION_FORMAT_VERSION = 1
+
+DECISION_COLUMNS = ('fan_speed', 'heater_state', 'comfortable')
+
+
+def parse_dtype(spec: str) -> np.dtype:
+    """Тип записи двоичного журнала из строки 'имя:тип,...', например 'time:<i8,temperature:<f4,humidity:<f4'"""
+    fields = []
+    for item in spec.split(','):
+        name, _, field_type = item.strip().partition(':')
+        if not name or not field_type:
+            raise ValueError(f"Поле записи журнала задается как 'имя:тип', получено '{item}'")
+        fields.append((name, field_type))
+    dtype = np.dtype(fields)
+    missing = {'temperature', 'humidity'} - set(dtype.names)
+    if missing:
+        raise ValueError(f"В записи журнала нет полей: {sorted(missing)}")
+    return dtype
+
+
+def comfort_flags(temperatures: np.ndarray, humidities: np.ndarray) -> np.ndarray:
+    """Векторный аналог simulation.is_comfortable_zone"""
+    (temp_low, temp_high), (hum_low, hum_high) = get_comfort_zone_bounds()
+    return ((temp_low <= temperatures) & (temperatures <= temp_high)
+            & (hum_low <= humidities) & (humidities <= hum_high))
+
+
+class CsvLog:
+    """Журнал датчиков в CSV с заголовком; читается блоками по block_size символов, исходные строки сохраняются"""
+
+    def __init__(self, path: str, block_size: int = CSV_BLOCK_SIZE, delimiter: str = ',',
+                 temperature_column: str = 'temperature', humidity_column: str = 'humidity'):
+        self.path = path
+        self.block_size = block_size
+        self.delimiter = delimiter
+        with open(path, encoding='utf-8', newline='') as f:
+            self.header = f.readline().rstrip('\r\n')
+        columns = [name.strip().strip('"') for name in self.header.split(delimiter)]
+        for column in (temperature_column, humidity_column):
+            if column not in columns:
+                raise ValueError(f"В заголовке журнала {path} нет колонки '{column}'")
+        self.usecols = (columns.index(temperature_column), columns.index(humidity_column))
+
+    def iter_chunks(self) -> Iterator[Dict[str, object]]:
+        with open(self.path, encoding='utf-8', newline='') as f:
+            f.readline()
+            line_number = 2
+            tail = ''
+            while True:
+                block = f.read(self.block_size)
+                if block:
+                    # Неполная последняя строка блока переносится в следующий
+                    end = block.rfind('\n') + 1
+                    if not end:
+                        tail += block
+                        continue
+                    text, tail = tail + block[:end], block[end:]
+                elif tail:
+                    text, tail = tail, ''
+                else:
+                    return
+                # Пустые строки пропускаются, чтобы строки и значения шли один к одному
+                lines = list(filter(None, text.splitlines()))
+                first_line = line_number
+                line_number += text.count('\n') + (not text.endswith('\n'))
+                if not lines:
+                    continue
+                try:
+                    values = np.loadtxt(lines, delimiter=self.delimiter, usecols=self.usecols,
+                                        quotechar='"', ndmin=2)
+                except ValueError as error:
+                    raise ValueError(f"Ошибка чтения журнала {self.path} "
+                                     f"в строках {first_line}-{line_number - 1}: {error}")
+                yield {'temperature': values[:, 0], 'humidity': values[:, 1], 'lines': lines}
+
+
+class BinaryLog:
+    """Двоичный журнал из записей фиксированного размера (тип записи - parse_dtype)"""
+
+    def __init__(self, path: str, dtype: Optional[np.dtype] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.dtype = dtype if dtype is not None else parse_dtype(DEFAULT_LOG_DTYPE)
+        self.chunk_rows = chunk_rows
+        if os.path.getsize(path) % self.dtype.itemsize:
+            raise ValueError(f"Размер журнала {path} не кратен размеру записи ({self.dtype.itemsize} байт)")
+
+    def iter_chunks(self) -> Iterator[Dict[str, object]]:
+        with open(self.path, 'rb') as f:
+            while True:
+                records = np.fromfile(f, dtype=self.dtype, count=self.chunk_rows)
+                if not len(records):
+                    return
+                yield {'temperature': records['temperature'].astype(float),
+                       'humidity': records['humidity'].astype(float)}
+
+
+class TrajectoryLog:
+    """Записанная траектория (каталог recorder.TrajectoryRecorder) как журнал датчиков"""
+
+    def __init__(self, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        from recorder import TrajectoryReader
+        self.reader = TrajectoryReader(path)
+        self.chunk_rows = chunk_rows
+
+    def iter_chunks(self) -> Iterator[Dict[str, object]]:
+        for chunk in self.reader.iter_chunks(self.chunk_rows, ['temperature', 'humidity']):
+            yield {'temperature': np.asarray(chunk['temperature']), 'humidity': np.asarray(chunk['humidity'])}
+
+
+def open_log(path: str, log_format: Optional[str] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+             dtype: Optional[str] = None, **csv_options):
+    """Журнал по пути; формат 'csv', 'binary' или 'trajectory' определяется по расширению или каталогу.
+
+    csv_options (block_size, delimiter, temperature_column, humidity_column) используются только
+    для CSV, chunk_rows и dtype - для двоичных форматов.
+    """
+    if log_format is None:
+        if os.path.isdir(path):
+            log_format = 'trajectory'
+        elif path.lower().endswith(('.csv', '.txt')):
+            log_format = 'csv'
+        else:
+            log_format = 'binary'
+    if log_format == 'csv':
+        return CsvLog(path, **csv_options)
+    if log_format == 'binary':
+        return BinaryLog(path, parse_dtype(dtype or DEFAULT_LOG_DTYPE), chunk_rows)
+    if log_format == 'trajectory':
+        return TrajectoryLog(path, chunk_rows)
+    raise ValueError(f"Неизвестный формат журнала: '{log_format}'")
+
+
+class CsvDecisionWriter:
+    """Решения в CSV: исходная строка журнала CSV (или температура и влажность) и колонки решений"""
+
+    def __init__(self, path: str, header: Optional[str] = None, delimiter: str = ','):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.delimiter = delimiter
+        columns = [header] if header is not None else ['temperature', 'humidity']
+        self.file.write(delimiter.join(columns + list(DECISION_COLUMNS)) + '\n')
+
+    def write(self, chunk: Dict[str, object], decisions: Dict[str, np.ndarray]):
+        n = len(decisions['fan_speed'])
+        separator = self.delimiter
+        if 'lines' in chunk:
+            columns = [chunk['lines']]
+            row_format = f'%s{separator}'
+        else:
+            columns = [chunk['temperature'].tolist(), chunk['humidity'].tolist()]
+            row_format = f'%.6g{separator}%.6g{separator}'
+        columns += [decisions['fan_speed'].tolist(), decisions['heater_state'].tolist(),
+                    decisions['comfortable'].astype(int).tolist()]
+        row_format += f'%.6g{separator}%.6g{separator}%d\n'
+        # Весь кусок форматируется одной операцией над строкой, без цикла Python по строкам
+        values: List[object] = [None] * (n * len(columns))
+        for position, column in enumerate(columns):
+            values[position::len(columns)] = column
+        self.file.write((row_format * n) % tuple(values))
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryDecisionWriter:
+    """Решения в двоичном файле записей DECISION_DTYPE; описание формата - в <файл>.json"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.rows = 0
+
+    def write(self, chunk: Dict[str, object], decisions: Dict[str, np.ndarray]):
+        records = np.empty(len(decisions['fan_speed']), dtype=DECISION_DTYPE)
+        records['temperature'] = chunk['temperature']
+        records['humidity'] = chunk['humidity']
+        for name in DECISION_COLUMNS:
+            records[name] = decisions[name]
+        records.tofile(self.file)
+        self.rows += len(records)
+
+    def close(self):
+        self.file.close()
+        with open(self.path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'format_version': DECISION_FORMAT_VERSION, 'rows': self.rows,
+                       'dtype': [list(field) for field in DECISION_DTYPE.descr]}, f)
+
+
+def replay_log(fis: FuzzyInferenceSystem, log, output_path: str) -> Dict[str, object]:
+    """Прогон журнала через пакетный вывод кусками; решения пишутся в output_path.
+
+    Файл с расширением .csv пишется как CSV, иначе - двоичные записи DECISION_DTYPE. Флаг
+    comfortable отмечает строки в комфортной зоне (там симулятор не включает регулирование).
+    """
+    if output_path.lower().endswith('.csv'):
+        writer = CsvDecisionWriter(output_path, getattr(log, 'header', None), getattr(log, 'delimiter', ','))
+    else:
+        writer = BinaryDecisionWriter(output_path)
+
+    started = time.perf_counter()
+    rows = comfortable = heater_on = 0
+    fan_total = 0.0
+    try:
+        for chunk in log.iter_chunks():
+            decisions = fis.infer_batch(chunk['temperature'], chunk['humidity'])
+            decisions['comfortable'] = comfort_flags(chunk['temperature'], chunk['humidity'])
+            writer.write(chunk, decisions)
+            rows += len(decisions['fan_speed'])
+            comfortable += int(decisions['comfortable'].sum())
+            heater_on += int(np.count_nonzero(decisions['heater_state']))
+            fan_total += float(decisions['fan_speed'].sum())
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_s': rows / seconds if seconds > 0 else 0.0,
+        'comfortable_share': comfortable / rows if rows else 0.0,
+        'heater_on_share': heater_on / rows if rows else 0.0,
+        'mean_fan_speed': fan_total / rows if rows else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Прогон записанных журналов датчиков через регулятор')
+    parser.add_argument('log', help='журнал: CSV, двоичные записи или каталог траектории')
+    parser.add_argument('output', help='файл решений (.csv - CSV, иначе двоичный)')
+    parser.add_argument('--format', choices=['csv', 'binary', 'trajectory'], help='формат журнала')
+    parser.add_argument('--dtype', default=DEFAULT_LOG_DTYPE, help='тип записи двоичного журнала')
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--temperature-column', default='temperature')
+    parser.add_argument('--humidity-column', default='humidity')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--centroid', action='store_true', help='дефаззификация вентилятора центроидом')
+    parser.add_argument('--sugeno', action='store_true', help='вывод Такаги-Сугено (линейные заключения)')
+    parser.add_argument('--metrics', help='файл метрик этапов (.prom - формат Prometheus, иначе JSON)')
+    args = parser.parse_args(argv)
+
+    log = open_log(args.log, args.format, args.chunk_rows, args.dtype, delimiter=args.delimiter,
+                   temperature_column=args.temperature_column, humidity_column=args.humidity_column)
+    fis = FuzzyInferenceSystem(args.db)
+    if args.centroid:
+        fis.fan_defuzzification = 'centroid'
+    if args.sugeno:
+        fis.inference = 'sugeno'
+    if args.metrics:
+        from metrics import Metrics
+        fis.metrics = Metrics()
+    print(json.dumps(replay_log(fis, log, args.output), ensure_ascii=False, indent=2))
+    if fis.metrics is not None:
+        fis.metrics.write(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-import numpy as np
+import math
+
 from fuzzy_system import FuzzyInferenceSystem
-from visualization import SimulationVisualizer
+from metrics import stage
+from tracing import ConsoleTracer
 
 
 def get_user_input():
@@ -57,12 +59,21 @@ def get_comfort_margin(temperature: float, humidity: float) -> tuple[float, floa
 
 
 class VentilationSimulator:
-    def __init__(self):
-        self.fis = FuzzyInferenceSystem('knowledge_base.db')
-        self.visualizer = SimulationVisualizer()
-
-        # Интерактивный ввод начальных условий
-        self.temperature, self.humidity = get_user_input()
+    def __init__(self, record_path: str = None, temperature: float = None, humidity: float = None,
+                 db_path: str = 'knowledge_base.db'):
+        self.fis = FuzzyInferenceSystem(db_path)
+        self.fis.tracer = ConsoleTracer()  # Подробный отчет о каждом решении в консоли
+        # matplotlib загружается только для интерактивного симулятора, а не при импорте модуля
+        from visualization import SimulationVisualizer
+        from recorder import TrajectoryRecorder
+        # Траектория сохраняется в каталог record_path, если он задан (см. recorder.py)
+        self.visualizer = SimulationVisualizer(recorder=TrajectoryRecorder(record_path) if record_path else None)
+
+        # Интерактивный ввод начальных условий, если они не заданы явно
+        if temperature is None or humidity is None:
+            self.temperature, self.humidity = get_user_input()
+        else:
+            self.temperature, self.humidity = temperature, humidity
 
         # Внешние условия (имитация)
         self.external_temp = 15.0
@@ -70,6 +81,8 @@ class VentilationSimulator:
 
         self.step = 0
         self.comfort_steps_count = 0  # Счетчик шагов в комфортной зоне
+        # Управление с прогнозом (predictive.PredictiveController); None - реактивный нечеткий регулятор
+        self.predictive = None
 
         # В методе замените вывод:
         temp_bounds, hum_bounds = get_comfort_zone_bounds()
@@ -88,8 +101,8 @@ class VentilationSimulator:
 
     def update_environment(self):
         """Имитация изменения внешней среды"""
-        self.external_temp = 15 + 10 * np.sin(self.step * 0.1)
-        self.external_humidity = 50 + 20 * np.sin(self.step * 0.05)
+        self.external_temp = 15 + 10 * math.sin(self.step * 0.1)
+        self.external_humidity = 50 + 20 * math.sin(self.step * 0.05)
 
     def apply_control_actions(self, fan_speed: float, heater_state: float):
         """Применение управляющих воздействий к модели цеха с учетом стремления к середине зоны"""
@@ -127,6 +140,8 @@ class VentilationSimulator:
 
         step = 0
         actual_steps = 0
+        # Этапы шага замеряются, если к регулятору подключены метрики (fis.metrics)
+        metrics = self.fis.metrics
 
         while actual_steps < steps and step < steps * 2:  # Защита от бесконечного цикла
             step += 1
@@ -143,7 +158,8 @@ class VentilationSimulator:
                 print("-" * 40)
 
                 # Все равно обновляем визуализацию (нулевое управление)
-                self.visualizer.update(step, self.temperature, self.humidity, 0, 0)
+                with stage(metrics, 'plot'):
+                    self.visualizer.update(step, self.temperature, self.humidity, 0, 0)
 
                 # Пропускаем остальную логику шага
                 continue
@@ -155,21 +171,28 @@ class VentilationSimulator:
             print(f"\n🎯 ШАГ {step} (активный шаг {actual_steps}):")
             print("-" * 40)
 
-            self.update_environment()
+            with stage(metrics, 'environment'):
+                self.update_environment()
             print(f"🌍 Внешние условия: temp={self.external_temp:.1f}°C, hum={self.external_humidity:.1f}%")
 
             print(f"🏭 Состояние цеха: temp={self.temperature:.1f}°C, hum={self.humidity:.1f}%")
-            actions = self.fis.infer(self.temperature, self.humidity)
+            with stage(metrics, 'decision'):
+                actions = self.fis.infer(self.temperature, self.humidity)
+                if self.predictive is not None:
+                    # Решение нечеткого регулятора - априорный вариант для перебора по прогнозу
+                    actions = self.predictive.decide(self.temperature, self.humidity, step, actions)
             fan_speed = actions['fan_speed']
             heater_state = actions['heater_state']
 
             print(f"🎛 УПРАВЛЕНИЕ: вентилятор={fan_speed:.2f}, обогреватель={'ВКЛ' if heater_state > 0.5 else 'ВЫКЛ'}")
 
             # Обновляем визуализацию
-            self.visualizer.update(step, self.temperature, self.humidity, fan_speed, heater_state)
+            with stage(metrics, 'plot'):
+                self.visualizer.update(step, self.temperature, self.humidity, fan_speed, heater_state)
 
             # Применяем управление
-            self.apply_control_actions(fan_speed, heater_state)
+            with stage(metrics, 'control'):
+                self.apply_control_actions(fan_speed, heater_state)
 
         # В конце метода run замените вывод статистики:
         temp_bounds, hum_bounds = get_comfort_zone_bounds()
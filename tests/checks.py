@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def assert_batch_matches_scalar(fis, temperatures, humidities, tolerance=0.0):
+    """infer_batch совпадает с infer в каждой точке (с допуском tolerance)"""
+    batch = fis.infer_batch(temperatures, humidities)
+    scalar = [fis.infer(t, h) for t, h in zip(temperatures, humidities)]
+    for output in ('fan_speed', 'heater_state'):
+        expected = np.array([decision[output] for decision in scalar])
+        assert batch[output].shape == np.shape(temperatures)
+        np.testing.assert_allclose(batch[output], expected, rtol=0, atol=tolerance)
+
+
+def assert_empty_batch(fis):
+    batch = fis.infer_batch([], [])
+    for output in ('fan_speed', 'heater_state'):
+        assert batch[output].shape == (0,)
+        assert batch[output].dtype == np.float64
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from init_database import init_database  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Штатная база знаний (init_database) во временном каталоге"""
+    path = str(tmp_path / 'knowledge_base.db')
+    init_database(path)
+    return path
+
+
+@pytest.fixture
+def points():
+    """Случайные точки области и границы множеств (изломы трапеций), где проще всего ошибиться"""
+    rng = np.random.default_rng(0)
+    temperatures = np.concatenate([rng.uniform(5, 35, 2000), [10, 15, 17, 23, 25, 30]])
+    humidities = np.concatenate([rng.uniform(0, 100, 2000), [0, 30, 35, 65, 70, 100]])
+    return temperatures, humidities
+
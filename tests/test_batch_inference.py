@@ -0,0 +1,29 @@
+import numpy as np
+
+from checks import assert_batch_matches_scalar, assert_empty_batch
+from fuzzy_system import FuzzyInferenceSystem
+
+
+def test_batch_matches_scalar(db_path, points):
+    # Взвешенное среднее синглтонов складывается в том же порядке, что и в infer: совпадение до бита
+    assert_batch_matches_scalar(FuzzyInferenceSystem(db_path), *points)
+
+
+def test_batch_keeps_grid_shape(db_path):
+    fis = FuzzyInferenceSystem(db_path)
+    temperatures, humidities = np.meshgrid(np.linspace(5, 35, 7), np.linspace(0, 100, 5))
+    batch = fis.infer_batch(temperatures, humidities)
+    flat = fis.infer_batch(temperatures.ravel(), humidities.ravel())
+    for output in ('fan_speed', 'heater_state'):
+        assert batch[output].shape == (5, 7)
+        np.testing.assert_array_equal(batch[output].ravel(), flat[output])
+
+
+def test_batch_broadcasts_scalar(db_path):
+    fis = FuzzyInferenceSystem(db_path)
+    batch = fis.infer_batch(np.array([12.0, 20.0, 28.0]), 50.0)
+    assert batch['fan_speed'].tolist() == [fis.infer(t, 50.0)['fan_speed'] for t in (12.0, 20.0, 28.0)]
+
+
+def test_empty_batch(db_path):
+    assert_empty_batch(FuzzyInferenceSystem(db_path))
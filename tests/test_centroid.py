@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from checks import assert_batch_matches_scalar, assert_empty_batch
+from fuzzy_system import FuzzyInferenceSystem
+
+
+@pytest.fixture
+def fis(db_path):
+    fis = FuzzyInferenceSystem(db_path)
+    fis.fan_defuzzification = 'centroid'
+    return fis
+
+
+def test_centroid_matches_numeric_integration(fis):
+    defuzzifier = fis.knowledge_base.centroid_defuzzifier('fan_speed')
+    names = fis.knowledge_base.set_names('fan_speed')
+    params = fis.knowledge_base.set_params('fan_speed')
+    x = np.linspace(0.0, 1.0, 200001)
+    # Формула трапеций на равномерной сетке: шаг сокращается в отношении интегралов
+    weights = np.ones_like(x)
+    weights[[0, -1]] = 0.5
+    for fuzzy_output in ({'off': 1.0}, {'slow': 0.4, 'medium': 0.7}, {'off': 0.2, 'medium': 0.5, 'high': 0.9}):
+        # Агрегированное множество: max по термам от min(уровень, трапеция)
+        membership = np.zeros_like(x)
+        for term, level in fuzzy_output.items():
+            a, b, c, d = params[names.index(term)]
+            rising = np.clip((x - a) / (b - a), 0, 1) if b > a else (x >= a).astype(float)
+            falling = np.clip((d - x) / (d - c), 0, 1) if d > c else (x <= d).astype(float)
+            membership = np.maximum(membership, np.minimum(level, np.minimum(rising, falling)))
+        expected = (weights * membership * x).sum() / (weights * membership).sum()
+        assert defuzzifier.centroid(fuzzy_output) == pytest.approx(expected, abs=1e-6)
+
+
+def test_batch_matches_scalar(fis, points):
+    assert_batch_matches_scalar(fis, *points, tolerance=1e-12)
+
+
+def test_empty_batch(fis):
+    assert_empty_batch(fis)
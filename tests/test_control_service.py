@@ -0,0 +1,106 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from control_service import ActuatorGateway, ControlService, LatencyTracker, SensorReading
+from fuzzy_system import FuzzyInferenceSystem
+
+
+class RecordingActuators(ActuatorGateway):
+    """Исполнительные устройства с задержкой отправки; первые failures отправок завершаются ошибкой"""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.workshops = []
+
+    async def dispatch(self, workshops, fan_speeds, heater_states):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("исполнительные устройства недоступны")
+        self.workshops.extend(workshops)
+
+
+async def _submit_all(service, workshops):
+    for workshop in workshops:
+        await service.submit(SensorReading(workshop, 'temperature', 20.0))
+        await service.submit(SensorReading(workshop, 'humidity', 50.0))
+
+
+def test_latency_tracker_wraps_around():
+    tracker = LatencyTracker(window=5)
+    tracker.add(np.array([1.0, 2.0, 3.0]))
+    tracker.add(np.array([4.0, 5.0, 6.0, 7.0]))
+    assert tracker.count == 7
+    assert sorted(tracker._samples) == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert tracker.percentiles()['max_ms'] == 7000.0
+
+    # Пачка больше окна: остаются ее последние значения
+    tracker.add(np.arange(10.0, 18.0))
+    assert sorted(tracker._samples) == [13.0, 14.0, 15.0, 16.0, 17.0]
+    assert tracker.percentiles()['p50_ms'] == 15000.0
+
+
+def test_empty_latency_tracker():
+    assert LatencyTracker(window=5).percentiles() == {'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+
+
+def test_stop_drains_queue_and_finishes_dispatch(db_path):
+    async def scenario():
+        actuators = RecordingActuators(delay=0.05)
+        service = ControlService(FuzzyInferenceSystem(db_path), actuators, max_batch=1000, max_delay=10.0)
+        service.start()
+        await _submit_all(service, [f'workshop{i}' for i in range(3500)])
+        # Первый пакет уже отправляется, когда приходит остановка
+        await asyncio.sleep(0.01)
+        await service.stop()
+        return service, actuators
+
+    service, actuators = asyncio.run(scenario())
+    assert sorted(actuators.workshops) == sorted(f'workshop{i}' for i in range(3500))
+    assert (service.decisions, service.batches) == (3500, 4)
+
+
+def test_failed_batch_is_dropped_and_service_continues(db_path):
+    async def scenario():
+        actuators = RecordingActuators(failures=1)
+        service = ControlService(FuzzyInferenceSystem(db_path), actuators, max_batch=100, max_delay=0.001)
+        service.start()
+        await _submit_all(service, [f'workshop{i}' for i in range(100)])
+        await asyncio.sleep(0.05)
+        await _submit_all(service, [f'workshop{i}' for i in range(100)])
+        await service.stop()
+        return service, actuators
+
+    service, actuators = asyncio.run(scenario())
+    stats = service.stats()
+    assert (stats['failed_batches'], stats['dropped']) == (1, 100)
+    assert isinstance(service.last_error, ConnectionError)
+    assert sorted(actuators.workshops) == sorted(f'workshop{i}' for i in range(100))
+    assert stats['decisions'] == 100
+
+
+def test_submit_fails_after_loop_died(db_path):
+    async def scenario():
+        service = ControlService(FuzzyInferenceSystem(db_path), RecordingActuators())
+
+        async def broken():
+            raise MemoryError
+
+        service._process_batch = broken
+        service.start()
+        await _submit_all(service, ['workshop1'])
+        await asyncio.sleep(0.01)
+        with pytest.raises(RuntimeError):
+            await _submit_all(service, ['workshop2'])
+        with pytest.raises(MemoryError):
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_actuator_gateway_is_abstract():
+    with pytest.raises(TypeError):
+        ActuatorGateway()
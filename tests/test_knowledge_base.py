@@ -0,0 +1,117 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from fuzzy_system import FuzzyInferenceSystem
+from kb_import import read_rules_csv
+from knowledge_base import import_version, list_versions
+
+LEGACY_SETS = [
+    ('temperature', 'cold', 10, 10, 15, 17),
+    ('temperature', 'comfortable', 15, 17, 23, 25),
+    ('temperature', 'hot', 23, 25, 30, 30),
+    ('humidity', 'low', 0, 0, 30, 35),
+    ('humidity', 'normal', 30, 35, 65, 70),
+    ('humidity', 'high', 65, 70, 100, 100),
+]
+
+# temp, humidity, fan_speed, heater_state, priority
+LEGACY_RULES = [
+    ('cold', None, 'slow', 'on', 10),
+    ('hot', None, 'high', 'off', 10),
+    ('comfortable', 'normal', 'off', 'off', 5),
+    (None, 'high', 'medium', 'off', 8),
+    ('cold', 'high', 'medium', 'on', 9),
+    (None, 'low', 'medium', 'off', 7),
+    ('comfortable', 'low', 'slow', 'off', 6),
+    ('comfortable', 'high', 'medium', 'off', 6),
+    (None, 'normal', 'slow', 'off', 4),
+    ('comfortable', None, 'off', 'off', 3),
+]
+
+POINTS = [(12.0, 80.0), (16.0, 33.0), (20.0, 50.0), (24.0, 67.0), (28.0, 20.0)]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """База в прежней схеме без версий (условия в колонках condition_temp/condition_humidity)"""
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE fuzzy_sets (id INTEGER PRIMARY KEY, variable_name TEXT NOT NULL, '
+                 'set_name TEXT NOT NULL, a REAL, b REAL, c REAL, d REAL)')
+    conn.execute('CREATE TABLE rules (id INTEGER PRIMARY KEY, condition_temp TEXT, condition_humidity TEXT, '
+                 'action_fan_speed TEXT, action_heater_state TEXT, priority INTEGER)')
+    conn.executemany('INSERT INTO fuzzy_sets VALUES (NULL, ?, ?, ?, ?, ?, ?)', LEGACY_SETS)
+    conn.executemany('INSERT INTO rules VALUES (NULL, ?, ?, ?, ?, ?)', LEGACY_RULES)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _decisions(fis):
+    return [fis.infer(temperature, humidity) for temperature, humidity in POINTS]
+
+
+def test_migrate_import_pin_round_trip(legacy_db):
+    legacy = _decisions(FuzzyInferenceSystem(legacy_db))
+
+    # Новая версия: при жаре вентилятор на средней скорости вместо высокой
+    rules = [(tuple((variable, set_name) for variable, set_name in (('temperature', temp), ('humidity', humidity))
+                    if set_name), 'medium' if temp == 'hot' else fan, heater, priority, ())
+             for temp, humidity, fan, heater, priority in LEGACY_RULES]
+    follower = FuzzyInferenceSystem(legacy_db)
+    assert import_version(legacy_db, rules=rules, source='test') == 2
+
+    versions = list_versions(legacy_db)
+    assert [(v['version'], v['source'], v['rules']) for v in versions] == [(1, 'migrated', 10), (2, 'test', 10)]
+
+    # Перенесенная версия 1 решает так же, как база в старой схеме
+    pinned = FuzzyInferenceSystem(legacy_db, version=1)
+    assert pinned.knowledge_base.version == 1
+    assert _decisions(pinned) == legacy
+
+    # Без закрепления система переходит на новую версию; закрепление возвращает прежние решения
+    assert follower.knowledge_base.version == 2
+    assert _decisions(follower) != legacy
+    follower.pin_knowledge_base(1)
+    assert _decisions(follower) == legacy
+
+    # Закрепленная версия не меняется при следующем импорте, незакрепленная - следует за последней
+    assert import_version(legacy_db, source='test') == 3
+    assert pinned.knowledge_base.version == 1
+    assert follower.pin_knowledge_base(None).version == 3
+    np.testing.assert_array_equal(
+        follower.infer_batch(*zip(*POINTS))['fan_speed'], FuzzyInferenceSystem(legacy_db, version=2)
+        .infer_batch(*zip(*POINTS))['fan_speed'])
+
+
+def test_unknown_version(db_path):
+    with pytest.raises(ValueError):
+        FuzzyInferenceSystem(db_path, version=5).knowledge_base
+
+
+def test_csv_rules_import_and_keep(db_path, tmp_path):
+    rules_csv = tmp_path / 'rules.csv'
+    rules_csv.write_text('temperature,humidity,action_fan_speed,action_heater_state,priority,fan_speed:temperature\n'
+                         'hot,,high,off,10,0.02\n'
+                         ',normal,slow,,4,\n', encoding='utf-8')
+    rules = read_rules_csv(str(rules_csv))
+    assert rules == [((('temperature', 'hot'),), 'high', 'off', 10, (('fan_speed', 'temperature', 0.02),)),
+                     ((('humidity', 'normal'),), 'slow', None, 4, ())]
+
+    for _ in range(3):
+        import_version(db_path, rules=rules, source='csv', keep=2)
+    assert [v['version'] for v in list_versions(db_path)] == [3, 4]
+    kb = FuzzyInferenceSystem(db_path).knowledge_base
+    assert kb.version == 4 and len(kb.rules) == 2
+
+
+def test_import_is_atomic(db_path):
+    # Условие на несуществующее множество: версия не создается, база остается прежней
+    with pytest.raises(ValueError):
+        import_version(db_path, rules=[((('temperature', 'warm'),), 'slow', None, 1, ())])
+    assert [v['version'] for v in list_versions(db_path)] == [1]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('SELECT COUNT(*) FROM rules').fetchone()[0] == 10
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from fuzzy_system import FuzzyInferenceSystem
+from knowledge_base import import_version
+from lookup_table import ControlSurface
+
+
+@pytest.fixture
+def fis(db_path):
+    return FuzzyInferenceSystem(db_path)
+
+
+def _random_points(fis, n=200000):
+    rng = np.random.default_rng(1)
+    kb = fis.knowledge_base
+    return rng.uniform(*kb.domain('temperature'), n), rng.uniform(*kb.domain('humidity'), n)
+
+
+@pytest.mark.parametrize('mode, max_error', [('singleton', 0.01), ('centroid', 0.05)])
+def test_error_within_bound(fis, mode, max_error):
+    fis.fan_defuzzification = mode
+    surface = ControlSurface.build(fis, max_error=max_error)
+    assert surface.achieved_error <= max_error
+    temperatures, humidities = _random_points(fis)
+    exact = fis.infer_batch(temperatures, humidities)
+    table = surface.lookup_batch(temperatures, humidities)
+    assert np.abs(table['fan_speed'] - exact['fan_speed']).max() <= surface.achieved_error
+    np.testing.assert_array_equal(table['heater_state'], exact['heater_state'])
+
+
+def test_decide_matches_lookup_batch(fis):
+    surface = ControlSurface.build(fis, max_error=0.05)
+    temperatures, humidities = _random_points(fis, 500)
+    # Точки вне сетки отвечаются точным выводом
+    temperatures[:5] = [0.0, 5.0, 35.0, 20.0, 20.0]
+    humidities[:5] = [50.0, 50.0, 50.0, -10.0, 120.0]
+    batch = surface.lookup_batch(temperatures, humidities)
+    for i, (temperature, humidity) in enumerate(zip(temperatures, humidities)):
+        decision = surface.decide(temperature, humidity)
+        assert decision['fan_speed'] == pytest.approx(batch['fan_speed'][i], abs=1e-12)
+        assert decision['heater_state'] == batch['heater_state'][i]
+
+
+def test_saved_surface_invalidated_by_rule_base_and_mode(fis, db_path, tmp_path):
+    path = str(tmp_path / 'surface.npy')
+    surface = ControlSurface.build_or_load(fis, path, max_error=0.05)
+    assert ControlSurface.load(fis, path) is not None
+
+    # Другой способ дефаззификации - другая поверхность
+    fis.fan_defuzzification = 'centroid'
+    assert ControlSurface.load(fis, path) is None
+    fis.fan_defuzzification = 'singleton'
+
+    # Новая версия базы знаний: таблица устаревает и перестраивается
+    sets = [('temperature', 'cold', 10, 10, 14, 17), ('temperature', 'comfortable', 14, 17, 23, 25),
+            ('temperature', 'hot', 23, 25, 30, 30)]
+    import_version(db_path, sets + [row for row in _set_rows(fis) if row[0] != 'temperature'], None, 'test')
+    assert not surface.is_current()
+    assert ControlSurface.load(fis, path) is None
+    rebuilt = ControlSurface.build_or_load(fis, path, max_error=0.05)
+    assert rebuilt.is_current() and ControlSurface.load(fis, path) is not None
+
+    # Более строгая точность, чем у сохраненной таблицы, - тоже перестройка
+    assert ControlSurface.build_or_load(fis, path, max_error=0.02).max_error == 0.02
+
+
+def _set_rows(fis):
+    kb = fis.knowledge_base
+    return [(variable, name) + params for variable in ('temperature', 'humidity', 'fan_speed')
+            for name, params in zip(kb.set_names(variable), kb.set_params(variable))]
@@ -0,0 +1,151 @@
+import os
+import shutil
+
+import pytest
+
+import ontology
+from ontology import XSD, Literal, load_topology, parse_turtle
+
+REPO_ONTOLOGY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ontology.ttl')
+
+PLANT = '''
+@prefix : <http://www.semanticweb.org/ventilation#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+:PreciseTemperatureSensor rdfs:subClassOf :TemperatureSensor .
+:Dryer rdfs:subClassOf :Workshop .
+
+:dryer a :Dryer ;
+    :hasSensor :precise, [ a :HumiditySensor ; :hasValue 35 ] , :pressure ;
+    :hasActuator :dryerFan ; .
+:precise a :PreciseTemperatureSensor ; :hasValue "27.5"^^<http://www.w3.org/2001/XMLSchema#float> .
+:pressure a :PressureSensor ; :hasValue 1.2e2 .
+:dryerFan a :Fan .
+
+:store a :Workshop ;
+    :hasSensor :storeTemp .
+:storeTemp a :TemperatureSensor .
+'''
+
+
+@pytest.fixture
+def ontology_path(tmp_path):
+    path = tmp_path / 'plant.ttl'
+    path.write_text(PLANT, encoding='utf-8')
+    return str(path)
+
+
+def test_repository_ontology():
+    topology = load_topology(REPO_ONTOLOGY, use_cache=False)
+    assert [workshop.name for workshop in topology.workshops] == ['workshop1']
+    workshop = topology.workshop('workshop1')
+    assert (workshop.temperature, workshop.humidity) == (20.0, 50.0)
+    assert workshop.has_actuator('fan') and workshop.has_actuator('heater')
+    scenario, = topology.scenarios(steps=5)
+    assert (scenario.name, scenario.temperature, scenario.humidity, scenario.steps) == ('workshop1', 20.0, 50.0, 5)
+
+
+def test_turtle_syntax():
+    triples = parse_turtle('''
+        PREFIX ex: <http://example.org/>
+        @base <http://example.org/base/> .
+        <s> ex:p "a\\tb"@ru-RU , """two
+        lines""" , 'x'^^ex:type ; ex:q true, -3, .5, 1E3 ;; .
+        _:b1 a ex:Thing .
+        [ ex:r ex:o ] .
+    ''')
+    subject = 'http://example.org/base/s'
+    assert triples[:7] == [
+        (subject, 'http://example.org/p', Literal('a\tb', language='ru-RU')),
+        (subject, 'http://example.org/p', Literal('two\n        lines')),
+        (subject, 'http://example.org/p', Literal('x', 'http://example.org/type')),
+        (subject, 'http://example.org/q', Literal(True, XSD + 'boolean')),
+        (subject, 'http://example.org/q', Literal(-3, XSD + 'integer')),
+        (subject, 'http://example.org/q', Literal(0.5, XSD + 'decimal')),
+        (subject, 'http://example.org/q', Literal(1000.0, XSD + 'double')),
+    ]
+    assert triples[7] == ('_:b1', ontology.RDF_TYPE, 'http://example.org/Thing')
+    assert triples[8] == ('_:anonymous1', 'http://example.org/r', 'http://example.org/o')
+
+
+@pytest.mark.parametrize('text, message', [
+    ('@prefix : <urn:x#> .\n:a :b ( :c ) .', 'Коллекции'),
+    ('ex:a ex:b ex:c .', 'префикс'),
+    ('@prefix : <urn:x#> .\n\n:a :b {:c} .', 'строке 3'),
+    ('@prefix : <urn:x#> .\n:a :b :c', "ожидалось '.'"),
+])
+def test_turtle_errors(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_turtle(text)
+
+
+def test_subclasses_and_unknown_kinds(ontology_path):
+    topology = load_topology(ontology_path, use_cache=False)
+    assert len(topology) == 2
+    dryer = topology.workshop('dryer')
+    assert [(sensor.kind, sensor.value) for sensor in dryer.sensors] == [
+        ('temperature', 27.5), ('humidity', 35.0), ('PressureSensor', 120.0)]
+    assert [actuator.kind for actuator in dryer.actuators] == ['fan']
+    assert not dryer.has_actuator('heater')
+    with pytest.raises(KeyError):
+        topology.workshop('missing')
+    # У склада нет начальной влажности - сценарий построить нельзя
+    with pytest.raises(ValueError, match='store'):
+        topology.scenarios()
+
+
+def compact(topology):
+    return topology.to_compact(), topology.content_hash
+
+
+def test_cache_is_written_and_reused(ontology_path, monkeypatch):
+    cache_path = os.path.splitext(ontology_path)[0] + '.topology.bin'
+    parsed = load_topology(ontology_path)
+    assert os.path.exists(cache_path)
+    assert not os.path.exists(cache_path + '.tmp')
+
+    # Повторная загрузка берет топологию из кэша без разбора Turtle
+    def fail(text):
+        raise AssertionError('онтология разобрана повторно')
+    monkeypatch.setattr(ontology, 'parse_turtle', fail)
+    assert compact(load_topology(ontology_path)) == compact(parsed)
+
+
+def test_cache_is_invalidated(ontology_path, tmp_path):
+    cache_path = os.path.splitext(ontology_path)[0] + '.topology.bin'
+    first = load_topology(ontology_path)
+
+    # Изменение онтологии
+    with open(ontology_path, 'a', encoding='utf-8') as f:
+        f.write(':storeHum a :HumiditySensor ; :hasValue 60 .\n:store :hasSensor :storeHum .\n')
+    changed = load_topology(ontology_path)
+    assert changed.content_hash != first.content_hash
+    assert changed.workshop('store').humidity == 60.0
+    assert compact(load_topology(ontology_path)) == compact(changed)
+
+    # Другое пространство имен - другой ключ кэша
+    assert len(load_topology(ontology_path, namespace='urn:other#')) == 0
+    assert len(load_topology(ontology_path)) == 2
+
+    # Поврежденный кэш и кэш другой версии формата игнорируются и перезаписываются
+    with open(cache_path, 'r+b') as f:
+        f.seek(len(ontology._CACHE_MAGIC) + 1 + 32)
+        f.write(b'\xff\xff\xff')
+    assert compact(load_topology(ontology_path)) == compact(changed)
+    with open(cache_path, 'r+b') as f:
+        f.seek(len(ontology._CACHE_MAGIC))
+        f.write(bytes([ontology.TOPOLOGY_CACHE_VERSION + 1]))
+    assert compact(load_topology(ontology_path)) == compact(changed)
+    with open(cache_path, 'rb') as f:
+        assert f.read(len(ontology._CACHE_MAGIC) + 1)[-1] == ontology.TOPOLOGY_CACHE_VERSION
+
+    # Копия онтологии под другим именем строит свой кэш
+    copy = str(tmp_path / 'copy.ttl')
+    shutil.copy(ontology_path, copy)
+    assert compact(load_topology(copy)) == compact(changed)
+    assert os.path.exists(str(tmp_path / 'copy.topology.bin'))
+
+
+def test_cache_disabled(ontology_path):
+    load_topology(ontology_path, use_cache=False)
+    assert not os.path.exists(os.path.splitext(ontology_path)[0] + '.topology.bin')
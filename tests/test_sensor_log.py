@@ -0,0 +1,112 @@
+import json
+import re
+
+import numpy as np
+import pytest
+
+from fuzzy_system import FuzzyInferenceSystem
+from sensor_log import DECISION_DTYPE, CsvLog, comfort_flags, replay_log
+
+# Строки разной длины, пустые строки, CRLF, поля в кавычках с разделителем внутри
+# и последняя строка без перевода строки
+LOG_TEXT = ('time,"temperature",humidity,note\n'
+            '1,12.5,80,cold\n'
+            '\n'
+            '2,20,50,"ok, stable"\r\n'
+            '3,27.25,33.5,""\n'
+            '\n'
+            '\n'
+            '4,18,67.125,"a much longer note that spans several small blocks"\n'
+            '5,"24",20,x\r\n'
+            '6,15.75,95,last')
+
+ROWS = [('1,12.5,80,cold', 12.5, 80.0),
+        ('2,20,50,"ok, stable"', 20.0, 50.0),
+        ('3,27.25,33.5,""', 27.25, 33.5),
+        ('4,18,67.125,"a much longer note that spans several small blocks"', 18.0, 67.125),
+        ('5,"24",20,x', 24.0, 20.0),
+        ('6,15.75,95,last', 15.75, 95.0)]
+
+BLOCK_SIZES = [1, 2, 3, 5, 8, 13, 31, 64, len(LOG_TEXT)]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_bytes(LOG_TEXT.encode('utf-8'))
+    return str(path)
+
+
+def read_all(log):
+    chunks = list(log.iter_chunks())
+    return (sum((chunk['lines'] for chunk in chunks), []),
+            np.concatenate([chunk['temperature'] for chunk in chunks]),
+            np.concatenate([chunk['humidity'] for chunk in chunks]))
+
+
+@pytest.mark.parametrize('block_size', BLOCK_SIZES)
+def test_rows_survive_block_boundaries(log_path, block_size):
+    lines, temperatures, humidities = read_all(CsvLog(log_path, block_size))
+    assert lines == [row[0] for row in ROWS]
+    assert temperatures.tolist() == [row[1] for row in ROWS]
+    assert humidities.tolist() == [row[2] for row in ROWS]
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 31])
+def test_replay_matches_single_block(db_path, log_path, tmp_path, block_size):
+    fis = FuzzyInferenceSystem(db_path)
+    whole = str(tmp_path / 'whole.csv')
+    small = str(tmp_path / 'small.csv')
+    expected = replay_log(fis, CsvLog(log_path), whole)
+    result = replay_log(fis, CsvLog(log_path, block_size), small)
+
+    with open(whole, encoding='utf-8') as f:
+        whole_text = f.read()
+    with open(small, encoding='utf-8') as f:
+        assert f.read() == whole_text
+    for key in ('rows', 'comfortable_share', 'heater_on_share', 'mean_fan_speed'):
+        assert result[key] == expected[key]
+
+    output = whole_text.splitlines()
+    assert output[0] == 'time,"temperature",humidity,note,fan_speed,heater_state,comfortable'
+    temperatures = np.array([row[1] for row in ROWS])
+    humidities = np.array([row[2] for row in ROWS])
+    decisions = fis.infer_batch(temperatures, humidities)
+    comfortable = comfort_flags(temperatures, humidities)
+    for line, row, fan, heater, flag in zip(output[1:], ROWS, decisions['fan_speed'],
+                                            decisions['heater_state'], comfortable):
+        assert line == f'{row[0]},{fan:.6g},{heater:.6g},{int(flag)}'
+    assert len(output) == len(ROWS) + 1
+
+
+def test_binary_replay(db_path, log_path, tmp_path):
+    fis = FuzzyInferenceSystem(db_path)
+    output = str(tmp_path / 'decisions.bin')
+    result = replay_log(fis, CsvLog(log_path, 5), output)
+
+    records = np.fromfile(output, dtype=DECISION_DTYPE)
+    with open(output + '.json', encoding='utf-8') as f:
+        assert json.load(f)['rows'] == result['rows'] == len(records) == len(ROWS)
+    assert records['temperature'].tolist() == [row[1] for row in ROWS]
+    decisions = fis.infer_batch(records['temperature'], records['humidity'])
+    assert np.array_equal(records['fan_speed'], decisions['fan_speed'])
+    assert np.array_equal(records['heater_state'], decisions['heater_state'])
+
+
+@pytest.mark.parametrize('block_size', BLOCK_SIZES)
+def test_error_reports_line_numbers(tmp_path, block_size):
+    # Ошибочная строка - 7-я строка файла, с учетом заголовка и пустых строк
+    lines = LOG_TEXT.split('\n')
+    lines[6] = '9,warm,50,bad'
+    path = tmp_path / 'bad.csv'
+    path.write_bytes('\n'.join(lines).encode('utf-8'))
+
+    with pytest.raises(ValueError) as error:
+        read_all(CsvLog(str(path), block_size))
+    first, last = map(int, re.search(r'в строках (\d+)-(\d+)', str(error.value)).groups())
+    assert first <= 7 <= last <= len(lines)
+
+
+def test_missing_column(log_path):
+    with pytest.raises(ValueError, match="'humidity_percent'"):
+        CsvLog(log_path, humidity_column='humidity_percent')
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from checks import assert_batch_matches_scalar, assert_empty_batch
+from fuzzy_system import FuzzyInferenceSystem
+from knowledge_base import import_version
+from lookup_table import ControlSurface
+from sensor_log import CsvDecisionWriter
+
+
+def _sugeno(db_path):
+    fis = FuzzyInferenceSystem(db_path)
+    fis.inference = 'sugeno'
+    return fis
+
+
+def test_linear_consequents(db_path):
+    # Одно безусловное правило: выходы - его линейные заключения
+    consequents = (('fan_speed', 'temperature', 0.01), ('fan_speed', None, 0.1), ('heater_state', 'humidity', 0.005))
+    import_version(db_path, rules=[((), 'off', 'off', 1, consequents)], source='test')
+    fis = _sugeno(db_path)
+    assert fis.infer(20.0, 40.0) == pytest.approx({'fan_speed': 0.3, 'heater_state': 0.2})
+    batch = fis.infer_batch([20.0, 30.0], [40.0, 60.0])
+    assert batch['fan_speed'].tolist() == pytest.approx([0.3, 0.4])
+    assert batch['heater_state'].tolist() == pytest.approx([0.2, 0.3])
+
+
+def test_unknown_consequent_output(db_path):
+    with pytest.raises(ValueError):
+        import_version(db_path, rules=[((), 'off', 'off', 1, (('pressure', None, 1.0),))])
+
+
+def test_batch_matches_scalar(db_path, points):
+    assert_batch_matches_scalar(_sugeno(db_path), *points, tolerance=1e-12)
+
+
+def test_empty_batch(db_path):
+    assert_empty_batch(_sugeno(db_path))
+
+
+def test_csv_keeps_fractional_heater_power(db_path, tmp_path):
+    fis = _sugeno(db_path)
+    chunk = {'temperature': np.array([16.0]), 'humidity': np.array([67.0])}
+    decisions = fis.infer_batch(chunk['temperature'], chunk['humidity'])
+    decisions['comfortable'] = np.array([False])
+    assert 0 < decisions['heater_state'][0] < 1
+    path = str(tmp_path / 'decisions.csv')
+    writer = CsvDecisionWriter(path)
+    writer.write(chunk, decisions)
+    writer.close()
+    with open(path, encoding='utf-8') as f:
+        row = f.read().splitlines()[1].split(',')
+    assert float(row[3]) == pytest.approx(decisions['heater_state'][0], rel=1e-5)
+
+
+def test_control_surface_refuses_sugeno(db_path):
+    with pytest.raises(ValueError):
+        ControlSurface.build(_sugeno(db_path))
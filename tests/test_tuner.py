@@ -0,0 +1,85 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from fuzzy_system import FuzzyInferenceSystem
+from headless import generate_scenarios
+from knowledge_base import import_version, list_versions, load_knowledge_base
+from tuner import save_tuned_knowledge_base, tune
+
+
+def shifted(kb, variable, delta):
+    """Параметры множеств variable, сдвинутые внутрь области определения на delta"""
+    low, high = kb.domain(variable)
+    return tuple(tuple(x if x in (low, high) else x + delta for x in params) for params in kb.set_params(variable))
+
+
+def test_tuned_sets_become_a_new_version_of_the_source_db(db_path, points):
+    kb = load_knowledge_base(db_path)
+    before = FuzzyInferenceSystem(db_path).infer_batch(*points)
+    params = {'temperature': shifted(kb, 'temperature', 0.5)}
+
+    version = save_tuned_knowledge_base(db_path, params)
+
+    versions = list_versions(db_path)
+    assert versions[-1]['version'] == version == kb.version + 1
+    assert versions[-1]['source'] == 'tuner'
+    tuned = load_knowledge_base(db_path)
+    assert tuned.set_params('temperature') == params['temperature']
+    assert tuned.set_params('humidity') == kb.set_params('humidity')
+    assert tuned.to_rows()[1] == kb.to_rows()[1]
+    # Прежняя версия остается доступной для закрепления
+    assert load_knowledge_base(db_path, version=kb.version).set_params('temperature') == kb.set_params('temperature')
+    pinned = FuzzyInferenceSystem(db_path, version=kb.version).infer_batch(*points)
+    latest = FuzzyInferenceSystem(db_path).infer_batch(*points)
+    assert np.array_equal(pinned['fan_speed'], before['fan_speed'])
+    assert not np.array_equal(latest['fan_speed'], before['fan_speed'])
+
+
+def test_tuned_version_is_based_on_the_tuned_version(db_path):
+    kb = load_knowledge_base(db_path)
+    params = {'temperature': shifted(kb, 'temperature', 0.5)}
+    # Во время подбора импортирована версия с другими множествами влажности
+    sets, _ = kb.to_rows()
+    import_version(db_path, [row[:2] + tuple(x + 1 if 0 < x < 100 else x for x in row[2:])
+                             if row[0] == 'humidity' else row for row in sets], None, 'manual')
+
+    version = save_tuned_knowledge_base(db_path, params, base_version=kb.version)
+
+    tuned = load_knowledge_base(db_path, version=version)
+    assert tuned.set_params('temperature') == params['temperature']
+    assert tuned.set_params('humidity') == kb.set_params('humidity')
+
+
+def test_output_exports_a_copy(db_path, tmp_path):
+    kb = load_knowledge_base(db_path)
+    params = {'temperature': shifted(kb, 'temperature', -0.5)}
+    output = str(tmp_path / 'export.db')
+
+    version = save_tuned_knowledge_base(db_path, params, output_path=output)
+
+    assert list_versions(output) == list_versions(db_path)
+    assert load_knowledge_base(output).set_params('temperature') == params['temperature']
+    assert load_knowledge_base(db_path).version == version
+
+
+def test_set_count_mismatch_is_rejected(db_path):
+    kb = load_knowledge_base(db_path)
+    params = {'temperature': kb.set_params('temperature')[:-1]}
+    with pytest.raises(ValueError):
+        save_tuned_knowledge_base(db_path, params)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute('SELECT MAX(version) FROM kb_versions').fetchone()[0] == kb.version
+    finally:
+        conn.close()
+
+
+def test_tune_returns_the_tuned_version(db_path):
+    result = tune(db_path, generate_scenarios(20, seed=1), population=4, generations=2, elite=2,
+                  processes=1, seed=1)
+    kb = load_knowledge_base(db_path)
+    assert result['version'] == kb.version
+    assert result['metrics']['score'] >= result['baseline']['score']
+    assert set(result['params']) == set(kb.rule_variables)
@@ -0,0 +1,138 @@
+import abc
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class RuleTrace:
+    """Результат проверки одного правила при выводе"""
+
+    __slots__ = ('rule_id', 'antecedents', 'fan_term', 'heater_term', 'priority', 'truth_level')
+
+    def __init__(self, rule_id: int, antecedents: Tuple[Tuple[str, str], ...], fan_term: Optional[str],
+                 heater_term: Optional[str], priority: int, truth_level: float):
+        self.rule_id = rule_id
+        # (переменная, имя множества)
+        self.antecedents = antecedents
+        self.fan_term = fan_term
+        self.heater_term = heater_term
+        self.priority = priority
+        self.truth_level = truth_level
+
+    @property
+    def fired(self) -> bool:
+        return self.truth_level > 0
+
+
+class InferenceExplanation:
+    """Структурированное объяснение одного решения: принадлежности, правила, активированные заключения"""
+
+    def __init__(self, inputs: Dict[str, float], memberships: Dict[str, Dict[str, float]],
+                 rules: List[RuleTrace], fan_output: Dict[str, float], heater_output: Dict[str, float],
+                 fan_speed: float, heater_state: float):
+        self.inputs = inputs
+        # Ненулевые степени принадлежности по каждой переменной
+        self.memberships = memberships
+        self.rules = rules
+        self.fan_output = fan_output
+        self.heater_output = heater_output
+        self.fan_speed = fan_speed
+        self.heater_state = heater_state
+
+    def decision(self) -> Dict[str, float]:
+        """Решение в том же виде, что возвращает FuzzyInferenceSystem.infer"""
+        return {'fan_speed': self.fan_speed, 'heater_state': self.heater_state}
+
+    def fired_rules(self) -> List[RuleTrace]:
+        return [rule for rule in self.rules if rule.fired]
+
+    def render(self, renderer: Optional['ConsoleRenderer'] = None) -> str:
+        """Текстовое представление; строится только при вызове"""
+        return (renderer or ConsoleRenderer()).render(self)
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+class ConsoleRenderer:
+    """Консольный отчет о выводе на русском языке (прежний формат вывода infer)"""
+
+    variable_labels = {'temperature': 'temp', 'humidity': 'hum'}
+    input_titles = {'temperature': ('Температура', '°C'), 'humidity': ('Влажность', '%')}
+
+    def render(self, explanation: InferenceExplanation) -> str:
+        lines = ["🎯 ФАЗЗИФИКАЦИЯ:"]
+        for variable, value in explanation.inputs.items():
+            title, unit = self.input_titles.get(variable, (variable, ''))
+            lines.append(f"   {title} {value}{unit} → {explanation.memberships.get(variable, {})}")
+
+        lines.append("\n📋 ПРОВЕРКА ПРАВИЛ:")
+        for rule in explanation.rules:
+            lines.extend(self.render_rule(rule))
+
+        lines.append("\n🎛 АКТИВИРОВАННЫЕ ДЕЙСТВИЯ:")
+        lines.append(f"   Вентилятор: {explanation.fan_output}")
+        lines.append(f"   Обогреватель: {explanation.heater_output}")
+
+        lines.append(self.render_fan(explanation.fan_output, explanation.fan_speed))
+        lines.append(self.render_heater(explanation.heater_output, explanation.heater_state))
+        return "\n".join(lines)
+
+    def render_rule(self, rule: RuleTrace) -> List[str]:
+        # Формируем читаемое условие
+        condition_parts = [f"{self.variable_labels.get(variable, variable)}={set_name}"
+                           for variable, set_name in rule.antecedents]
+        condition_str = " И ".join(condition_parts) if condition_parts else "ВСЕГДА"
+
+        # Формируем читаемое действие
+        action_parts = []
+        if rule.fan_term:
+            action_parts.append(f"вентилятор={rule.fan_term}")
+        if rule.heater_term:
+            action_parts.append(f"обогреватель={rule.heater_term}")
+        action_str = ", ".join(action_parts)
+
+        status = "✅ СРАБОТАЛО" if rule.fired else "❌ НЕ СРАБОТАЛО"
+        return [f"   Правило {rule.rule_id}: ЕСЛИ {condition_str} ТО {action_str}",
+                f"        Приоритет: {rule.priority}, Истинность: {rule.truth_level:.2f} → {status}"]
+
+    def render_fan(self, fan_output: Dict[str, float], fan_speed: float) -> str:
+        if not fan_output:
+            return "   Вентилятор: нет активированных правил → ВЫКЛ"
+        return f"   Вентилятор: {fan_output} → скорость {fan_speed:.2f}"
+
+    def render_heater(self, heater_output: Dict[str, float], heater_state: float) -> str:
+        if not heater_output:
+            return "   Обогреватель: нет активированных правил → ВЫКЛ"
+        if 0 < heater_state < 1:
+            # Непрерывное управление (вывод Такаги-Сугено)
+            return f"   Обогреватель: {heater_output} → мощность {heater_state:.2f}"
+        status = "ВКЛ" if heater_state > 0.5 else "ВЫКЛ"
+        return f"   Обогреватель: {heater_output} → {status}"
+
+
+class Tracer(abc.ABC):
+    """Получатель объяснений решений; подключается через FuzzyInferenceSystem.tracer"""
+
+    @abc.abstractmethod
+    def trace(self, explanation: InferenceExplanation):
+        """Обработка объяснения очередного решения"""
+
+
+class ConsoleTracer(Tracer):
+    """Печать каждого решения в консоль"""
+
+    def __init__(self, renderer: Optional[ConsoleRenderer] = None):
+        self.renderer = renderer or ConsoleRenderer()
+
+    def trace(self, explanation: InferenceExplanation):
+        print(explanation.render(self.renderer))
+
+
+class CollectingTracer(Tracer):
+    """Накопление последних объяснений в памяти (для анализа и тестов)"""
+
+    def __init__(self, max_items: Optional[int] = 1000):
+        self.explanations = deque(maxlen=max_items)
+
+    def trace(self, explanation: InferenceExplanation):
+        self.explanations.append(explanation)
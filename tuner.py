@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fuzzy_system import FuzzyInferenceSystem
+from headless import HeadlessSimulation, Scenario, generate_scenarios
+from knowledge_base import CompiledKnowledgeBase, import_version, load_knowledge_base
+
+# Штраф за усилие исполнительных устройств (средняя сумма скорости вентилятора и состояния
+# обогревателя за шаг) относительно комфорта
+DEFAULT_EFFORT_WEIGHT = 0.2
+
+Params = Dict[str, Tuple[Tuple[float, float, float, float], ...]]
+
+
+class ParameterSpace:
+    """Параметры (a, b, c, d) множеств настраиваемых переменных в виде одного вектора.
+
+    Каждое значение ограничено областью определения своей переменной; точки, лежащие на
+    границе области (плечи крайних трапеций), не меняются. После любой мутации вершины
+    трапеции упорядочиваются, чтобы выполнялось a <= b <= c <= d.
+    """
+
+    def __init__(self, kb: CompiledKnowledgeBase, variables: Optional[Sequence[str]] = None):
+        self.variables = list(variables or kb.rule_variables)
+        self.sizes = [len(kb.set_params(variable)) for variable in self.variables]
+        self.base = np.concatenate([np.array(kb.set_params(variable), dtype=float).ravel()
+                                    for variable in self.variables])
+        domains = [kb.domain(variable) for variable in self.variables]
+        self.low = np.concatenate([np.full(4 * size, low) for size, (low, _) in zip(self.sizes, domains)])
+        self.high = np.concatenate([np.full(4 * size, high) for size, (_, high) in zip(self.sizes, domains)])
+        self.fixed = (self.base == self.low) | (self.base == self.high)
+
+    def repair(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.clip(vector, self.low, self.high)
+        vector[self.fixed] = self.base[self.fixed]
+        return np.sort(vector.reshape(-1, 4), axis=1).ravel()
+
+    def mutate(self, vector: np.ndarray, sigma: float, rng: np.random.Generator) -> np.ndarray:
+        """Гауссова мутация с шагом sigma в долях ширины области определения"""
+        return self.repair(vector + rng.normal(0.0, sigma, vector.shape) * (self.high - self.low))
+
+    def params(self, vector: np.ndarray) -> Params:
+        params = {}
+        start = 0
+        for variable, size in zip(self.variables, self.sizes):
+            rows = vector[start:start + 4 * size].reshape(size, 4)
+            params[variable] = tuple(tuple(float(x) for x in row) for row in rows)
+            start += 4 * size
+        return params
+
+
+def evaluate(fis: FuzzyInferenceSystem, scenarios: Sequence[Scenario],
+             effort_weight: float = DEFAULT_EFFORT_WEIGHT) -> Dict[str, float]:
+    """Оценка регулятора на наборе сценариев (векторный прогон HeadlessSimulation); больше - лучше"""
+    effort = 0.0
+
+    def observe(step, running, temperatures, humidities, fan_speeds, heater_states):
+        nonlocal effort
+        effort += float(fan_speeds[running].sum() + heater_states[running].sum())
+
+    statistics = HeadlessSimulation(fis, scenarios).run(observe)
+    total_steps = max(int(statistics['total_steps'].sum()), 1)
+    comfort_attained = float(statistics['in_comfort_zone'].mean()) if len(scenarios) else 0.0
+    comfort_step_share = float(statistics['comfort_steps'].sum()) / total_steps
+    effort /= total_steps
+    return {
+        'score': comfort_attained + comfort_step_share - effort_weight * effort,
+        'comfort_attained': comfort_attained,
+        'comfort_step_share': comfort_step_share,
+        'effort': effort,
+    }
+
+
+# Состояние рабочего процесса: базовая база знаний и сценарии загружаются один раз
+_worker_state: Dict[str, object] = {}
+
+
+def _init_worker(db_path: str, version: Optional[int], scenario_dicts: List[Dict], effort_weight: float,
+                 fan_defuzzification: str):
+    _worker_state['kb'] = load_knowledge_base(db_path, version=version)
+    _worker_state['db_path'] = db_path
+    _worker_state['scenarios'] = [Scenario.from_dict(item) for item in scenario_dicts]
+    _worker_state['effort_weight'] = effort_weight
+    _worker_state['fan_defuzzification'] = fan_defuzzification
+
+
+def _evaluate_params(params: Params) -> Dict[str, float]:
+    kb = _worker_state['kb'].with_params(params)
+    fis = FuzzyInferenceSystem(_worker_state['db_path'], knowledge_base=kb)
+    fis.fan_defuzzification = _worker_state['fan_defuzzification']
+    return evaluate(fis, _worker_state['scenarios'], _worker_state['effort_weight'])
+
+
+def tune(db_path: str = 'knowledge_base.db', scenarios: Optional[Sequence[Scenario]] = None,
+         population: int = 24, generations: int = 20, elite: int = 6, sigma: float = 0.05,
+         sigma_decay: float = 0.9, effort_weight: float = DEFAULT_EFFORT_WEIGHT,
+         variables: Optional[Sequence[str]] = None, processes: Optional[int] = None,
+         seed: Optional[int] = None, fan_defuzzification: str = 'singleton',
+         progress: Optional[Callable[[int, Dict[str, float]], None]] = None) -> Dict[str, object]:
+    """Эволюционный подбор параметров множеств по результатам симуляции.
+
+    Каждое поколение из population кандидатов оценивается параллельно по процессам; elite
+    лучших переходят в следующее поколение без повторной оценки, остальные места занимают
+    их мутанты. Шаг мутации sigma (в долях области определения) уменьшается в sigma_decay
+    раз за поколение. Возвращает лучшие параметры, их оценку, оценку исходной базы, историю
+    и номер настроенной версии базы знаний (версии, импортированные во время подбора, на него не влияют).
+    """
+    db_path = os.path.abspath(db_path)
+    if scenarios is None:
+        scenarios = generate_scenarios(2000, seed=seed)
+    rng = np.random.default_rng(seed)
+    kb = load_knowledge_base(db_path)
+    space = ParameterSpace(kb, variables)
+    elite = max(1, min(elite, population))
+
+    initargs = (db_path, kb.version, [scenario.to_dict() for scenario in scenarios], effort_weight,
+                fan_defuzzification)
+    pool = None
+    if processes != 1:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs)
+    else:
+        _init_worker(*initargs)
+
+    def evaluate_all(batch: List[Params]) -> List[Dict[str, float]]:
+        if pool is not None:
+            return list(pool.map(_evaluate_params, batch))
+        return [_evaluate_params(params) for params in batch]
+
+    try:
+        candidates = [space.base] + [space.mutate(space.base, sigma, rng) for _ in range(population - 1)]
+        scored: List[Tuple[Dict[str, float], np.ndarray]] = []
+        baseline = None
+        history = []
+        for generation in range(generations):
+            results = evaluate_all([space.params(vector) for vector in candidates])
+            if baseline is None:
+                baseline = results[0]
+            scored = sorted(scored + list(zip(results, candidates)), key=lambda item: -item[0]['score'])[:elite]
+            best = scored[0][0]
+            history.append(dict(best, generation=generation))
+            if progress is not None:
+                progress(generation, best)
+
+            sigma *= sigma_decay
+            parents = [vector for _, vector in scored]
+            candidates = [space.mutate(parents[rng.integers(len(parents))], sigma, rng)
+                          for _ in range(population - elite)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    best_metrics, best_vector = scored[0]
+    return {
+        'params': space.params(best_vector),
+        'metrics': best_metrics,
+        'baseline': baseline,
+        'history': history,
+        'version': kb.version,
+    }
+
+
+def save_tuned_knowledge_base(db_path: str, params: Params, base_version: Optional[int] = None,
+                              output_path: Optional[str] = None) -> int:
+    """Новая версия базы знаний в том же файле (источник 'tuner'); возвращает ее номер.
+
+    Новая версия - версия base_version (по умолчанию последняя) с подобранными параметрами
+    множеств, правила которой копируются без изменений; прежние версии остаются для аудита
+    и закрепления. Регуляторы, следующие за последней версией, подхватывают ее при перезагрузке.
+    С output_path база знаний со всеми версиями дополнительно копируется в этот файл.
+    """
+    kb = load_knowledge_base(db_path, version=base_version)
+    for variable, values in params.items():
+        if len(kb.set_params(variable)) != len(values):
+            raise ValueError(f"Число множеств переменной '{variable}' в базе изменилось")
+    # Множества переменной идут в том же порядке, что и при компиляции базы
+    tuned = {variable: iter(values) for variable, values in params.items()}
+    set_rows, rules = kb.to_rows()
+    fuzzy_sets = []
+    for variable, set_name, *set_params in set_rows:
+        if variable in tuned:
+            set_params = next(tuned[variable])
+        fuzzy_sets.append((variable, set_name) + tuple(set_params))
+    version = import_version(db_path, fuzzy_sets, rules, 'tuner')
+
+    if output_path is not None:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(output_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подбор параметров нечетких множеств по симуляции')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--output', help='дополнительно скопировать базу знаний с новой версией в этот файл')
+    parser.add_argument('--scenarios', type=int, default=2000, help='число случайных сценариев для оценки')
+    parser.add_argument('--steps', type=int, default=15)
+    parser.add_argument('--population', type=int, default=24)
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--elite', type=int, default=6)
+    parser.add_argument('--sigma', type=float, default=0.05)
+    parser.add_argument('--effort-weight', type=float, default=DEFAULT_EFFORT_WEIGHT)
+    parser.add_argument('--centroid', action='store_true', help='настраивать для дефаззификации центроидом')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    def report(generation, best):
+        print(f"Поколение {generation + 1}/{args.generations}: оценка {best['score']:.4f}, "
+              f"комфорт {best['comfort_attained']:.1%}, усилие {best['effort']:.3f}")
+
+    started = time.perf_counter()
+    result = tune(args.db, generate_scenarios(args.scenarios, args.steps, args.seed), args.population,
+                  args.generations, args.elite, args.sigma, effort_weight=args.effort_weight,
+                  processes=args.processes, seed=args.seed,
+                  fan_defuzzification='centroid' if args.centroid else 'singleton', progress=report)
+    version = save_tuned_knowledge_base(args.db, result['params'], result['version'], args.output)
+    print(json.dumps({'db': args.db, 'version': version, 'output': args.output,
+                      'seconds': time.perf_counter() - started, 'baseline': result['baseline'], 'best': result['metrics'], 'params': result['params']},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
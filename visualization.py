@@ -1,63 +1,84 @@
+import time
+
+from typing import Optional
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+from recorder import TrajectoryRecorder
+
+
+def decimate(x: np.ndarray, y: np.ndarray, buckets: int):
+    """Прореживание ряда до разрешения экрана: min и max значения в каждом из buckets интервалов"""
+    n = len(x)
+    if n <= 2 * buckets:
+        return x, y
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    starts = edges[:-1]
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    # Середина интервала по x для обеих точек, чтобы огибающая рисовалась вертикальным штрихом
+    centers = x[np.minimum((starts + edges[1:]) // 2, n - 1)]
+    return np.repeat(centers, 2), np.column_stack([mins, maxs]).ravel()
+
 
 class SimulationVisualizer:
-    def __init__(self):
-        self.steps = []
-        self.temperatures = []
-        self.humidities = []
-        self.fan_speeds = []
-        self.heater_states = []
+    def __init__(self, max_fps: float = 10.0, max_draw_share: float = 0.2, marker_limit: int = 200,
+                 recorder: Optional[TrajectoryRecorder] = None, window: Optional[int] = None):
+        # История хранится в колоночном файле траектории, а не в списках; при заданном window
+        # живой график показывает только последние window шагов из кольцевого буфера
+        self.recorder = recorder if recorder is not None else TrajectoryRecorder(window=window)
+
+        # Перерисовка не чаще max_fps раз в секунду независимо от темпа шагов симуляции
+        self.min_frame_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        # Если кадр рисуется долго, следующий откладывается так, чтобы отрисовка занимала
+        # не больше max_draw_share времени и не тормозила симуляцию
+        self.max_draw_share = max_draw_share
+        self._next_frame = 0.0
+        # Маркеры точек рисуются, пока точек немного
+        self.marker_limit = marker_limit
 
         # Настройка графика
         plt.ion()  # Интерактивный режим
         self.fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
         self.fig.suptitle('СИСТЕМА ВЕНТИЛЯЦИИ ПРОМЫШЛЕННОГО ЦЕХА', fontsize=14, fontweight='bold')
+        self._setup_axes()
 
-    def update(self, step, temperature, humidity, fan_speed, heater_state):
-        """Обновление данных для графика"""
-        self.steps.append(step)
-        self.temperatures.append(temperature)
-        self.humidities.append(humidity)
-        self.fan_speeds.append(fan_speed)
-        self.heater_states.append(heater_state)
-
-        self._plot_all()
-
-    def _plot_all(self):
-        """Отрисовка всех графиков"""
-        # Очищаем предыдущие графики
-        for ax in self.fig.axes:
-            ax.clear()
+        # Фон осей для блиттинга; обновляется после каждой полной перерисовки холста
+        self._backgrounds = None
+        self.blit = self.fig.canvas.supports_blit
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _setup_axes(self):
+        """Однократная настройка осей и создание линий, которые затем обновляются на месте"""
+        ax1, ax2, ax3, ax4 = self.fig.axes
 
         # НОВЫЕ ГРАНИЦЫ КОМФОРТНОЙ ЗОНЫ
         temp_comfort_min, temp_comfort_max = 17, 23
         hum_comfort_min, hum_comfort_max = 35, 65
 
         # График температуры
-        ax1 = self.fig.axes[0]
-        ax1.plot(self.steps, self.temperatures, 'r-o', linewidth=2, markersize=4)
+        self.temp_line, = ax1.plot([], [], 'r-o', linewidth=2, markersize=4)
         ax1.set_title('ТЕМПЕРАТУРА В ЦЕХЕ')
         ax1.set_ylabel('Температура (°C)')
         ax1.grid(True, alpha=0.3)
         ax1.axhline(y=temp_comfort_min, color='blue', linestyle='--', alpha=0.7, label='Комфортная зона')
         ax1.axhline(y=temp_comfort_max, color='blue', linestyle='--', alpha=0.7)
+        ax1.set_ylim(9, 31)
         ax1.legend()
 
         # График влажности
-        ax2 = self.fig.axes[1]
-        ax2.plot(self.steps, self.humidities, 'b-o', linewidth=2, markersize=4)
+        self.hum_line, = ax2.plot([], [], 'b-o', linewidth=2, markersize=4)
         ax2.set_title('ВЛАЖНОСТЬ В ЦЕХЕ')
         ax2.set_ylabel('Влажность (%)')
         ax2.grid(True, alpha=0.3)
         ax2.axhline(y=hum_comfort_min, color='green', linestyle='--', alpha=0.7, label='Комфортная зона')
         ax2.axhline(y=hum_comfort_max, color='green', linestyle='--', alpha=0.7)
+        ax2.set_ylim(17, 83)
         ax2.legend()
 
         # График скорости вентилятора
-        ax3 = self.fig.axes[2]
-        ax3.plot(self.steps, self.fan_speeds, 'g-o', linewidth=2, markersize=4)
+        self.fan_line, = ax3.plot([], [], 'g-o', linewidth=2, markersize=4)
         ax3.set_title('СКОРОСТЬ ВЕНТИЛЯТОРА')
         ax3.set_ylabel('Скорость (0-1)')
         ax3.set_xlabel('Шаг симуляции')
@@ -65,8 +86,7 @@ class SimulationVisualizer:
         ax3.grid(True, alpha=0.3)
 
         # График состояния обогревателя
-        ax4 = self.fig.axes[3]
-        ax4.plot(self.steps, self.heater_states, 'orange', linewidth=2, marker='o', markersize=4)
+        self.heater_line, = ax4.plot([], [], 'orange', linewidth=2, marker='o', markersize=4)
         ax4.set_title('СОСТОЯНИЕ ОБОГРЕВАТЕЛЯ')
         ax4.set_ylabel('Состояние (0/1)')
         ax4.set_xlabel('Шаг симуляции')
@@ -75,11 +95,120 @@ class SimulationVisualizer:
         ax4.set_yticks([0, 1])
         ax4.set_yticklabels(['ВЫКЛ', 'ВКЛ'])
 
+        for ax in self.fig.axes:
+            ax.set_xlim(0, 10)
+        for line in self._lines():
+            line.set_animated(True)
+
         plt.tight_layout()
-        plt.draw()
-        plt.pause(0.1)
+
+    def _lines(self):
+        return self.temp_line, self.hum_line, self.fan_line, self.heater_line
+
+    def _column(self, name: str, full: bool = False) -> np.ndarray:
+        window = self.recorder.window
+        if window is not None and not full:
+            return window.view(name)
+        return self.recorder.column(name)
+
+    @property
+    def steps(self) -> np.ndarray:
+        return self._column('step', full=True)
+
+    @property
+    def temperatures(self) -> np.ndarray:
+        return self._column('temperature', full=True)
+
+    @property
+    def humidities(self) -> np.ndarray:
+        return self._column('humidity', full=True)
+
+    @property
+    def fan_speeds(self) -> np.ndarray:
+        return self._column('fan_speed', full=True)
+
+    @property
+    def heater_states(self) -> np.ndarray:
+        return self._column('heater_state', full=True)
+
+    def update(self, step, temperature, humidity, fan_speed, heater_state):
+        """Обновление данных для графика; перерисовка - не чаще заданной частоты кадров"""
+        self.recorder.append(step, temperature, humidity, fan_speed, heater_state)
+
+        if time.monotonic() >= self._next_frame:
+            started = time.monotonic()
+            self._plot_all()
+            finished = time.monotonic()
+            pause = (finished - started) * (1 - self.max_draw_share) / self.max_draw_share
+            self._next_frame = finished + max(self.min_frame_interval, pause)
+
+    def _plot_all(self, full: bool = False):
+        """Обновление линий на месте; полная перерисовка только при смене пределов осей"""
+        steps = np.asarray(self._column('step', full), dtype=float)
+        needs_full_draw = not self.blit or self._backgrounds is None
+
+        for ax, line, name in zip(self.fig.axes, self._lines(),
+                                  ('temperature', 'humidity', 'fan_speed', 'heater_state')):
+            values = np.asarray(self._column(name, full), dtype=float)
+            # Разрешение по x - ширина области осей в пикселях
+            buckets = max(int(ax.bbox.width), 1)
+            x, y = decimate(steps, values, buckets)
+            line.set_data(x, y)
+            line.set_marker('o' if len(steps) <= self.marker_limit else '')
+            needs_full_draw |= self._fit_limits(ax, steps, values)
+
+        if needs_full_draw:
+            # draw_event вызовет _on_draw: сохранит фон и дорисует линии
+            self.fig.canvas.draw()
+        else:
+            canvas = self.fig.canvas
+            for ax, line, background in zip(self.fig.axes, self._lines(), self._backgrounds):
+                canvas.restore_region(background)
+                ax.draw_artist(line)
+                canvas.blit(ax.bbox)
+        self.fig.canvas.flush_events()
+
+    def _fit_limits(self, ax, steps: np.ndarray, values: np.ndarray) -> bool:
+        """Расширение пределов осей с запасом (чтобы это происходило редко); True, если пределы изменились"""
+        changed = False
+        if len(steps):
+            x_min, x_max = ax.get_xlim()
+            first, last = steps[0], steps[-1]
+            # В режиме окна начало оси сдвигается вслед за первой видимой точкой
+            window_moved = first - x_min > (x_max - x_min) / 2
+            if last > x_max or window_moved:
+                low = first if window_moved else x_min
+                ax.set_xlim(low, low + max(2 * (last - low), x_max - x_min))
+                changed = True
+            y_min, y_max = ax.get_ylim()
+            low, high = float(values.min()), float(values.max())
+            if low < y_min or high > y_max:
+                pad = (max(high, y_max) - min(low, y_min)) * 0.05
+                ax.set_ylim(min(low - pad, y_min), max(high + pad, y_max))
+                changed = True
+        return changed
+
+    def _on_draw(self, event):
+        """После полной перерисовки: сохранить фон для блиттинга и нарисовать анимируемые линии"""
+        canvas = self.fig.canvas
+        if self.blit:
+            self._backgrounds = [canvas.copy_from_bbox(ax.bbox) for ax in self.fig.axes]
+        for ax, line in zip(self.fig.axes, self._lines()):
+            if line.get_animated():
+                ax.draw_artist(line)
 
     def show_final(self):
         """Показать финальный график"""
+        # Последние точки могли не попасть в кадр из-за ограничения частоты
+        for line in self._lines():
+            line.set_animated(False)
+        self.blit = False
+        # Финальный график показывает всю историю, а не только окно
+        steps = self._column('step', full=True)
+        if len(steps):
+            for ax in self.fig.axes:
+                ax.set_xlim(0, max(float(steps[-1]) * 1.05, 10))
+        self._plot_all(full=True)
+        self.recorder.flush()
         plt.ioff()
-        plt.show()
\ No newline at end of file
+        plt.show()